@@ -1 +1,11 @@
-from .pipeline import run_pipeline
+def __getattr__(name):
+    # Deferred so that `import construal` does not pull in pandas/statsmodels
+    if name == "run_pipeline":
+        from .pipeline import run_pipeline
+        return run_pipeline
+    if name == "analyze":
+        from .api import analyze
+        return analyze
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+__all__ = ["analyze", "run_pipeline"]
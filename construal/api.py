@@ -0,0 +1,38 @@
+from dataclasses import replace
+from pathlib import Path
+import pandas as pd
+from .common.config import Config
+from .common.io import DUPLICATES_ATTR, flush_writes, frame_from
+from .common.preprocess import derive_design, design_columns, design_filters
+from .common.sink import MemorySink, make_sink, to_artifacts, write_texts
+from .common.typing import Artifacts
+from .scheduler import _run_serial
+from .steps import STEPS, load
+
+def analyze(data, cfg: Config | None = None, steps=None, write: bool = False, **options) -> dict[str, Artifacts]:
+    """Run steps on an in-memory input and return their results as data.
+
+    `data` is the raw input as a DataFrame or pyarrow Table; it goes through
+    the same projection, filters and derive_design as a file read by the CLI
+    (copy-on-write: it is not modified). `options` override fields of `cfg`
+    (e.g. models=["m1"], bootstrap=200). Returns {step key: Artifacts} in run
+    order; each Artifact's `data` is the table as a DataFrame, the text, or a
+    fitted model's coefficient table (summary text in summary["text"]), and
+    `artifacts["step01_chance_global"]` looks one up by name. Nothing is
+    written unless `write`, in which case artifacts also go to cfg.out_dir
+    through the configured results backend.
+    """
+    cfg = replace(cfg or Config(in_path=Path("<memory>"), out_dir=Path(".")), **options)
+    keys = list(steps or STEPS)
+    step_map = {k: load(k) for k in keys}
+    names = list(data.columns) if isinstance(data, pd.DataFrame) else data.schema.names
+    cols = design_columns(cfg, names, [c for k in keys for c in step_map[k].columns(cfg)])
+    df = derive_design(frame_from(data, columns=cols, filters=design_filters(cfg, names),
+                                  dedup=None if cfg.dedup_winner else [cfg.sent_col, cfg.model_col]), cfg)
+    results = _run_serial(step_map, keys, df, cfg,
+                          sink=lambda k: MemorySink(make_sink(cfg, k) if write else None))
+    if write:
+        write_texts(results, cfg)
+        flush_writes()
+    dropped = df.attrs.get(DUPLICATES_ATTR, {})
+    return {k: to_artifacts(arts, {**timing, "duplicates_dropped": dropped}) for k, (arts, timing) in results.items()}
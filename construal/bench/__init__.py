@@ -0,0 +1,3 @@
+# Synthetic inputs and a scaling benchmark for preprocessing and the steps:
+#   python -m construal.bench run --sizes 10k 100k 1M --out bench.json
+#   python -m construal.bench compare baseline.json bench.json
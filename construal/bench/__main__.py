@@ -0,0 +1,50 @@
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m construal.bench")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    run = sub.add_parser("run", help="Benchmark preprocessing and steps on synthetic inputs")
+    run.add_argument("--sizes", nargs="+", default=["10k", "100k", "1M"], help="Input rows, e.g. 10k 1M 10M")
+    run.add_argument("--steps", nargs="*", help="Steps to time (default: all)")
+    run.add_argument("--models", type=int, default=4)
+    run.add_argument("--items", type=int, help="Distinct sentences (default: rows / models, no repeats)")
+    run.add_argument("--missing", type=float, default=0.05, help="Share of missing annotations/scores")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--repeat", type=int, default=1, help="Keep the fastest of N runs per stage")
+    run.add_argument("--work", help="Directory for generated inputs, reused across runs (default: temporary)")
+    run.add_argument("--out", required=True, help="Results JSON")
+    cmp = sub.add_parser("compare", help="Flag regressions against a baseline results JSON")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--wall-tol", type=float, default=0.25, help="Allowed relative slowdown")
+    cmp.add_argument("--rss-tol", type=float, default=0.25, help="Allowed relative peak RSS growth")
+    args = ap.parse_args(argv)
+
+    from .harness import compare, parse_size, read_results, run_benchmarks, write_results
+    if args.cmd == "run":
+        from ..steps import STEPS
+        keys = args.steps or list(STEPS)
+        sizes = [parse_size(s) for s in args.sizes]
+        with tempfile.TemporaryDirectory(prefix="construal-bench-") as tmp:
+            results = run_benchmarks(sizes, keys, Path(args.work or tmp), models=args.models,
+                                     missing=args.missing, seed=args.seed, repeat=args.repeat,
+                                     items=args.items)
+        write_results(results, args.out)
+        for r in results["results"]:
+            print(f"{r['rows']:>10}  {r['stage']:<24} {r['wall_s']:9.3f}s {r['peak_rss_mb']:9.1f} MB")
+        return 0
+
+    regressions = compare(read_results(args.baseline), read_results(args.current),
+                          wall_tol=args.wall_tol, rss_tol=args.rss_tol)
+    for r in regressions:
+        print(f"REGRESSION {r['rows']:>10}  {r['stage']:<24} {r['metric']}: "
+              f"{r['baseline']:.3f} -> {r['current']:.3f} (x{r['ratio']:.2f})")
+    if not regressions:
+        print("No regressions.")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import json
+import platform
+import re
+import time
+from pathlib import Path
+from ..common.config import Config
+from ..scheduler import _pool, _run_step, peak_rss_mb
+from .synth import write_synthetic
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10_000, '2.5M' -> 2_500_000."""
+    m = re.fullmatch(r"([\d.]+)([kKmM]?)", text.strip())
+    if not m:
+        raise ValueError(f"Bad size: {text!r}")
+    return int(float(m.group(1)) * {"": 1, "k": 10**3, "m": 10**6}[m.group(2).lower()])
+
+def _module_name(key: str) -> str:
+    from ..steps import STEPS
+    return f"{__package__.rsplit('.', 1)[0]}.steps.{STEPS[key]}"
+
+def _preprocess(cfg: Config, keys: list[str], frame_path: str) -> dict:
+    # Runs in a fresh worker: read + derive_design exactly as the pipeline does
+    from ..common.io import read_columns, read_df, write_ipc
+    from ..common.preprocess import derive_design, design_columns, design_filters
+    from ..steps import load
+    available = read_columns(cfg.in_path)
+    cols = design_columns(cfg, available, [c for k in keys for c in load(k).columns(cfg)])
+    t0 = time.perf_counter()
+    df = derive_design(read_df(cfg.in_path, columns=cols, filters=design_filters(cfg, available),
+                               dedup=[cfg.sent_col, cfg.model_col]), cfg, copy=False)
+    wall = time.perf_counter() - t0
+    write_ipc(df, frame_path)
+    return {"wall_s": wall, "peak_rss_mb": peak_rss_mb(), "design_rows": len(df)}
+
+def _baseline_rss(keys: list[str]) -> float:
+    # Peak RSS of a worker that only imports the steps
+    from ..steps import load
+    for k in keys:
+        load(k)
+    return peak_rss_mb()
+
+def _versions() -> dict:
+    import numpy, pandas, pyarrow, scipy, statsmodels
+    return {"python": platform.python_version(), "numpy": numpy.__version__, "pandas": pandas.__version__,
+            "pyarrow": pyarrow.__version__, "scipy": scipy.__version__, "statsmodels": statsmodels.__version__}
+
+def run_benchmarks(sizes: list[int], keys: list[str], work: Path, models: int = 4, missing: float = 0.05,
+                   seed: int = 0, repeat: int = 1, items: int | None = None) -> dict:
+    """Time preprocessing and each step on synthetic inputs of each size.
+
+    Every stage runs in its own worker process, so peak_rss_mb is that stage's
+    own peak (including the imports, reported once as meta.baseline_rss_mb).
+    With repeat > 1 the fastest run of each stage is kept. `items` caps the
+    distinct sentences (default: one per `models` rows, i.e. no repeats).
+    """
+    work.mkdir(parents=True, exist_ok=True)
+    records = []
+    with _pool(1, fresh=True) as pool:
+        base = pool.submit(_baseline_rss, keys).result()
+        for rows in sizes:
+            n_items = items or max(1, rows // models)
+            in_path = work / f"selected_{rows}_{models}m_{n_items}i_{seed}s_{missing}.parquet"
+            if not in_path.exists():
+                write_synthetic(in_path, rows, models=models, items=n_items, missing=missing, seed=seed)
+            cfg = Config(in_path=in_path, out_dir=work / f"out_{rows}", use_cache=False)
+            frame = str(work / f"design_{rows}.arrow")
+            best = {}
+            for _ in range(repeat):
+                stages = [("preprocess", pool.submit(_preprocess, cfg, keys, frame).result())]
+                for k in keys:
+                    arts, timing = pool.submit(_run_step, k, _module_name(k), frame, cfg).result()
+                    stages.append((arts.get("step", k), timing))
+                for stage, t in stages:
+                    if stage not in best or t["wall_s"] < best[stage]["wall_s"]:
+                        best[stage] = t
+            for stage, t in best.items():
+                records.append({"rows": rows, "stage": stage, "wall_s": round(t["wall_s"], 6),
+                                "peak_rss_mb": round(t["peak_rss_mb"], 1)})
+            Path(frame).unlink(missing_ok=True)
+    return {"meta": {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "platform": platform.platform(),
+                     "versions": _versions(), "models": models, "items": items, "missing": missing, "seed": seed,
+                     "repeat": repeat, "steps": keys, "baseline_rss_mb": round(base, 1)},
+            "results": records}
+
+def compare(baseline: dict, current: dict, wall_tol: float = 0.25, rss_tol: float = 0.25,
+            min_wall_s: float = 0.05, min_rss_mb: float = 16.0) -> list[dict]:
+    """Stages (matched on rows and stage) that got slower or bigger than the baseline.
+
+    A stage regresses when it exceeds the baseline by more than the relative
+    tolerance and by more than the absolute floor, so that noise in
+    sub-second stages is not reported.
+    """
+    base = {(r["rows"], r["stage"]): r for r in baseline["results"]}
+    out = []
+    for r in current["results"]:
+        b = base.get((r["rows"], r["stage"]))
+        if b is None:
+            continue
+        for metric, tol, floor in (("wall_s", wall_tol, min_wall_s), ("peak_rss_mb", rss_tol, min_rss_mb)):
+            old, new = b[metric], r[metric]
+            if new > old * (1 + tol) and new - old > floor:
+                out.append({"rows": r["rows"], "stage": r["stage"], "metric": metric,
+                            "baseline": old, "current": new, "ratio": new / old if old else float("inf")})
+    return out
+
+def read_results(path: str | Path) -> dict:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+def write_results(results: dict, path: str | Path) -> None:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(json.dumps(results, indent=2), encoding="utf-8")
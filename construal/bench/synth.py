@@ -0,0 +1,89 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Synthetic selected.parquet in the raw schema derive_design expects: one row
+# per (sentence, model), with src_order / ann_det_general / pool_type / mode /
+# decode_params as the generation jobs write them.
+
+MODES = {
+    "greedy": {},
+    "beam": {"num_beams": 5},
+    "nucleus": {"top_p": 0.9},
+    "mbr": {"num_samples": 16},
+}
+SRC_ORDERS = np.array(["SUBJ_before_ROOT", "ROOT_before_SUBJ", "OTHER"])
+DETS = np.array(["Def", "Indef", "None"])
+
+def synthetic_selected(rows: int, models: int = 4, items: int | None = None, missing: float = 0.05,
+                       seed: int = 0, start: int = 0) -> pd.DataFrame:
+    """Rows `start`..`start + rows` of a seeded synthetic input.
+
+    Row i is sentence i // models scored by model i % models. `items` caps
+    the number of distinct sentences (default: rows // models); a smaller
+    value repeats (sent_id, model) pairs, as reruns of a job do. `missing` is
+    the share of missing annotations and metric scores. The output depends
+    only on the arguments.
+    """
+    i = np.arange(start, start + rows, dtype=np.int64)
+    items = items or max(1, (start + rows) // models)
+    rng = np.random.default_rng([seed, start])
+    model = i % models
+    sent = (i // models) % items
+    # Source order is a property of the sentence (a hash of its id, so repeats
+    # agree): 0 SV, 1 VS, 2 neither
+    u = sent * 2654435761 % 1000
+    order = np.select([u < 480, u < 960], [0, 1], 2)
+    mode = (model + sent // 7) % len(MODES)                   # decoding config varies within a model
+
+    # Success (the determiner the order implies: SV -> Def, VS -> Indef) is
+    # likelier for SV and varies by model; tau tracks success
+    p = 0.5 + 0.2 * (order == 0) + 0.03 * (model % 3)
+    success = rng.random(rows) < p
+    expected = np.where(order == 0, 0, 1)
+    det = np.where(success, expected, 1 - expected)
+    det = np.where(rng.random(rows) < 0.1, 2, det)            # no determiner
+    tau = np.clip(rng.normal(0.25 + 0.3 * success, 0.25), -1, 1)
+
+    def holes(x):
+        x = x.astype(float)
+        x[rng.random(rows) < missing] = np.nan
+        return x
+
+    det_labels = DETS[det].astype(object)
+    det_labels[rng.random(rows) < missing] = None
+    model_names = np.array([f"m{k:02d}" for k in range(models)])
+    decode = np.array([json.dumps(v) for v in MODES.values()])
+    return pd.DataFrame({
+        "sent_id": sent,
+        "model": model_names[model],
+        "model_family": np.where(model % 2 == 0, "dec", "enc"),
+        "pool_type": np.where(model % 4 < 2, "plain", "mbrish"),
+        "mode": np.array(list(MODES))[mode],
+        "decode_params": decode[mode],
+        "src_order": SRC_ORDERS[order],
+        "ann_det_general": det_labels,
+        "ann_align_kendall_tau": holes(tau),
+        "rt_chrf": holes(rng.normal(55 + 5 * success, 10)),
+        "rt_bleu": holes(rng.normal(25 + 3 * success, 6)),
+        "rt_ter": holes(rng.normal(60 - 4 * success, 9)),
+    })
+
+def write_synthetic(path: str | os.PathLike, rows: int, chunk: int = 1_000_000, **kw) -> None:
+    """Write synthetic_selected(rows, **kw) to parquet `chunk` rows at a time."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    kw.setdefault("items", max(1, rows // kw.get("models", 4)))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    writer = None
+    try:
+        for start in range(0, rows, chunk):
+            table = pa.Table.from_pandas(synthetic_selected(min(chunk, rows - start), start=start, **kw),
+                                         preserve_index=False)
+            writer = writer or pq.ParquetWriter(tmp, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp, path)
@@ -1,13 +1,42 @@
 import argparse
-from .pipeline import run_pipeline
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--in", dest="in_path", required=True, help="Path to selected.parquet")
+    ap.add_argument("--in", dest="in_path", required=True, help="Input: a parquet/CSV file, or a directory or glob of shards "
+                         "(hive partitions such as model=X/ become columns)")
     ap.add_argument("--out", dest="out_dir", required=True, help="Directory for artifacts")
     ap.add_argument("--steps", nargs="*", help="Steps to run, e.g., 1 2 3 4 5 6 7")
     ap.add_argument("--all", action="store_true", help="Run all steps")
+    ap.add_argument("--sv-vs-only", action="store_true", help="Drop rows outside SV/VS while reading")
+    ap.add_argument("--models", nargs="+", metavar="MODEL",
+                    help="Analyse only these models; model=... partitions of other models are never read")
+    ap.add_argument("--by", nargs="+", metavar="COL",
+                    help="Run the steps once per combination of these columns (after one preprocessing pass); "
+                         "results go to <out>/COL=value/ with a combined summary in <out>/strata.csv")
+    ap.add_argument("--stream", action="store_true",
+                    help="Run the count-based steps (1-3) out of core, one record batch at a time")
+    ap.add_argument("--batch-size", type=int, default=1_000_000, help="Rows per batch with --stream")
+    ap.add_argument("--jobs", type=int, default=1, help="Run steps in N worker processes")
+    ap.add_argument("--no-cache", action="store_true", help="Always re-run preprocessing")
+    ap.add_argument("--cache-dir", help="Preprocessing cache (default: <out>/.construal_cache)")
+    ap.add_argument("--dedup-winner", metavar="COL",
+                    help="Among rows repeating a (sent_id, model) pair keep the highest COL (default: first)")
+    ap.add_argument("--bootstrap", type=int, default=0, metavar="N",
+                    help="Add cluster bootstrap CIs and permutation p-values from N replicates (steps 2 and 4)")
+    ap.add_argument("--bootstrap-seed", type=int, default=0, help="Seed for --bootstrap")
+    ap.add_argument("--bootstrap-cluster", metavar="COL", help="Resampling unit for --bootstrap (default: item_id)")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Skip steps and per-model results whose inputs are unchanged since the last run")
+    ap.add_argument("--results", choices=("csv", "parquet"), default="csv",
+                    help="Write tables and model coefficients as CSV/TXT files (default) or as "
+                         "parquet datasets under <out>/results, partitioned by step and run")
+    ap.add_argument("--run-id", help="Run partition for --results parquet (default: the start time)")
+    ap.add_argument("--trace", action="store_true",
+                    help="Record timing spans (read, preprocessing stages, steps, fits) to <out>/trace.json and trace.csv")
+    ap.add_argument("--profile", metavar="SPEC",
+                    help="Profile preprocessing and each step: 'cprofile', or MODULE:FACTORY for another profiler")
     args = ap.parse_args()
+    from .pipeline import run_pipeline
     run_pipeline(args)
 
 if __name__ == "__main__":
@@ -0,0 +1,35 @@
+import threading
+from contextlib import contextmanager
+import pandas as pd
+
+_COW_LOCK = threading.Lock()
+_COW_DEPTH, _COW_SAVED = 0, False
+
+@contextmanager
+def copy_on_write():
+    """pandas copy-on-write inside the block (and as a decorator, the call).
+
+    Steps share one design frame whose columns may be read-only views of a
+    memory-mapped Arrow file; copy-on-write keeps each step's changes private
+    without defensive copies. It is always on from pandas 3; before that it is
+    switched on only around our own preprocessing and step execution, so
+    importing the package does not change pandas for the caller. The option is
+    process-wide, so it stays on until the last thread inside a block (e.g.
+    concurrent server queries) leaves.
+    """
+    global _COW_DEPTH, _COW_SAVED
+    if int(pd.__version__.split(".")[0]) >= 3:
+        yield
+        return
+    with _COW_LOCK:
+        if _COW_DEPTH == 0:
+            _COW_SAVED = pd.get_option("mode.copy_on_write")
+            pd.set_option("mode.copy_on_write", True)
+        _COW_DEPTH += 1
+    try:
+        yield
+    finally:
+        with _COW_LOCK:
+            _COW_DEPTH -= 1
+            if _COW_DEPTH == 0:
+                pd.set_option("mode.copy_on_write", _COW_SAVED)
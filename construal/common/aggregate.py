@@ -0,0 +1,289 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from .config import Config
+from .io import DUPLICATES_ATTR, iter_batches, merge_counts
+from .preprocess import derive_design, duplicate_counts
+from .tables import DET_LEVELS as DETS, ORDERS, det_label
+
+class _KeySet:
+    """Set of uint64 key hashes, kept as sorted runs merged like a binary counter."""
+    def __init__(self):
+        self.runs: list[np.ndarray] = []
+
+    def contains(self, h: np.ndarray) -> np.ndarray:
+        seen = np.zeros(len(h), dtype=bool)
+        for run in self.runs:
+            pos = np.minimum(np.searchsorted(run, h), len(run) - 1)
+            seen |= run[pos] == h
+        return seen
+
+    def add_new(self, h: np.ndarray) -> np.ndarray:
+        """Insert `h` and return the mask of hashes that were not already present."""
+        new = ~self.contains(h)
+        if not new.any():
+            return new
+        self.runs.append(np.unique(h[new]))
+        while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            b = self.runs.pop(); a = self.runs.pop()
+            self.runs.append(np.union1d(a, b))
+        return new
+
+class _SentenceMax:
+    """Max success per (sentence, order) keyed by hash, with running per-order
+    (successes, sentences) totals: the pooled ANY-success table is read off in
+    O(orders). Keys and maxima are kept as sorted runs merged like a binary
+    counter (as _KeySet), so a batch of b rows against t sentences seen costs
+    O(b log t) lookups plus amortised O(b log t) merging, not a copy of all t."""
+    def __init__(self):
+        self.runs: list[tuple[np.ndarray, np.ndarray]] = []   # (sorted uint64 keys, max success)
+        self.totals: dict = {}           # order -> [sum of maxima, sentences]
+
+    def update(self, part: pd.DataFrame) -> None:
+        # part: one row per (sent, order) of a batch, "n" holding its max success
+        part = part[part["sent"].notna() & part["order"].notna()]
+        if not len(part):
+            return
+        h = pd.util.hash_pandas_object(part[["sent", "order"]], index=False).to_numpy()
+        v = part["n"].to_numpy(dtype=float)
+        found = np.zeros(len(h), dtype=bool)
+        gain = v.copy()
+        for keys, best in self.runs:
+            pos = np.minimum(np.searchsorted(keys, h), len(keys) - 1)
+            hit = (keys[pos] == h) & ~found
+            if hit.any():
+                at, old = pos[hit], best[pos[hit]]
+                gain[hit] = np.maximum(v[hit] - old, 0.0)
+                best[at] = np.maximum(old, v[hit])
+                found |= hit
+        if (~found).any():
+            order = np.argsort(h[~found])
+            self.runs.append((h[~found][order], v[~found][order]))
+            while len(self.runs) > 1 and len(self.runs[-2][0]) <= 2 * len(self.runs[-1][0]):
+                (bk, bv), (ak, av) = self.runs.pop(), self.runs.pop()
+                at = np.searchsorted(ak, bk)
+                self.runs.append((np.insert(ak, at, bk), np.insert(av, at, bv)))
+        per = pd.DataFrame({"order": part["order"].to_numpy(), "gain": gain, "new": ~found}) \
+            .groupby("order", sort=False)[["gain", "new"]].sum()
+        for o, r in per.iterrows():
+            t = self.totals.setdefault(o, [0.0, 0])
+            t[0] += float(r["gain"])
+            t[1] += int(r["new"])
+
+def _count(df: pd.DataFrame, keys: dict, value: str | None = None, how: str = "size") -> pd.DataFrame:
+    # keys maps cube column -> frame column; absent frame columns become all-NA keys
+    present = {k: c for k, c in keys.items() if c in df.columns}
+    if not present:
+        out = pd.DataFrame({"n": [len(df)]})
+    elif how == "size":
+        out = df.groupby(list(present.values()), dropna=False, observed=True).size().reset_index(name="n")
+    else:
+        out = df.groupby(list(present.values()), observed=True)[value].agg(how).reset_index(name="n")
+    out = out.rename(columns={c: k for k, c in present.items()})
+    for k in keys:
+        out[k] = out[k].astype(object).where(out[k].notna(), None) if k in out.columns else None
+    return out[[*keys, "n"]]
+
+def _frame_bytes(df: pd.DataFrame) -> np.ndarray:
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return np.frombuffer(sink.getvalue(), dtype=np.uint8)
+
+def _frame_from_bytes(data: np.ndarray) -> pd.DataFrame:
+    # Key columns come back as objects with None for missing, as _count makes them
+    import pyarrow as pa
+    df = pa.ipc.open_stream(pa.py_buffer(data.tobytes())).read_all().to_pandas(types_mapper=pd.ArrowDtype)
+    for c in df.columns:
+        df[c] = df[c].astype("int64") if c == "n" else df[c].astype(object).where(df[c].notna(), None)
+    return df
+
+# Config fields a checkpoint depends on; it cannot be resumed under different ones
+STATE_FIELDS = ("model_col", "gen2_col", "order_col", "success_col", "det_col", "sent_col", "sv_vs_only", "models")
+
+def _merge(acc: pd.DataFrame | None, part: pd.DataFrame, how: str) -> pd.DataFrame:
+    # Combine two count frames on their key columns
+    if acc is None:
+        return part
+    keys = [c for c in part.columns if c != "n"]
+    both = pd.concat([acc, part], ignore_index=True)
+    return both.groupby(keys, dropna=False, sort=False)["n"].agg(how).reset_index()
+
+class CountCubes:
+    """Running count tables behind steps 01–03, updated one batch at a time.
+
+    success:  rows per (model, gen2, order, success)
+    det:      rows per (model, order, det)
+    sent_any: max success per (sent, order), for the pooled ANY-success table
+
+    save()/load() checkpoint the state, so counting can resume where it stopped.
+    """
+    def __init__(self, cfg: Config, dedup: bool = True):
+        self.cfg = cfg
+        self._success_keys = {"model": cfg.model_col, "gen2": cfg.gen2_col,
+                              "order": cfg.order_col, "success": cfg.success_col}
+        self._det_keys = {"model": cfg.model_col, "order": cfg.order_col, "det": cfg.det_col}
+        self.success = _count(pd.DataFrame(), self._success_keys)
+        self.det = _count(pd.DataFrame(), self._det_keys)
+        self.sent_any: _SentenceMax | None = None
+        self.has_sent = False
+        self.has_det = False
+        self.n_rows = 0
+        self.duplicates: dict = {}       # model -> rows dropped as repeated (sent, model) keys
+        self._keys = _KeySet() if dedup else None
+
+    def save(self, path: str | os.PathLike, meta: dict | None = None) -> None:
+        """Checkpoint the counts, the dedup keys and the caller's `meta` (JSON) to
+        one .npz file, replaced atomically."""
+        state = {"version": 2, "config": {k: getattr(self.cfg, k) for k in STATE_FIELDS},
+                 "n_rows": self.n_rows, "has_sent": self.has_sent, "has_det": self.has_det,
+                 "duplicates": self.duplicates, "dedup": self._keys is not None, "meta": meta or {},
+                 "totals": None if self.sent_any is None else [[o, k, n] for o, (k, n) in self.sent_any.totals.items()]}
+        arrays = {"state": np.frombuffer(json.dumps(state, default=list).encode("utf-8"), dtype=np.uint8),
+                  "success": _frame_bytes(self.success), "det": _frame_bytes(self.det)}
+        for i, (keys, best) in enumerate(self.sent_any.runs if self.sent_any is not None else []):
+            arrays[f"sent_keys_{i}"], arrays[f"sent_best_{i}"] = keys, best
+        for i, run in enumerate(self._keys.runs if self._keys is not None else []):
+            arrays[f"keys_{i}"] = run
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str | os.PathLike, cfg: Config) -> tuple["CountCubes", dict]:
+        """(cubes, meta) from a checkpoint written by save()."""
+        with np.load(path) as z:
+            state = json.loads(z["state"].tobytes().decode("utf-8"))
+            if state.get("version") != 2:
+                raise ValueError(f"{path} is an old checkpoint format; rebuild it")
+            config = json.loads(json.dumps({k: getattr(cfg, k) for k in STATE_FIELDS}, default=list))
+            if state["config"] != config:
+                raise ValueError(f"{path} was built with different settings: {state['config']} (now {config})")
+            cubes = cls(cfg, dedup=state["dedup"])
+            cubes.success, cubes.det = _frame_from_bytes(z["success"]), _frame_from_bytes(z["det"])
+            cubes.n_rows, cubes.duplicates = state["n_rows"], state["duplicates"]
+            cubes.has_sent, cubes.has_det = state["has_sent"], state["has_det"]
+            if state["totals"] is not None:
+                cubes.sent_any = _SentenceMax()
+                runs = sum(k.startswith("sent_keys_") for k in z.files)
+                cubes.sent_any.runs = [(z[f"sent_keys_{i}"], z[f"sent_best_{i}"]) for i in range(runs)]
+                cubes.sent_any.totals = {o: [k, n] for o, k, n in state["totals"]}
+            if cubes._keys is not None:
+                cubes._keys.runs = [z[f"keys_{i}"] for i in range(sum(k.startswith("keys_") for k in z.files))]
+        return cubes, state["meta"]
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, cfg: Config) -> "CountCubes":
+        return cls(cfg, dedup=False).update(df)
+
+    def add_raw(self, raw: pd.DataFrame, offset: int = 0) -> "CountCubes":
+        """derive_design and add a raw batch whose first row is row `offset` of the input (modifies `raw`)."""
+        cfg = self.cfg
+        raw.index = pd.RangeIndex(offset, offset + len(raw))
+        if cfg.sent_col not in raw.columns and "sentence_id" not in raw.columns \
+                and not any(str(c).startswith("sent_id") for c in raw.columns):
+            # derive_design would number rows per batch; keep sentence ids global
+            raw[cfg.sent_col] = raw.index.to_numpy()
+        return self.update(derive_design(raw, cfg, copy=False))
+
+    def update(self, df: pd.DataFrame) -> "CountCubes":
+        """Add a derived batch. With dedup, (sent, model) keys seen in earlier batches are dropped."""
+        cfg = self.cfg
+        self.duplicates = merge_counts(self.duplicates, df.attrs.get(DUPLICATES_ATTR, {}))
+        if self._keys is not None and {cfg.sent_col, cfg.model_col} <= set(df.columns):
+            h = pd.util.hash_pandas_object(df[[cfg.sent_col, cfg.model_col]], index=False).to_numpy()
+            new = self._keys.add_new(h)
+            self.duplicates = merge_counts(self.duplicates, duplicate_counts(df.loc[~new, cfg.model_col]))
+            df = df[new]
+        self.n_rows += len(df)
+        self.has_sent |= cfg.sent_col in df.columns
+        self.has_det |= cfg.det_col in df.columns
+
+        self.success = _merge(self.success, _count(df, self._success_keys), "sum")
+        part = _count(df, self._det_keys)
+        part["det"] = part["det"].map(det_label)
+        self.det = _merge(self.det, part, "sum")
+        if cfg.sent_col in df.columns and cfg.success_col in df.columns:
+            # "n" holds the sentence's max success here, not a row count
+            part = _count(df, {"sent": cfg.sent_col, "order": cfg.order_col}, cfg.success_col, "max")
+            if self.sent_any is None:
+                self.sent_any = _SentenceMax()
+            self.sent_any.update(part.dropna(subset=["n"]))
+        return self
+
+    # --- Step 01
+    def chance(self):
+        """(k, n) overall and [(key, k, n)] by model and by gen2, over rows with a success value."""
+        s = self.success
+        s = s[s["success"].notna()].assign(k=lambda x: x["success"].astype(float) * x["n"])
+        glob = (int(s["k"].sum()), int(s["n"].sum())) if s["n"].sum() > 0 else None
+        def by(col):
+            g = s[s[col].notna()].groupby(col)[["k", "n"]].sum()
+            return [(key, int(r.k), int(r.n)) for key, r in g.iterrows() if r.n > 0]
+        return glob, by("model"), by("gen2")
+
+    # --- Step 02
+    def pooled_any(self) -> pd.DataFrame:
+        if self.has_sent and self.sent_any is not None:
+            totals = sorted((o, k, n) for o, (k, n) in self.sent_any.totals.items() if n > 0)
+            agg = pd.DataFrame(totals, columns=["order", "sum", "count"])
+        else:
+            s = self.success[self.success["order"].notna() & self.success["success"].notna()]
+            s = s.assign(k=s["success"].astype(float) * s["n"])
+            agg = s.groupby("order")[["k", "n"]].sum().reset_index()
+        agg.columns = [self.cfg.order_col, "success", "n"]
+        return agg
+
+    def _models(self, cube: pd.DataFrame) -> list:
+        return sorted(cube.loc[cube["model"].notna(), "model"].unique())
+
+    def per_model_2x2(self) -> list[dict]:
+        s = self.success
+        ok = s[s["model"].notna() & s["order"].isin(ORDERS) & s["success"].isin([0, 1])]
+        cells = ok.groupby(["model", "order", "success"])["n"].sum().to_dict()
+        return [{
+            "model": m,
+            "SV_fail": int(cells.get((m, "SV", 0), 0)),
+            "SV_success": int(cells.get((m, "SV", 1), 0)),
+            "VS_fail": int(cells.get((m, "VS", 0), 0)),
+            "VS_success": int(cells.get((m, "VS", 1), 0)),
+        } for m in self._models(s)]
+
+    # --- Step 03
+    def global_2x3(self) -> pd.DataFrame:
+        d = self.det[self.det["order"].isin(ORDERS) & self.det["det"].isin(DETS)]
+        ct = d.pivot_table(index="order", columns="det", values="n", aggfunc="sum")
+        ct = ct.reindex(index=ORDERS, columns=DETS).fillna(0).astype(int)
+        ct.index.name, ct.columns.name = self.cfg.order_col, self.cfg.det_col
+        return ct
+
+    def per_model_2x3(self) -> list[dict]:
+        d = self.det
+        cells = d[d["model"].notna()].groupby(["model", "order", "det"])["n"].sum().to_dict()
+        return [{"model": m, **{f"{o}_{k}": int(cells.get((m, o, k), 0)) for o in ORDERS for k in DETS}}
+                for m in self._models(d)]
+
+    def per_model_vs_others(self, level: str) -> list[dict]:
+        d = self.det[self.det["model"].notna() & self.det["order"].isin(ORDERS)]
+        total = d.groupby(["model", "order"])["n"].sum().to_dict()
+        hit = d[d["det"] == level].groupby(["model", "order"])["n"].sum().to_dict()
+        rows = []
+        for m in self._models(self.det):
+            sv, vs = int(hit.get((m, "SV"), 0)), int(hit.get((m, "VS"), 0))
+            rows.append({"model": m,
+                         f"SV_{level}": sv, "SV_others": int(total.get((m, "SV"), 0)) - sv,
+                         f"VS_{level}": vs, "VS_others": int(total.get((m, "VS"), 0)) - vs})
+        return rows
+
+def stream_counts(path, cfg: Config, columns=None, filters=None, batch_size: int = 1_000_000) -> CountCubes:
+    """Build CountCubes from the input one record batch at a time."""
+    cubes = CountCubes(cfg)
+    offset = 0
+    for raw in iter_batches(path, columns=columns, filters=filters, batch_size=batch_size):
+        cubes.add_raw(raw, offset)
+        offset += len(raw)
+    return cubes
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+from dataclasses import asdict
+from pathlib import Path
+import pandas as pd
+from .config import Config
+from .io import input_files, read_ipc, write_ipc
+
+# Config fields that only affect how a run executes, not what it computes
+RUNTIME_FIELDS = {"in_path", "out_dir", "stream", "batch_size", "jobs",
+                  "use_cache", "cache_dir", "cache_max_bytes", "incremental", "run_id", "by",
+                  "trace", "profile"}
+
+def config_fields(cfg: Config) -> dict:
+    return {k: v for k, v in asdict(cfg).items() if k not in RUNTIME_FIELDS}
+
+def cache_dir(cfg: Config) -> Path:
+    return Path(cfg.cache_dir) if cfg.cache_dir else Path(cfg.out_dir) / ".construal_cache"
+
+def _input_fingerprint(path: Path) -> list:
+    return [(str(p), p.stat().st_size, p.stat().st_mtime_ns) for p in input_files(path)]
+
+def design_code_digest() -> str:
+    """Hash of the modules the cached build() runs: reading and dedup (io),
+    derive_design (preprocess, tables) and the Config/copy-on-write it uses.
+    Step modules are left out, so editing a step keeps the cached design."""
+    from . import config, io, preprocess, tables
+    from .. import common
+    h = hashlib.sha256()
+    for mod in (common, config, io, preprocess, tables):
+        h.update(Path(mod.__file__).read_bytes())
+    return h.hexdigest()
+
+def design_key(cfg: Config, columns, filters) -> str:
+    """Hash of the input files' (path, size, mtime), the Config fields
+    preprocessing reads, the projected columns/filters and the preprocessing
+    code itself."""
+    from . import preprocess
+    payload = json.dumps({
+        "input": _input_fingerprint(Path(cfg.in_path).resolve()),
+        "config": {f: getattr(cfg, f) for f in preprocess.DESIGN_FIELDS},
+        "columns": sorted(columns) if columns is not None else None,
+        "filters": filters,
+        "code": design_code_digest(),
+    }, default=str, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+def evict(directory: Path, max_bytes: int) -> None:
+    """Delete least recently used entries until the cache fits in `max_bytes`."""
+    entries = sorted(directory.glob("*.arrow"), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in entries)
+    for p in entries:
+        if total <= max_bytes:
+            break
+        total -= p.stat().st_size
+        p.unlink(missing_ok=True)
+
+def cached_design(cfg: Config, columns, filters, build) -> tuple[pd.DataFrame, Path | None]:
+    """Return the derived frame from the cache, or build() and store it.
+
+    The second element is the cache file (an Arrow IPC file that can be
+    memory-mapped), or None when caching is disabled.
+    """
+    if not cfg.use_cache:
+        return build(), None
+    directory = cache_dir(cfg)
+    path = directory / f"{design_key(cfg, columns, filters)}.arrow"
+    if path.exists():
+        os.utime(path)                      # mark as recently used
+        return read_ipc(path), path
+    df = build()
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    write_ipc(df, tmp)
+    os.replace(tmp, path)
+    evict(directory, cfg.cache_max_bytes)
+    return df, path if path.exists() else None
@@ -19,3 +19,21 @@ class Config:
     sent_col: str = "sent_id"
     metrics: Sequence[str] = ("rt_chrf","rt_bleu","rt_ter")
     pooling_rule: PoolRule = "any"       # for pooled 2×2
+    sv_vs_only: bool = False             # drop rows outside {SV, VS} at read time
+    models: Sequence[str] | None = None  # keep only these models (pruning model=... partitions)
+    stream: bool = False                 # count-based steps read the input batch by batch
+    batch_size: int = 1_000_000
+    jobs: int = 1                        # steps run in a process pool when > 1
+    use_cache: bool = True               # reuse derive_design output across runs
+    cache_dir: Path | None = None        # default: <out_dir>/.construal_cache
+    cache_max_bytes: int = 4 * 1024**3
+    dedup_winner: str | None = None      # keep the row with the highest value per (sent_id, model)
+    bootstrap: int = 0                   # cluster bootstrap/permutation replicates (0: off)
+    bootstrap_seed: int = 0
+    bootstrap_cluster: str | None = None # resampling unit (default: item_col)
+    incremental: bool = False            # skip steps / per-model rows whose inputs are unchanged
+    by: Sequence[str] | None = None      # run the steps once per combination of these columns
+    results: str = "csv"                 # results backend: "csv" (CSV/TXT files) or "parquet"
+    run_id: str | None = None            # partition for --results parquet (default: start time)
+    trace: bool = False                  # record timing spans to <out_dir>/trace.{json,csv}
+    profile: str | None = None           # "cprofile" or "module:factory" (see common.trace.profiled)
@@ -1,21 +1,373 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextvars import ContextVar
 from pathlib import Path
+from typing import Iterable, Iterator, Sequence
 import pandas as pd
+import glob
 import os
+import threading
+
+# df.attrs key holding {model: rows dropped as duplicate (sent_id, model) keys}
+DUPLICATES_ATTR = "duplicates_dropped"
+
+# Results sink of the step being run (see common.sink); None writes CSV/TXT directly
+SINK: ContextVar = ContextVar("construal_sink", default=None)
+
+def merge_counts(a: dict, b: dict) -> dict:
+    return {k: a.get(k, 0) + b.get(k, 0) for k in sorted({*a, *b})}
 
 def ensure_dir(path: str | os.PathLike) -> None:
     Path(path).parent.mkdir(parents=True, exist_ok=True)
 
-def read_df(path: str | os.PathLike) -> pd.DataFrame:
+def _is_glob(path: str | os.PathLike) -> bool:
+    return any(ch in str(path) for ch in "*?[")
+
+# Arrow IPC file (Feather v2) suffixes; such inputs are memory-mapped
+IPC_SUFFIXES = {".arrow", ".feather", ".ipc"}
+
+def _is_dataset(path: Path) -> bool:
+    # Directories and globs are read as a dataset of shards, as is a single parquet
+    # or IPC file; a single CSV file is read by pandas
+    return _is_glob(path) or path.is_dir() or path.suffix.lower() in {".parquet", *IPC_SUFFIXES}
+
+def _format(files: list[Path]):
+    import pyarrow.fs as fs
+    suffixes = {f.suffix.lower() for f in files}
+    if suffixes <= IPC_SUFFIXES:
+        # Uncompressed IPC buffers are then views of the page cache, shared by every
+        # process reading the same file
+        return "ipc", {"filesystem": fs.LocalFileSystem(use_mmap=True)}
+    return ("csv" if suffixes == {".csv"} else "parquet"), {}
+
+def to_pandas(table, release: bool = False) -> pd.DataFrame:
+    """Convert without consolidating columns into 2-D blocks.
+
+    Numeric columns without nulls stay zero-copy (read-only) views of the Arrow
+    buffers, e.g. of a memory-mapped file; copy-on-write (common.copy_on_write)
+    copies a column only if a step modifies it. With `release`, each Arrow
+    column is freed once converted, so a decoded table and its frame never
+    coexist; the table must not be used afterwards.
+    """
+    return table.to_pandas(split_blocks=True, self_destruct=release)
+
+def input_files(path: str | os.PathLike) -> list[Path]:
+    """The files behind an input path: the file itself, a directory's shards or a glob's matches.
+
+    Hidden files ("." or "_" prefix) are skipped, as the Arrow dataset reader does.
+    """
     path = Path(path)
-    if path.suffix.lower() == ".parquet":
-        return pd.read_parquet(path)
-    return pd.read_csv(path)
+    if _is_glob(path):
+        files = [Path(p) for p in glob.glob(str(path), recursive=True) if os.path.isfile(p)]
+    elif path.is_dir():
+        files = [p for p in path.rglob("*") if p.is_file()]
+    else:
+        return [path]
+    files = sorted(p for p in files if not p.name.startswith((".", "_")))
+    if not files:
+        raise FileNotFoundError(f"No input files under {path}")
+    return files
 
-def write_table(df: pd.DataFrame, path: str) -> None:
+def _dataset(path: Path):
+    """Arrow dataset over one file, a directory or a glob of parquet, IPC/Feather or CSV shards.
+
+    Hive-style directories (model=m1/part-0.parquet) become string columns, so
+    filters on them prune whole shards; fragments are read on Arrow's thread pool.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    files = input_files(path)
+    fmt, fs = _format(files)
+    if not _is_glob(path) and not path.is_dir():
+        return ds.dataset(str(path.absolute()) if fs else path, format=fmt, **fs)
+    base = Path(path)
+    if _is_glob(path):
+        base = Path(*base.parts[:next(i for i, p in enumerate(base.parts) if _is_glob(p))])
+    while "=" in base.name:
+        base = base.parent                  # --in data/model=m1 still yields the model column
+    keys = dict.fromkeys(seg.split("=", 1)[0] for f in files
+                         for seg in f.parent.relative_to(base).parts if "=" in seg)
+    # Partition values stay strings (model=7 is a model name, not a number)
+    partitioning = ds.partitioning(pa.schema([(k, pa.string()) for k in keys]), flavor="hive") if keys else None
+    if fs:
+        files, base = [f.absolute() for f in files], base.absolute()
+    return ds.dataset([str(f) for f in files], format=fmt, partitioning=partitioning,
+                      partition_base_dir=str(base), **fs)
+
+def read_columns(path: str | os.PathLike) -> list[str]:
+    """Column names of the input (including hive partition keys) without loading any rows."""
+    path = Path(path)
+    if _is_dataset(path):
+        return list(_dataset(path).schema.names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def _filter_expression(filters: Sequence[tuple], names: set):
+    # Conjunction of (col, op, value) filters; filters on absent columns are dropped.
+    import pyarrow.dataset as ds
+    expr = None
+    for col, op, value in filters:
+        if col not in names:
+            continue
+        field = ds.field(col)
+        if op == "in":
+            e = field.isin(list(value))
+        elif op == "==":
+            e = field == value
+        elif op == "!=":
+            e = field != value
+        else:
+            raise ValueError(f"Unsupported filter op: {op}")
+        expr = e if expr is None else expr & e
+    return expr
+
+def _filter_frame(df: pd.DataFrame, filters: Sequence[tuple]) -> pd.DataFrame:
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        if col not in df.columns:
+            continue
+        if op == "in":
+            mask &= df[col].isin(list(value))
+        elif op == "==":
+            mask &= df[col] == value
+        elif op == "!=":
+            mask &= df[col] != value
+        else:
+            raise ValueError(f"Unsupported filter op: {op}")
+    return df[mask]
+
+def _first_rows(table, keys: Sequence[str]):
+    # Keep the first row of each key combination via a hash aggregation on the
+    # Arrow table; dropped rows are counted per value of the last key.
+    import numpy as np
+    import pyarrow as pa
+    rows = pa.array(np.arange(table.num_rows))
+    first = table.select(list(keys)).append_column("__row", rows) \
+        .group_by(list(keys), use_threads=False).aggregate([("__row", "min")])
+    keep = np.zeros(table.num_rows, dtype=bool)
+    keep[first["__row_min"].to_numpy()] = True
+    if keep.all():
+        return table, {}
+    dropped = table.filter(pa.array(~keep))[keys[-1]].to_pandas()
+    counts = dropped.astype(object).fillna("<NA>").value_counts()
+    return table.filter(pa.array(keep)), {str(k): int(v) for k, v in counts.items()}
+
+def read_df(path: str | os.PathLike, columns: Iterable[str] | None = None,
+            filters: Sequence[tuple] | None = None, dedup: Sequence[str] | None = None) -> pd.DataFrame:
+    """Load the input, optionally projected to `columns` and pre-filtered.
+
+    `path` is a parquet or CSV file, or a directory or glob of shards (see
+    _dataset); hive partition keys in shard paths become columns. Requested
+    columns that do not exist in the input are ignored, as are filters on
+    them. Parquet projection and filters are pushed down into the pyarrow
+    reader so unused columns and row groups are never decoded.
+    With `dedup`, parquet rows repeating an earlier combination of those
+    columns are dropped before conversion to pandas and counted in
+    df.attrs[DUPLICATES_ATTR].
+    """
+    path = Path(path)
+    want = None if columns is None else list(dict.fromkeys(columns))
+    if _is_dataset(path):
+        return _read_dataset(_dataset(path), want, filters, dedup)
+    df = pd.read_csv(path, usecols=None if want is None else (lambda c: c in want))
+    return _filter_frame(df, filters) if filters else df
+
+def frame_from(data, columns: Iterable[str] | None = None, filters: Sequence[tuple] | None = None,
+               dedup: Sequence[str] | None = None) -> pd.DataFrame:
+    """read_df for an input already in memory: a DataFrame, or a pyarrow Table or RecordBatch.
+
+    `dedup` applies to Arrow input only; derive_design drops duplicates of a DataFrame.
+    """
+    want = None if columns is None else list(dict.fromkeys(columns))
+    if isinstance(data, pd.DataFrame):
+        df = data if want is None else data[[c for c in want if c in data.columns]]
+        return _filter_frame(df, filters) if filters else df
+    import pyarrow.dataset as ds
+    return _read_dataset(ds.dataset(data), want, filters, dedup)
+
+def _read_dataset(dataset, want, filters, dedup) -> pd.DataFrame:
+    names = set(dataset.schema.names)
+    cols = None if want is None else [c for c in want if c in names]
+    table = dataset.to_table(columns=cols, filter=_filter_expression(filters or (), names))
+    dropped = {}
+    if dedup and set(dedup) <= set(table.column_names):
+        table, dropped = _first_rows(table, dedup)
+    df = to_pandas(table, release=True)
+    del table
+    df.attrs[DUPLICATES_ATTR] = dropped
+    return df
+
+def iter_batches(path: str | os.PathLike, columns: Iterable[str] | None = None,
+                 filters: Sequence[tuple] | None = None, batch_size: int = 1_000_000,
+                 files: Iterable[str | os.PathLike] | None = None) -> Iterator[pd.DataFrame]:
+    """Like read_df, but yields the input as DataFrames of at most `batch_size` rows.
+
+    With `files`, only those of the input's shards are read (hive keys still
+    come from their paths).
+    """
+    path = Path(path)
+    want = None if columns is None else list(dict.fromkeys(columns))
+    if _is_dataset(path):
+        dataset = _dataset(path)
+        if files is not None:
+            import pyarrow.dataset as ds
+            keep = {os.path.abspath(f) for f in files}
+            dataset = ds.FileSystemDataset([f for f in dataset.get_fragments() if os.path.abspath(f.path) in keep],
+                                           dataset.schema, dataset.format, dataset.filesystem)
+        names = set(dataset.schema.names)
+        cols = None if want is None else [c for c in want if c in names]
+        expr = _filter_expression(filters or (), names)
+        for batch in dataset.to_batches(columns=cols, filter=expr, batch_size=batch_size):
+            if batch.num_rows:
+                yield to_pandas(batch)
+        return
+    for chunk in pd.read_csv(path, usecols=None if want is None else (lambda c: c in want), chunksize=batch_size):
+        yield _filter_frame(chunk, filters) if filters else chunk
+
+def write_ipc(df: pd.DataFrame, path: str | os.PathLike) -> None:
+    """Write an uncompressed Arrow IPC file that readers can memory-map."""
+    import pyarrow as pa
     ensure_dir(path)
-    df.to_csv(path, index=False)
+    table = pa.Table.from_pandas(df)
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
 
-def write_text(text: str, path: str) -> None:
+def read_ipc(path: str | os.PathLike, rows=None) -> pd.DataFrame:
+    """Memory-map an IPC file; numeric columns are read-only views of the mapping.
+
+    Callers must not modify the returned frame in place; derived frames (slices,
+    selections) are copy-on-write and may be modified freely. With `rows`, only
+    those positions are converted, as df.take(rows), so a small stratum of a
+    large frame costs O(its rows).
+    """
+    import numpy as np
+    import pyarrow as pa
+    table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+    if rows is None:
+        return to_pandas(table)
+    rows = np.asarray(rows)
+    df = to_pandas(table.take(rows))
+    # A RangeIndex is stored as metadata, not a column: give back the original labels
+    ranges = [c for c in (table.schema.pandas_metadata or {}).get("index_columns", []) if isinstance(c, dict)]
+    if ranges:
+        df.index = pd.Index(ranges[0]["start"] + ranges[0]["step"] * rows, name=ranges[0]["name"])
+    return df
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    # Write next to the target and rename into place, so readers (and a crashed
+    # run) never see a partial file
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+class AsyncWriter:
+    """Writes files on a small thread pool while the caller keeps computing.
+
+    At most `max_pending` files are in flight (submit blocks beyond that);
+    each directory is created once; writes to the same path keep their order.
+    Errors are collected and raised by flush().
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 64):
+        self.pid = os.getpid()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="construal-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._dirs: set[Path] = set()
+        self._pending: dict[Path, object] = {}
+
+    def _mkdir(self, d: Path) -> None:
+        with self._lock:
+            if d in self._dirs:
+                return
+        d.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._dirs.add(d)
+
+    def _write(self, path: Path, data: bytes, before) -> None:
+        if before is not None:
+            wait([before])
+        self._mkdir(path.parent)
+        _atomic_write(path, data)
+
+    def submit(self, path: str | os.PathLike, data: bytes) -> None:
+        path = Path(path)
+        self._slots.acquire()
+        with self._lock:
+            fut = self._pool.submit(self._write, path, data, self._pending.get(path))
+            self._pending[path] = fut
+        fut.add_done_callback(lambda _: self._slots.release())
+
+    def flush(self) -> None:
+        """Wait for every submitted write; raise the first error, if any."""
+        with self._lock:
+            futures, self._pending = list(self._pending.values()), {}
+        wait(futures)
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            raise errors[0]
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._pool.shutdown()
+
+_WRITER: AsyncWriter | None = None
+
+def writer() -> AsyncWriter:
+    """This process's background writer (a forked child gets its own)."""
+    global _WRITER
+    if _WRITER is None or _WRITER.pid != os.getpid():
+        _WRITER = AsyncWriter()
+    return _WRITER
+
+def flush_writes() -> None:
+    """Finish all background writes of this process, raising the first failure."""
+    global _WRITER
+    w, _WRITER = _WRITER, None
+    if w is not None and w.pid == os.getpid():
+        w.close()
+
+def csv_bytes(df: pd.DataFrame) -> bytes:
+    # Formatted on the caller's thread: the step may modify df once it returns
+    return df.to_csv(index=False).encode("utf-8")
+
+def write_csv(df: pd.DataFrame, path: str | os.PathLike, background: bool = False) -> None:
+    if background:
+        writer().submit(path, csv_bytes(df))
+        return
+    ensure_dir(path)
+    _atomic_write(Path(path), csv_bytes(df))
+
+def write_txt(text: str, path: str | os.PathLike, background: bool = False) -> None:
+    if background:
+        writer().submit(path, text.encode("utf-8"))
+        return
     ensure_dir(path)
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(text)
+    _atomic_write(Path(path), text.encode("utf-8"))
+
+def write_table(df: pd.DataFrame, path: str) -> None:
+    sink = SINK.get()
+    if sink is None:
+        write_csv(df, path)
+    else:
+        sink.write_table(df, path)
+
+def write_text(text: str, path: str) -> None:
+    sink = SINK.get()
+    if sink is None:
+        write_txt(text, path)
+    else:
+        sink.write_text(text, path)
+
+def write_model(result, path: str) -> None:
+    """A fitted model: its summary text, plus its coefficient table where the sink stores one."""
+    sink = SINK.get()
+    if sink is None:
+        write_txt(result.summary().as_text(), path)
+    else:
+        sink.write_model(result, path)
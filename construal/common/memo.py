@@ -0,0 +1,103 @@
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from .cache import config_fields
+from .config import Config
+from .tables import Cube
+
+def memo_dir(cfg: Config) -> Path:
+    return Path(cfg.out_dir) / ".construal_memo"
+
+@lru_cache(maxsize=1)
+def code_digest() -> str:
+    # Any change to the package source invalidates stored results
+    root = Path(__file__).resolve().parents[1]
+    h = hashlib.sha256()
+    for p in sorted(root.rglob("*.py")):
+        h.update(p.read_bytes())
+    return h.hexdigest()
+
+def _digest(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, default=str, sort_keys=True).encode()).hexdigest()
+
+def _present(df: pd.DataFrame, cols) -> list[str]:
+    return [c for c in dict.fromkeys(cols) if c in df.columns]
+
+def _row_hashes(df: pd.DataFrame, cols: list[str]) -> np.ndarray:
+    if not cols or not len(df):
+        return np.empty(0, dtype=np.uint64)
+    return pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+
+def step_fingerprint(mod, df: pd.DataFrame, cfg: Config) -> str:
+    """Digest of the columns a step reads, the Config and the package source."""
+    cols = _present(df, mod.columns(cfg))
+    h = hashlib.sha256(_row_hashes(df, cols).tobytes()).hexdigest()
+    return _digest({"rows": h, "columns": cols, "dtypes": [str(df[c].dtype) for c in cols],
+                    "config": config_fields(cfg), "code": code_digest()})
+
+def load_step(key: str, fingerprint: str, cfg: Config) -> dict | None:
+    """Stored artifacts of a previous run of step `key` if its fingerprint matches."""
+    path = memo_dir(cfg) / f"step{key}.json"
+    if not path.exists():
+        return None
+    rec = json.loads(path.read_text(encoding="utf-8"))
+    arts = rec.get("artifacts") or {}
+    if rec.get("fingerprint") != fingerprint:
+        return None
+    if not all(Path(o["path"]).exists() for o in arts.get("outputs", [])):
+        return None
+    return arts
+
+def save_step(key: str, fingerprint: str, arts: dict, cfg: Config) -> None:
+    path = memo_dir(cfg) / f"step{key}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"fingerprint": fingerprint, "artifacts": arts}, default=str), encoding="utf-8")
+
+def model_digests(df: pd.DataFrame, cols: list[str], model_col: str) -> dict:
+    """Order-independent digest of each model's rows: (count, Σh, Σh²) of row hashes mod 2**64."""
+    h = _row_hashes(df, _present(df, cols))
+    parts = pd.DataFrame({"m": df[model_col].to_numpy(), "h": h, "h2": h * h})
+    with np.errstate(over="ignore"):
+        agg = parts.groupby("m", observed=True).agg(n=("h", "size"), s1=("h", "sum"), s2=("h2", "sum"))
+    return {str(m): f"{r.n}:{r.s1}:{r.s2}" for m, r in agg.iterrows()}
+
+def memo_rows(cfg: Config, name: str, df: pd.DataFrame, cols, compute) -> list[dict]:
+    """compute(sub) -> per-model row dicts (keyed by "model"), recomputed only for
+    models whose rows changed since the last incremental run; others are reused."""
+    if not cfg.incremental or cfg.model_col not in df.columns:
+        return compute(df)
+    path = memo_dir(cfg) / f"{name}.json"
+    scope = _digest({"columns": _present(df, cols), "config": config_fields(cfg), "code": code_digest()})
+    store = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+    models = store.get("models", {}) if store.get("scope") == scope else {}
+
+    digests = model_digests(df, cols, cfg.model_col)
+    stale = [m for m, d in digests.items() if models.get(m, {}).get("digest") != d]
+    if stale:
+        mask = df[cfg.model_col].astype(str).isin(stale)
+        fresh = {m: [] for m in stale}
+        for r in compute(df[mask.to_numpy()]):
+            fresh[str(r["model"])].append(r)
+        for m in stale:
+            models[m] = {"digest": digests[m], "rows": fresh[m]}
+    models = {m: models[m] for m in digests}            # drop models that disappeared
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"scope": scope, "models": models}, default=int), encoding="utf-8")
+    return [r for m in sorted(models) for r in models[m]["rows"]]
+
+def memo_cube(cfg: Config, name: str, df: pd.DataFrame, cols, build) -> Cube:
+    """build(sub) -> Cube, with per-model slices reused from the last incremental run."""
+    if not cfg.incremental or cfg.model_col not in df.columns:
+        return build(df)
+    na = df[cfg.model_col].isna().to_numpy()
+    ungrouped = build(df[na]).ungrouped
+    def slices(sub):
+        cube = build(sub)
+        return [{"model": m, "counts": c.tolist()} for m, c in zip(cube.groups, cube.counts)]
+    rows = memo_rows(cfg, name, df[~na], cols, slices)
+    counts = np.array([r["counts"] for r in rows], dtype=np.int64).reshape(-1, *ungrouped.shape)
+    return Cube(groups=[r["model"] for r in rows], counts=counts, ungrouped=ungrouped)
@@ -1,18 +1,243 @@
-import statsmodels.formula.api as smf
+import numpy as np
+import pandas as pd
+from scipy.special import expit, log_expit
+from .trace import traced
 
+# statsmodels is imported inside the functions that use it; importing it costs
+# more than most steps take to run.
+
+@traced("fit.ols_cluster")
 def ols_cluster(formula: str, data, cluster):
+    import statsmodels.formula.api as smf
     return smf.ols(formula, data=data).fit(cov_type="cluster", cov_kwds={"groups": cluster})
 
+@traced("fit.ols_cluster_many")
+def ols_cluster_many(responses, rhs: str, data, cluster) -> dict:
+    """ols_cluster(f"{y} ~ {rhs}", data, cluster) for every y in `responses`.
+
+    The design matrix, its pseudo-inverse and the integer cluster codes are
+    built once and shared; each response then costs one matrix-vector product
+    plus its O(n·k) sandwich. Results are assembled as OLS.fit does.
+    """
+    import warnings
+    from patsy import dmatrix
+    from statsmodels.regression.linear_model import OLS, OLSResults, RegressionResultsWrapper
+    from statsmodels.tools.sm_exceptions import SingularMatrixWarning
+    from statsmodels.tools.tools import pinv_extended
+
+    X = dmatrix(rhs, data, return_type="dataframe")
+    pinv, sv = pinv_extended(X.to_numpy())
+    ncp = pinv @ pinv.T
+    rank = np.linalg.matrix_rank(np.diag(sv))
+    codes = pd.factorize(np.asarray(cluster))[0].astype(int)
+    out = {}
+    for y in responses:
+        model = OLS(data[y].astype(float), X)
+        model.pinv_wexog, model.normalized_cov_params, model.wexog_singular_values = pinv, ncp, sv
+        model.rank = rank
+        if rank < X.shape[1]:
+            warnings.warn("The design matrix is rank-deficient. The model parameters are not uniquely determined.",
+                          SingularMatrixWarning, stacklevel=2)
+        model._df_model = float(rank - model.k_constant)
+        model.df_resid = model.nobs - rank
+        res = OLSResults(model, pinv @ model.wendog, normalized_cov_params=ncp,
+                         cov_type="cluster", cov_kwds={"groups": codes})
+        out[y] = RegressionResultsWrapper(res)
+    return out
+
+@traced("fit.ols_hc3")
 def ols_hc3(formula: str, data):
+    import statsmodels.formula.api as smf
     return smf.ols(formula, data=data).fit(cov_type="HC3")
 
-def mixedlm_random_intercept(formula: str, data, group):
+RI_LOG_RATIO = (-25.0, 15.0)              # search range of log(var(u) / scale)
+
+def _ri_gls(g: float, stats: tuple, reml: bool) -> tuple:
+    # GLS at variance ratio g: Cholesky factor of X'V^-1X, its back-substituted
+    # X'V^-1y, the residual sum of squares and its degrees of freedom
+    n, sx, sy, xtx, xty, yty, nobs = stats
+    c = g / (1 + n * g)                       # V_i^-1 = (I - c_i 11') / scale
+    L = np.linalg.cholesky(xtx - (sx.T * c) @ sx)
+    z = np.linalg.solve(L, xty - sx.T @ (c * sy))
+    q = yty - c @ (sy * sy) - z @ z           # GLS residual sum of squares
+    return L, z, q, nobs - len(xty) if reml else nobs
+
+def _ri_objective(t: float, stats: tuple, reml: bool) -> float:
+    # -2 x profile (RE)ML log-likelihood (up to a constant) at variance ratio exp(t)
+    L, z, q, d = _ri_gls(np.exp(t), stats, reml)
+    out = np.log1p(stats[0] * np.exp(t)).sum() + d * np.log(q / d)
+    return out + 2 * np.log(np.diag(L)).sum() if reml else out
+
+def _fit_random_intercept(md, start: float | None = None, reml: bool = True):
+    """Fit a random-intercept MixedLM by profiling the variance ratio
+    gamma = var(u) / scale over per-group sums (n_i, X_i'1, y_i'1).
+
+    Each evaluation costs O(groups * k_fe^2); the data is touched once. The
+    fixed effects and scale come from the same GLS solve; an optimum at the
+    lower end of the range is taken as gamma = 0 (the OLS fit). The rest is
+    assembled as MixedLM.fit does, including its Hessian-based standard errors
+    and warnings, and a log-likelihood that disagrees with MixedLM.loglike
+    raises ValueError.
+    """
+    from scipy.optimize import minimize_scalar
+    from statsmodels.regression.mixed_linear_model import (
+        MixedLMParams, MixedLMResults, MixedLMResultsWrapper, _warn_cov_sing)
+    from statsmodels.tools.sm_exceptions import ConvergenceWarning, SingularMatrixWarning
+    import warnings
+
+    X, y = md.exog, md.endog
+    g, _ = pd.factorize(md.groups)
+    n = np.bincount(g).astype(float)
+    sx = np.stack([np.bincount(g, X[:, j]) for j in range(X.shape[1])], axis=1)
+    stats = (n, sx, np.bincount(g, y), X.T @ X, X.T @ y, y @ y, len(y))
+    f = lambda t: _ri_objective(t, stats, reml)
+
+    t0 = np.log(start) if start and start > 0 else None
+    if t0 is not None and f(t0) < min(f(t0 - 0.5), f(t0 + 0.5)):
+        opt = minimize_scalar(f, bracket=(t0 - 0.5, t0, t0 + 0.5), tol=1e-10)
+    else:
+        opt = minimize_scalar(f, bounds=RI_LOG_RATIO, method="bounded", options={"xatol": 1e-10})
+    if not opt.success:
+        raise ValueError("variance ratio search did not converge")
+    # MixedLM's own fe/scale solves invert cov_re and break down near zero
+    boundary = opt.x < RI_LOG_RATIO[0] + 0.1
+    t = max(opt.x, RI_LOG_RATIO[0])
+    L, z, q, d = _ri_gls(0.0 if boundary else np.exp(t), stats, reml)
+    fe_params, scale = np.linalg.solve(L.T, z), q / d
+
+    # state MixedLM.fit sets up before optimising; its likelihood and Hessian
+    # are singular at exactly zero, so a boundary fit evaluates them at exp(t)
+    md.reml, md.cov_pen, md.fe_pen, md._cov_sing, md._freepat = reml, None, None, 0, None
+    params = MixedLMParams.from_components(fe_params, cov_re=np.array([[np.exp(t)]]))
+    llf = md.loglike(params, profile_fe=False)
+    if not np.isclose(llf, -0.5 * (f(t) + d * (1 + np.log(2 * np.pi))), rtol=1e-8, atol=1e-6):
+        raise ValueError("profiled fit disagrees with MixedLM.loglike")
+    cov_re_unscaled = params.cov_re
+    cov_re = scale * cov_re_unscaled
+    if np.min(np.abs(np.diag(cov_re))) < 0.01:
+        warnings.warn("The MLE may be on the boundary of the parameter space.", ConvergenceWarning, stacklevel=2)
+
+    hess, sing = md.hessian(params)
+    if sing:
+        warnings.warn(_warn_cov_sing, SingularMatrixWarning, stacklevel=2)
+    pcov = np.linalg.inv(-hess)
+    if np.any(np.diag(hess) >= 0):
+        warnings.warn("The Hessian matrix at the estimated parameter values is not positive definite.",
+                      ConvergenceWarning, stacklevel=2)
+
+    res = MixedLMResults(md, params.get_packed(use_sqrt=False, has_fe=True), pcov / scale)
+    res.params_object = params
+    res.fe_params = fe_params
+    res.cov_re = cov_re
+    res.vcomp = scale * params.vcomp
+    res.scale = scale
+    res.cov_re_unscaled = cov_re_unscaled
+    res.method = "REML" if reml else "ML"
+    res.converged = True
+    res.hist = None
+    res.reml = reml
+    res.cov_pen = md.cov_pen
+    res.k_fe, res.k_re, res.k_re2, res.k_vc = md.k_fe, md.k_re, md.k_re2, md.k_vc
+    res.use_sqrt = md.use_sqrt
+    res.freepat = md._freepat
+    return MixedLMResultsWrapper(res)
+
+@traced("fit.mixedlm_random_intercept")
+def mixedlm_random_intercept(formula: str, data, group, start: float | None = None):
+    """Random-intercept MixedLM (REML); `start` is a previous variance ratio
+    (cov_re_unscaled) to warm-start from. Falls back to statsmodels' own
+    optimiser if the profiled solver fails."""
+    import statsmodels.formula.api as smf
     md = smf.mixedlm(formula, data, groups=group)
-    return md.fit(method="lbfgs", maxiter=500, disp=False)
+    try:
+        return _fit_random_intercept(md, start)
+    except (np.linalg.LinAlgError, ValueError):
+        return md.fit(method="lbfgs", maxiter=500, disp=False)
 
+@traced("fit.gee_logit")
 def gee_logit(formula: str, data, group):
     import statsmodels.api as sm
     fam = sm.families.Binomial()
     ind = sm.cov_struct.Exchangeable()
     model = sm.GEE.from_formula(formula, groups=group, data=data, family=fam, cov_struct=ind)
     return model.fit()
+
+def _collapse(data: pd.DataFrame) -> pd.DataFrame:
+    # One row per distinct (covariates, cluster, outcome) with its row count;
+    # rows with missing values are dropped, as patsy would
+    return data.groupby(list(data.columns), observed=True, sort=False).size().reset_index(name="_n")
+
+def _rowwise_logit(formula: str, data: pd.DataFrame, groups: str):
+    import statsmodels.formula.api as smf
+    return smf.logit(formula, data=data).fit(
+        disp=False, cov_type="cluster", cov_kwds={"groups": data[groups].astype(str)})
+
+@traced("fit.clustered_logit")
+def clustered_logit(formula: str, data: pd.DataFrame, groups: str, maxiter: int = 35, tol: float = 1e-10):
+    """Same results as smf.logit(formula, data).fit(cov_type="cluster") with
+    groups=data[groups], fitted from counts per (covariate pattern, cluster, outcome).
+
+    All predictors must be categorical, and `data` should hold only the columns
+    the formula and the clustering use. The likelihood depends on the data only
+    through those counts and the CRV1 sandwich only through per-cluster score
+    sums, so fit time scales with the number of cells rather than rows. Falls
+    back to the row-level fit when the count model is not identified or shows
+    (quasi-)separation, so warnings and failures match the row-level path.
+    """
+    import statsmodels.formula.api as smf
+    cells = _collapse(data)
+    model = smf.logit(formula, data=cells)
+    X, y = model.exog, model.endog
+    w = cells["_n"].to_numpy(dtype=float)
+    n, k = w.sum(), X.shape[1]
+
+    # Newton-Raphson on the frequency-weighted binomial likelihood
+    beta = np.zeros(k)
+    converged = False
+    for _ in range(maxiter):
+        p = expit(X @ beta)
+        hess = (X * (w * p * (1 - p))[:, None]).T @ X
+        try:
+            step = np.linalg.solve(hess, X.T @ (w * (y - p)))
+        except np.linalg.LinAlgError:
+            return _rowwise_logit(formula, data, groups)
+        beta += step
+        if np.max(np.abs(step)) < tol:
+            converged = True
+            break
+    p = expit(X @ beta)
+    if not converged or w[np.abs(y - p) < 1e-4].sum() > 0.1 * n:
+        return _rowwise_logit(formula, data, groups)
+
+    from statsmodels.base.model import LikelihoodModelResults
+    from statsmodels.discrete.discrete_model import BinaryResultsWrapper, LogitResults
+
+    # CRV1 sandwich from per-cluster score sums, with statsmodels' small-sample factor
+    hess = (X * (w * p * (1 - p))[:, None]).T @ X
+    hinv = np.linalg.inv(hess)
+    g, clusters = pd.factorize(cells[groups])
+    scores = np.zeros((len(clusters), k))
+    np.add.at(scores, g, X * (w * (y - p))[:, None])
+    n_groups = len(clusters)
+    cov = hinv @ (scores.T @ scores) @ hinv
+    cov *= n_groups / (n_groups - 1.0) * ((n - 1.0) / (n - k))
+
+    model.nobs = n
+    model.df_resid = n - (model.df_model + 1)
+    fit = LikelihoodModelResults(model, beta, hinv, scale=1.0)
+    fit.mle_retvals = {"converged": True}
+    res = LogitResults(model, fit)
+    res.nobs = n
+    res._separation_etext = []
+    res.cov_type = "cluster"
+    res.cov_params_default = cov
+    res.cov_kwds = {"use_t": False, "adjust_df": True, "use_correction": True,
+                    "description": "Standard Errors are robust to cluster correlation (CRV1)"}
+    res.n_groups = n_groups
+    res.df_resid_inference = n_groups - 1
+    k1 = w @ y
+    res._cache.update(
+        llf=float(w @ (y * log_expit(X @ beta) + (1 - y) * log_expit(-(X @ beta)))),
+        llnull=float(k1 * np.log(k1 / n) + (n - k1) * np.log1p(-k1 / n)),
+    )
+    return BinaryResultsWrapper(res)
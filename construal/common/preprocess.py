@@ -1,7 +1,12 @@
 import json
+from itertools import product
+from typing import Iterable
 import numpy as np
 import pandas as pd
 from .config import Config
+from . import copy_on_write, trace
+from .io import DUPLICATES_ATTR, merge_counts
+from .tables import level_codes
 
 # Minimal determinacy logic
 # Expected mapping (from Polish order):
@@ -16,8 +21,159 @@ def expected_from_pl_order_str(s):
     if s == "ROOT_before_SUBJ":  return "Indef"
     return "None"
 
-def derive_design(df: pd.DataFrame, cfg: Config) -> pd.DataFrame:
-    df = df.copy()
+SRC_ORDER_TO_ORDER = {"SUBJ_before_ROOT": "SV", "ROOT_before_SUBJ": "VS"}
+SCORABLE = ["def", "indef"]
+
+def categorical_map(s: pd.Series, fn, categories=None, ordered: bool = False) -> pd.Series:
+    """Categorical of fn(value), evaluated once per distinct value of `s`.
+
+    Results outside `categories` (or None) become NA. Without `categories`,
+    the sorted distinct results are used.
+    """
+    codes, uniques = pd.factorize(s)
+    mapped = [fn(u) for u in uniques]
+    if categories is None:
+        categories = sorted({m for m in mapped if m is not None})
+    index = {c: i for i, c in enumerate(categories)}
+    lut = np.array([index.get(m, -1) for m in mapped] + [-1], dtype=np.int64)   # code -1 (NA) -> -1
+    cat = pd.Categorical.from_codes(lut[codes], categories=categories, ordered=ordered)
+    return pd.Series(cat, index=s.index, name=s.name)
+
+# Columns filled from the decode_params JSON/struct: output column -> key
+DECODE_KEYS = {
+    "beam_used": "num_beams",
+    "top_p_used": "top_p",
+}
+
+# Raw (pre-rename) columns derive_design may read, besides the cfg-named ones
+RAW_COLUMNS = (
+    "sentence_id", "ann_det_general", "pool_type", "src_order",
+    "src_order_binary", "ann_order_binary", "mode", "strategy",
+    "decode_params", *DECODE_KEYS,
+)
+
+def _parse_decode(v) -> dict:
+    try:
+        obj = json.loads(v) if isinstance(v, str) else (v or {})
+    except Exception:
+        return {}
+    return obj if isinstance(obj, dict) else {}
+
+def extract_decode_params(s: pd.Series, keys: dict) -> pd.DataFrame:
+    """Pull `keys` ({out_col: key}) out of a decode_params column in one pass.
+
+    Struct-typed columns (Arrow structs or dicts) are read field by field in
+    pyarrow; JSON strings are parsed once per distinct value and mapped back
+    through the factorized codes. Unparseable or missing entries give NA.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    first = s.dropna().iloc[0] if s.notna().any() else None
+    if isinstance(s.dtype, pd.ArrowDtype) or isinstance(first, dict):
+        try:
+            arr = pa.array(s if isinstance(s.dtype, pd.ArrowDtype) else s.to_numpy(dtype=object), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arr = None
+        if arr is not None and pa.types.is_struct(arr.type):
+            names = {f.name for f in arr.type}
+            return pd.DataFrame({
+                out: (pd.Series(pc.struct_field(arr, key).to_pandas(), index=s.index) if key in names
+                      else pd.Series(None, index=s.index, dtype=object))
+                for out, key in keys.items()
+            })
+
+    try:
+        codes, uniques = pd.factorize(s)
+    except TypeError:
+        # unhashable mix (e.g. dicts alongside strings): parse row by row
+        codes, uniques = np.arange(len(s)), list(s)
+    parsed = [_parse_decode(u) for u in uniques]
+    out = {}
+    for col, key in keys.items():
+        lut = np.array([p.get(key) for p in parsed] + [None], dtype=object)   # code -1 -> None
+        out[col] = pd.Series(lut[codes], index=s.index).infer_objects()
+    return pd.DataFrame(out, index=s.index)
+
+# Config fields that derive_design, design_columns and design_filters read: the
+# design cache is keyed on these. Keep in sync; cfg.by only adds columns to
+# the projection, which the cache key has anyway.
+DESIGN_FIELDS = ("sent_col", "item_col", "model_col", "order_col", "det_col", "success_col", "tau_col",
+                 "family_col", "gen2_col", "dedup_winner", "sv_vs_only", "models")
+
+def design_columns(cfg: Config, available: Iterable[str], step_columns: Iterable[str] = ()) -> list[str]:
+    """Subset of `available` needed by derive_design plus the given step columns."""
+    want = set(step_columns) | set(RAW_COLUMNS) | {
+        cfg.sent_col, cfg.item_col, cfg.model_col, cfg.order_col,
+        cfg.det_col, cfg.success_col,
+    } | ({cfg.dedup_winner} if cfg.dedup_winner else set()) | set(cfg.by or ())
+    return [c for c in available if c in want or str(c).startswith("sent_id")]
+
+def design_filters(cfg: Config, available: Iterable[str]) -> list[tuple]:
+    """Row filters on raw columns that are safe to push down into the reader."""
+    available = set(available)
+    filters = []
+    if cfg.sv_vs_only:
+        if cfg.order_col in available:
+            # derive_design upper-cases order labels, so accept any casing
+            variants = ["".join(p) for o in ("sv", "vs") for p in product(*[(ch, ch.upper()) for ch in o])]
+            filters.append((cfg.order_col, "in", variants))
+        elif "src_order" in available:
+            filters.append(("src_order", "in", ["SUBJ_before_ROOT", "ROOT_before_SUBJ"]))
+    if cfg.models and cfg.model_col in available:
+        filters.append((cfg.model_col, "in", [str(m) for m in cfg.models]))
+    return filters
+
+def first_occurrence(df: pd.DataFrame, keys: list[str], winner: str | None = None) -> np.ndarray:
+    """Mask keeping one row per `keys` combination, found by hashing (no sort).
+
+    The first occurrence in frame order wins, or with `winner` the row with the
+    highest value of that column (ties and all-missing groups keep the first).
+    """
+    if winner is None or winner not in df.columns:
+        return ~df.duplicated(subset=keys, keep="first").to_numpy()
+    codes = df.groupby(keys, dropna=False, sort=False, observed=True).ngroup().to_numpy()
+    w = pd.to_numeric(df[winner], errors="coerce")
+    best = w.groupby(codes).transform("max")
+    idx = np.flatnonzero(((w == best) | best.isna()).to_numpy())
+    keep = np.zeros(len(df), dtype=bool)
+    keep[idx[~pd.Series(codes[idx]).duplicated().to_numpy()]] = True
+    return keep
+
+def duplicate_counts(models: pd.Series) -> dict:
+    return {str(k): int(v) for k, v in models.astype(object).fillna("<NA>").value_counts().items()}
+
+def label_columns(cfg: Config) -> list[str]:
+    # Categoricals whose categories are the values present in the data
+    return [cfg.model_col, cfg.family_col, cfg.gen2_col, "strategy"]
+
+@copy_on_write()
+def subset_design(df: pd.DataFrame, cfg: Config, where: dict) -> pd.DataFrame:
+    """Rows of a derived frame where each column in `where` takes one of the
+    given values; label categories are trimmed to what is left, as if the
+    input had been filtered before derive_design."""
+    mask = np.ones(len(df), dtype=bool)
+    for col, values in where.items():
+        if col not in df.columns:
+            raise ValueError(f"Unknown column: {col}")
+        values = list(values)
+        if pd.api.types.is_numeric_dtype(df[col]):
+            values = pd.to_numeric(values)
+        mask &= df[col].isin(values).to_numpy()
+    if mask.all():
+        return df
+    df = df[mask]
+    for col in label_columns(cfg):
+        if col in df.columns:
+            df[col] = df[col].cat.remove_unused_categories()
+    return df
+
+@copy_on_write()
+def derive_design(df: pd.DataFrame, cfg: Config, copy: bool = True) -> pd.DataFrame:
+    if copy:
+        df = df.copy(deep=False)        # copy-on-write: columns are shared until replaced
+    stage = trace.stages("derive_design", rows_in=len(df))
+    stage.next("ids")
 
     # --- (0) Fix odd header like "sent_id/...selected_summary.parquet ..." -> "sent_id"
     bad_sent_cols = [c for c in df.columns if str(c).startswith("sent_id")]
@@ -34,6 +190,7 @@ def derive_design(df: pd.DataFrame, cfg: Config) -> pd.DataFrame:
         df[cfg.item_col] = df[cfg.sent_col]
 
     # --- (2) Map your schema -> expected names
+    stage.next("rename")
     # ann_det_general -> det_cat; pool_type -> gen2
     colmap = {
         "ann_det_general": cfg.det_col,
@@ -44,63 +201,50 @@ def derive_design(df: pd.DataFrame, cfg: Config) -> pd.DataFrame:
             df.rename(columns={src: dst}, inplace=True)
 
     # --- (3) order_cond from src_order (and normalize)
+    stage.next("order")
     if cfg.order_col not in df.columns and "src_order" in df.columns:
-        src = df["src_order"].astype("string")
-        df[cfg.order_col] = src.map({
-            "SUBJ_before_ROOT": "SV",
-            "ROOT_before_SUBJ": "VS"
-        })
+        df[cfg.order_col] = categorical_map(df["src_order"], lambda v: SRC_ORDER_TO_ORDER.get(str(v)))
     if cfg.order_col in df.columns:
-        df[cfg.order_col] = (
-            df[cfg.order_col]
-            .astype("string")
-            .str.upper()
-            .map({"SV": "SV", "VS": "VS"})
+        df[cfg.order_col] = categorical_map(
+            df[cfg.order_col], lambda v: str(v).upper(), categories=["SV", "VS"]
         )
-        df[cfg.order_col] = pd.Categorical(df[cfg.order_col], categories=["SV", "VS"])
 
     # --- (4) Determiner normalization to match determinacy ("Def"/"Indef"/"None")
+    stage.next("det")
     if cfg.det_col in df.columns:
-        df[cfg.det_col] = (
-            df[cfg.det_col]
-            .astype("string")
-            .str.strip()
-            .str.title()
-            .map({"Def": "Def", "Indef": "Indef", "None": "None"})
-        )
-        df[cfg.det_col] = pd.Categorical(
-            df[cfg.det_col], categories=["None", "Indef", "Def"], ordered=True
+        df[cfg.det_col] = categorical_map(
+            df[cfg.det_col], lambda v: str(v).strip().title(),
+            categories=["None", "Indef", "Def"], ordered=True,
         )
 
     # --- (5) Strategy derivation (from 'mode' and/or 'decode_params')
+    stage.next("strategy")
     if "strategy" not in df.columns:
         if "mode" in df.columns:
-            df["strategy"] = df["mode"].astype("string").str.lower()
+            df["strategy"] = categorical_map(df["mode"], lambda v: str(v).lower())
         else:
-            df["strategy"] = pd.Series(pd.NA, index=df.index, dtype="string")
+            df["strategy"] = pd.Categorical([None] * len(df), categories=[])
 
+    stage.next("decode_params")
     if "decode_params" in df.columns:
-        def _extract(dp, key):
-            try:
-                obj = json.loads(dp) if isinstance(dp, str) else (dp or {})
-                return obj.get(key, None)
-            except Exception:
-                return None
-        if "beam_used" not in df.columns:
-            df["beam_used"] = df["decode_params"].apply(lambda x: _extract(x, "num_beams"))
-        if "top_p_used" not in df.columns:
-            df["top_p_used"] = df["decode_params"].apply(lambda x: _extract(x, "top_p"))
-
-    # --- (6) Core dtypes
-    for col in [cfg.model_col, cfg.family_col, cfg.gen2_col, "strategy"]:
+        todo = {col: key for col, key in DECODE_KEYS.items() if col not in df.columns}
+        if todo:
+            extracted = extract_decode_params(df["decode_params"], todo)
+            for col in todo:
+                df[col] = extracted[col]
+
+    # --- (6) Core dtypes: low-cardinality labels stay categorical end to end
+    stage.next("dtypes")
+    for col in label_columns(cfg):
         if col in df.columns:
-            df[col] = df[col].astype("string")
+            df[col] = categorical_map(df[col], str)
 
     if cfg.tau_col in df.columns:
         df[cfg.tau_col] = pd.to_numeric(df[cfg.tau_col], errors="coerce")
 
     # --- (7) Handle success column creation - this is the key fix
     # First check if success column already exists and try to use it
+    stage.next("success")
     if cfg.success_col in df.columns:
         df[cfg.success_col] = pd.to_numeric(df[cfg.success_col], errors="coerce").astype("Int64")
     else:
@@ -117,44 +261,37 @@ def derive_design(df: pd.DataFrame, cfg: Config) -> pd.DataFrame:
         
         # Approach 2: Determinacy-based comparison (fallback)
         elif cfg.det_col in df.columns:
-            # Expected determinacy from source order
-            exp = pd.Series("None", index=df.index, dtype="string")
-            
+            # Expected determinacy from source order, as codes into SCORABLE
+            # (-1 for anything that is not def/indef)
+            exp = np.full(len(df), -1)
             if "src_order_binary" in df.columns:
-                exp = pd.to_numeric(df["src_order_binary"], errors="coerce").map(expected_from_pl_order_binary)
+                b = pd.to_numeric(df["src_order_binary"], errors="coerce").to_numpy()
+                exp = np.select([b == 1, b == 0], [0, 1], -1)
             elif "src_order" in df.columns:
-                exp = df["src_order"].astype("string").map(expected_from_pl_order_str)
-            
-            # Normalize both sides to lowercase (and strip, just in case)
-            det = df[cfg.det_col].astype("string").str.strip().str.lower()
-            exp = exp.astype("string").str.strip().str.lower()
+                exp = level_codes(df["src_order"], ["SUBJ_before_ROOT", "ROOT_before_SUBJ"])
+
+            # Normalize the determiner on its distinct values only
+            det = level_codes(df[cfg.det_col], SCORABLE, normalize=lambda v: str(v).strip().lower())
 
             # Only score success for scorable pairs (both def/indef)
-            valid = {"def", "indef"}
-            mask = det.isin(valid) & exp.isin(valid)
-            # Create comparison
-            cmp_bool = det.eq(exp)
-            arr = np.where(
-                mask, cmp_bool.fillna(False).to_numpy(dtype=object), np.nan
-            )
-
-            df[cfg.success_col] = (
-                pd.Series(arr, index=df.index)
-                .map({True: 1, False: 0})
-                .astype("Int64")
-            )
+            mask = (det >= 0) & (exp >= 0)
+            df[cfg.success_col] = pd.arrays.IntegerArray((det == exp).astype("int64"), ~mask)
             success_created = True
-        
+
         # If we still couldn't create the success column, create a dummy one
         if not success_created:
             print(f"Warning: Could not derive {cfg.success_col} column. Creating dummy column with all NAs.")
             df[cfg.success_col] = pd.Series(pd.NA, index=df.index, dtype="Int64")
 
-    # --- (8) Enforce one row per (sent_id, model)
+    # --- (8) Enforce one row per (sent_id, model); dropped rows are counted
+    # per model in df.attrs (on top of any dropped while reading)
+    stage.next("dedup")
     if cfg.sent_col in df.columns and cfg.model_col in df.columns:
-        df = (
-            df.sort_values([cfg.sent_col, cfg.model_col])
-              .drop_duplicates(subset=[cfg.sent_col, cfg.model_col], keep="first")
-        )
+        keep = first_occurrence(df, [cfg.sent_col, cfg.model_col], cfg.dedup_winner)
+        dropped = merge_counts(df.attrs.get(DUPLICATES_ATTR, {}), duplicate_counts(df.loc[~keep, cfg.model_col]))
+        if not keep.all():
+            df = df[keep]
+        df.attrs[DUPLICATES_ATTR] = dropped
 
+    stage.close(rows_out=len(df))
     return df
\ No newline at end of file
@@ -0,0 +1,121 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from .config import Config
+from .tables import ORDERS, level_codes
+from .trace import traced
+
+# Cluster draws per task; bounds the (replicates × clusters) weight matrix
+CHUNK_CELLS = 1 << 22
+
+def cluster_sums(df: pd.DataFrame, cluster_col: str, order_col: str, value_col: str,
+                 by: str | None = None) -> dict:
+    """Per-cluster (sum_SV, n_SV, sum_VS, n_VS) arrays of `value_col`.
+
+    Returns {None: pooled array} plus one array per value of `by` (e.g. the
+    model), so no group value can collide with the pooled key.
+    Rows outside SV/VS or with a missing value or cluster are ignored.
+    """
+    o = level_codes(df[order_col], ORDERS)
+    v = pd.to_numeric(df[value_col], errors="coerce").to_numpy(dtype=float)
+    c, _ = pd.factorize(df[cluster_col])
+    ok = (o >= 0) & (c >= 0) & ~np.isnan(v)
+
+    def table(mask):
+        cc, uniq = pd.factorize(c[mask])
+        cell = cc * 2 + o[mask]
+        out = np.zeros((len(uniq), 4))
+        out[:, 0::2] = np.bincount(cell, v[mask], minlength=2 * len(uniq)).reshape(-1, 2)
+        out[:, 1::2] = np.bincount(cell, minlength=2 * len(uniq)).reshape(-1, 2)
+        return out
+
+    tables = {None: table(ok)}
+    if by is not None and by in df.columns:
+        g, groups = pd.factorize(df[by], sort=True)
+        for i, m in enumerate(groups):
+            tables[m] = table(ok & (g == i))
+    return {k: t for k, t in tables.items() if len(t)}
+
+def success_stats(t: np.ndarray) -> dict:
+    """SV/VS success contrasts from totals t[..., :] = (k_SV, n_SV, k_VS, n_VS)."""
+    k1, n1, k2, n2 = np.moveaxis(t, -1, 0)
+    cells = np.stack([k1, n1 - k1, k2, n2 - k2])
+    cells = cells + 0.5 * (cells <= 0).any(axis=0)       # Haldane–Anscombe, as chi2_2x2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {"diff_VS_minus_SV": k2 / n2 - k1 / n1,
+                "log_or_SV_vs_VS": np.log(cells[0] * cells[3] / (cells[1] * cells[2]))}
+
+def mean_stats(t: np.ndarray) -> dict:
+    """Difference of means from totals t[..., :] = (sum_SV, n_SV, sum_VS, n_VS)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {"mean_diff_VS_minus_SV": t[..., 2] / t[..., 3] - t[..., 0] / t[..., 1]}
+
+def _draw(kind: str, table: np.ndarray, n: int, seed: np.random.SeedSequence) -> np.ndarray:
+    # (n, 4) replicate totals; runs in pool workers, so it only sees arrays
+    rng = np.random.default_rng(seed)
+    C = len(table)
+    if kind == "bootstrap":
+        # Resample clusters with replacement: multiplicities via one bincount
+        idx = rng.integers(0, C, size=(n, C)) + (np.arange(n) * C)[:, None]
+        w = np.bincount(idx.ravel(), minlength=n * C).reshape(n, C)
+        return w @ table
+    # Permutation: shuffle the clusters' order labels (majority label for mixed clusters)
+    s, m = table[:, 0] + table[:, 2], table[:, 1] + table[:, 3]
+    vs = rng.permuted(np.tile(table[:, 3] > table[:, 1], (n, 1)), axis=1).astype(float)
+    s2, m2 = vs @ s, vs @ m
+    return np.stack([s.sum() - s2, m.sum() - m2, s2, m2], axis=1)
+
+def _relabelled(table: np.ndarray) -> np.ndarray:
+    # Observed totals under the permutation scheme's one-label-per-cluster view
+    vs = table[:, 3] > table[:, 1]
+    s, m = table[:, 0] + table[:, 2], table[:, 1] + table[:, 3]
+    return np.array([s[~vs].sum(), m[~vs].sum(), s[vs].sum(), m[vs].sum()])
+
+@traced("resample", "test")
+def resample(tables: dict, stat_fn, replicates: int, seed: int = 0, jobs: int = 1) -> pd.DataFrame:
+    """Cluster bootstrap CIs and permutation p-values for each table in `tables`.
+
+    One row per (table, statistic); the pooled table (key None) has
+    pooled=True and an empty group. Replicates are drawn in chunks, each from its own child of
+    SeedSequence(seed), so results do not depend on `jobs`.
+    """
+    root = np.random.SeedSequence(seed)
+    tasks = []
+    for key, table in tables.items():
+        per = max(1, CHUNK_CELLS // len(table))
+        for kind, ss in zip(("bootstrap", "permutation"), root.spawn(2)):
+            sizes = [min(per, replicates - i) for i in range(0, replicates, per)]
+            tasks += [(key, kind, table, n, s) for n, s in zip(sizes, ss.spawn(len(sizes)))]
+
+    args = [t[1:] for t in tasks]
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            draws = list(pool.map(_draw, *zip(*args)))
+    else:
+        draws = [_draw(*a) for a in args]
+    out = {}
+    for (key, kind, *_), d in zip(tasks, draws):
+        out.setdefault((key, kind), []).append(d)
+
+    rows = []
+    for key, table in tables.items():
+        est = stat_fn(table.sum(axis=0))
+        obs = stat_fn(_relabelled(table))
+        boot = stat_fn(np.concatenate(out[key, "bootstrap"]))
+        perm = stat_fn(np.concatenate(out[key, "permutation"]))
+        for name, value in est.items():
+            b, p = boot[name], perm[name]
+            b, p = b[np.isfinite(b)], p[np.isfinite(p)]
+            rows.append({
+                "pooled": key is None, "group": key, "statistic": name, "estimate": float(value),
+                "boot_se": float(b.std(ddof=1)) if len(b) > 1 else np.nan,
+                "ci_low": float(np.percentile(b, 2.5)) if len(b) else np.nan,
+                "ci_high": float(np.percentile(b, 97.5)) if len(b) else np.nan,
+                "perm_p": float((1 + (np.abs(p) >= abs(obs[name]) - 1e-12).sum()) / (len(p) + 1))
+                          if len(p) and np.isfinite(obs[name]) else np.nan,
+                "n_clusters": len(table), "replicates": replicates,
+            })
+    return pd.DataFrame(rows)
+
+def cluster_col(cfg: Config) -> str:
+    return cfg.bootstrap_cluster or cfg.item_col
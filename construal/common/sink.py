@@ -0,0 +1,246 @@
+import json
+from contextlib import contextmanager
+from dataclasses import asdict
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from .config import Config
+from .io import SINK, write_csv, write_txt, writer
+from .typing import Artifact, Artifacts
+
+# Results backends. Steps keep calling io.write_table / write_text / write_model
+# with their CSV/TXT paths; the sink opened around each step decides what is
+# actually written. "csv" (the default) is the original one-file-per-artifact
+# layout; "parquet" writes typed datasets under <out_dir>/results, a few files
+# per run rather than one per artifact:
+#
+#   tables/step=<NN>/run=<run>/part-0.parquet         the step's tables, with an artifact column
+#   coefficients/step=<NN>/run=<run>/part-0.parquet   every fitted model of the step
+#   texts/run=<run>/part-0.parquet                    (step, artifact, text) rows of the run
+BACKENDS = ("csv", "parquet")
+
+COEF_COLUMNS = ["artifact", "equation", "term", "coef", "se", "stat", "p", "ci_low", "ci_high"]
+
+def coef_table(result, artifact: str = "") -> pd.DataFrame:
+    """params, SE, test statistic, p-value and 95% CI of a fitted statsmodels model."""
+    params = result.params
+    ci = result.conf_int()
+    if isinstance(params, pd.DataFrame):
+        # MNLogit: one column per non-reference outcome; conf_int is (outcome, term)-indexed
+        equation = [str(e) for e in ci.index.get_level_values(0)]
+        term = [str(t) for t in ci.index.get_level_values(1)]
+        flat = lambda x: np.asarray(x, dtype=float).ravel(order="F")
+    else:
+        equation, term = None, [str(t) for t in params.index]
+        flat = lambda x: np.asarray(x, dtype=float)
+    ci = np.asarray(ci, dtype=float)
+    return pd.DataFrame({
+        "artifact": artifact, "equation": equation, "term": term,
+        "coef": flat(params), "se": flat(result.bse), "stat": flat(result.tvalues),
+        "p": flat(result.pvalues), "ci_low": ci[:, 0], "ci_high": ci[:, 1],
+    }, columns=COEF_COLUMNS)
+
+def _parquet_bytes(table) -> bytes:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if isinstance(table, pd.DataFrame):
+        table = pa.Table.from_pandas(table, preserve_index=False)
+    buf = pa.BufferOutputStream()
+    pq.write_table(table, buf)
+    return buf.getvalue().to_pybytes()
+
+# Both sinks hand finished bytes to the process's background writer (io.writer),
+# so a step's disk I/O overlaps the next computation; io.flush_writes() waits
+# for it and raises any write error.
+
+class CsvSink:
+    """One CSV or TXT file per artifact, at the path the step asked for."""
+
+    def write_table(self, df: pd.DataFrame, path: str) -> None:
+        write_csv(df, path, background=True)
+
+    def write_text(self, text: str, path: str) -> None:
+        write_txt(text, path, background=True)
+
+    def write_model(self, result, path: str) -> None:
+        write_txt(result.summary().as_text(), path, background=True)
+
+    def close(self) -> None:
+        pass
+
+    def resolve(self, arts: dict) -> dict:
+        return arts
+
+class ParquetSink:
+    """Typed parquet datasets under <out_dir>/results, partitioned by step and run.
+
+    Tables and coefficients are buffered and written as one file each when the
+    step's sink closes (tables whose column types clash go to further parts).
+    Texts are handed back with the resolved artifacts and written once per run
+    by write_texts.
+    """
+
+    def __init__(self, root: Path, step: str, run: str):
+        self.root, self.step, self.run = Path(root), step, run
+        self.tables: dict[str, pd.DataFrame] = {}   # requested path -> table
+        self.coefs: dict[str, pd.DataFrame] = {}
+        self.texts: dict[str, str] = {}
+        self.written: dict[str, dict] = {}      # requested path -> stored artifact
+
+    def _partition(self, *parts: str) -> Path:
+        return self.root.joinpath(*parts, f"step={self.step}", f"run={self.run}")
+
+    def write_table(self, df: pd.DataFrame, path: str) -> None:
+        name = Path(path).stem
+        self.tables[str(path)] = df
+        self.written[str(path)] = {"kind": "parquet", "path": None,
+                                   "summary": {"artifact": name, "rows": len(df), "columns": [str(c) for c in df.columns]}}
+
+    def write_text(self, text: str, path: str) -> None:
+        name = Path(path).stem
+        self.texts[name] = text
+        self.written[str(path)] = {"kind": "parquet", "path": str(texts_path(self.root, self.run)),
+                                   "summary": {"artifact": name}}
+
+    def write_model(self, result, path: str) -> None:
+        name = Path(path).stem
+        self.coefs[name] = coef_table(result, name)
+        self.write_text(result.summary().as_text(), path)
+        self.written[str(path)] = {"kind": "parquet", "path": str(self._partition("coefficients") / "part-0.parquet"),
+                                   "summary": {"artifact": name, "rows": len(self.coefs[name]), "text": True}}
+
+    def close(self) -> None:
+        import pyarrow as pa
+        parts: list[list] = []                   # [schema, tables, requested paths] per file
+        for path, df in self.tables.items():
+            t = pa.Table.from_pandas(df, preserve_index=False)
+            t = t.add_column(0, "artifact", pa.array([Path(path).stem] * len(t), pa.string()))
+            for part in parts:
+                try:
+                    part[0] = pa.unify_schemas([part[0], t.schema])
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    continue
+                part[1].append(t)
+                part[2].append(path)
+                break
+            else:
+                parts.append([t.schema, [t], [path]])
+        for i, (_, tables, paths) in enumerate(parts):
+            out = self._partition("tables") / f"part-{i}.parquet"
+            writer().submit(out, _parquet_bytes(pa.concat_tables(tables, promote_options="default")))
+            for path in paths:
+                self.written[path]["path"] = str(out)
+        if self.coefs:
+            schema = pa.schema([(c, pa.string()) for c in COEF_COLUMNS[:3]] +
+                               [(c, pa.float64()) for c in COEF_COLUMNS[3:]])
+            coefs = pd.concat(list(self.coefs.values()), ignore_index=True)
+            writer().submit(self._partition("coefficients") / "part-0.parquet",
+                            _parquet_bytes(pa.Table.from_pandas(coefs, schema=schema, preserve_index=False)))
+
+    def resolve(self, arts: dict) -> dict:
+        """The step's artifacts with their requested CSV/TXT paths replaced by
+        what was stored, and its texts (for write_texts) under "texts"."""
+        outs = [self.written.get(str(o["path"]), o) for o in arts.get("outputs", [])]
+        texts = [{"step": self.step, "artifact": n, "text": t} for n, t in self.texts.items()]
+        return {**arts, "outputs": outs, **({"texts": texts} if texts else {})}
+
+def texts_path(root: Path, run: str) -> Path:
+    return Path(root) / "texts" / f"run={run}" / "part-0.parquet"
+
+def write_texts(results: dict, cfg: Config) -> None:
+    """Write the texts of a run's steps (`results` is {key: (artifacts, timing)})
+    as one parquet file; a no-op unless cfg.results is "parquet". Steps skipped
+    by --incremental must be included (their memo entries keep their texts),
+    or a rerun into the same run would drop them from the file."""
+    texts = [t for arts, _ in results.values() for t in arts.get("texts", [])]
+    if cfg.results == "parquet" and texts:
+        out = texts_path(Path(cfg.out_dir) / "results", cfg.run_id or "default")
+        writer().submit(out, _parquet_bytes(pd.DataFrame(texts, columns=["step", "artifact", "text"])))
+
+class MemorySink:
+    """Keeps every artifact in memory: tables as DataFrames (kind "csv"), texts
+    as strings ("txt") and fitted models as their coefficient table
+    ("coefficients", with the summary text in the artifact's summary). With
+    `disk`, artifacts are also written through that sink, and kind and path
+    describe the file it wrote."""
+
+    def __init__(self, disk=None):
+        self.disk = disk
+        self.stored: dict[str, dict] = {}       # requested path -> {"kind", "data", "summary"}
+
+    def write_table(self, df: pd.DataFrame, path: str) -> None:
+        self.stored[str(path)] = {"kind": "csv", "data": df, "summary": {"artifact": Path(path).stem, "rows": len(df)}}
+        if self.disk is not None:
+            self.disk.write_table(df, path)
+
+    def write_text(self, text: str, path: str) -> None:
+        self.stored[str(path)] = {"kind": "txt", "data": text, "summary": {"artifact": Path(path).stem}}
+        if self.disk is not None:
+            self.disk.write_text(text, path)
+
+    def write_model(self, result, path: str) -> None:
+        name = Path(path).stem
+        text = result.summary().as_text()
+        coefs = coef_table(result, name)
+        self.stored[str(path)] = {"kind": "coefficients", "data": coefs, "summary": {"artifact": name, "rows": len(coefs), "text": text}}
+        if self.disk is not None:
+            self.disk.write_model(result, path)
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
+
+    def resolve(self, arts: dict) -> dict:
+        """The step's outputs (as stored by `disk`, if any) with their data attached;
+        artifacts the step wrote but did not list come last."""
+        listed = arts.get("outputs", [])
+        stored = self.disk.resolve(arts) if self.disk is not None else arts
+        outs = stored["outputs"]
+        requested = [str(o["path"]) for o in listed]
+        own = self.disk is None                 # kind describes the data unless a file was written
+        outs = [{**o, "kind": self.stored[p]["kind"] if own else o["kind"], "summary": {**(o.get("summary") or {}), **self.stored[p]["summary"]},
+                 "data": self.stored[p]["data"]} if p in self.stored else o
+                for p, o in zip(requested, outs)]
+        outs += [{"path": p, **v} for p, v in self.stored.items() if p not in requested]
+        return {**stored, "outputs": outs}
+
+def step_label(key: str) -> str:
+    return f"{int(key):02d}" if key.isdigit() else key
+
+def make_sink(cfg: Config, key: str):
+    if cfg.results == "csv":
+        return CsvSink()
+    if cfg.results == "parquet":
+        return ParquetSink(Path(cfg.out_dir) / "results", step_label(key), cfg.run_id or "default")
+    raise ValueError(f"Unknown results backend: {cfg.results} (expected one of {BACKENDS})")
+
+@contextmanager
+def open_sink(cfg: Config, key: str, sink=None):
+    """Route the io.write_* calls made inside the block to `sink`, by default the configured backend."""
+    sink = sink if sink is not None else make_sink(cfg, key)
+    token = SINK.set(sink)
+    try:
+        yield sink
+        sink.close()
+    finally:
+        SINK.reset(token)
+
+def to_artifacts(arts: dict, notes: dict | None = None) -> Artifacts:
+    """A step's artifacts dict as Artifacts, keeping in-memory data (see MemorySink)."""
+    outputs = [Artifact(kind=o["kind"], path=str(o["path"]), summary=o.get("summary"), data=o.get("data"))
+               for o in arts.get("outputs", [])]
+    return Artifacts(step=arts.get("step", "?"), outputs=outputs, notes=notes)
+
+def manifest(results: dict, cfg: Config) -> dict:
+    """The run's artifacts as Artifacts/Artifact records; `results` is {key: (artifacts, timing)}."""
+    steps = []
+    for key, (arts, timing) in results.items():
+        outputs = [Artifact(kind=o["kind"], path=str(o["path"]), summary=o.get("summary"))
+                   for o in arts.get("outputs", [])]
+        steps.append(Artifacts(step=arts.get("step", key), outputs=outputs, notes=dict(timing)))
+    return {"run": cfg.run_id, "results": cfg.results, "steps": [asdict(a) for a in steps]}
+
+def write_manifest(results: dict, cfg: Config) -> Path:
+    path = Path(cfg.out_dir) / "manifest.json"
+    write_txt(json.dumps(manifest(results, cfg), indent=2, default=str), path)
+    return path
@@ -1,17 +1,27 @@
 import numpy as np
-from scipy import stats
-from statsmodels.stats.proportion import proportions_ztest, binom_test as sm_binom_test
-from statsmodels.stats.contingency_tables import StratifiedTable
-from statsmodels.stats.multitest import multipletests
+import pandas as pd
+from scipy import special, stats
 from math import sqrt
+from .trace import traced
+
+# statsmodels submodules are imported by the functions that need them
 
 def holm_correction(pvals):
-    import numpy as np
+    """Holm step-down adjusted p-values; NaN inputs stay NaN and are not counted."""
     p = np.asarray(list(pvals), dtype=float)
-    _, p_adj, _, _ = multipletests(p, method="holm")
-    return p_adj
+    out = np.full(p.shape, np.nan)
+    ok = ~np.isnan(p)
+    q = p[ok]
+    m = len(q)
+    order = np.argsort(q, kind="mergesort")
+    adj = np.empty(m)
+    adj[order] = np.minimum(np.maximum.accumulate((m - np.arange(m)) * q[order]), 1.0)
+    out[ok] = adj
+    return out
 
+@traced("test.proportion_tests", "test")
 def proportion_tests(k: int, n: int, p0: float=0.5) -> dict:
+    from statsmodels.stats.proportion import proportions_ztest, binom_test as sm_binom_test
     stat, pz = proportions_ztest(k, n, value=p0, alternative="larger")
     try:
         p_exact = sm_binom_test(k, n, prop=p0, alternative="larger")
@@ -20,6 +30,7 @@ def proportion_tests(k: int, n: int, p0: float=0.5) -> dict:
         p_exact = binomtest(k, n, p=p0, alternative="larger").pvalue
     return {"n": n, "k": k, "prop": k/n if n else np.nan, "z": float(stat), "p_z": float(pz), "p_exact": float(p_exact)}
 
+@traced("test.chi2_2x2", "test")
 def chi2_2x2(a11, a12, a21, a22) -> dict:
     """Chi-square test for a 2x2 contingency table.
 
@@ -67,15 +78,99 @@ def chi2_2x2(a11, a12, a21, a22) -> dict:
         "n": int(n),
         "ha_correction": ha_correction,
     }
+@traced("test.chi2_2x3", "test")
 def chi2_2x3(counts_2x3) -> dict:
     counts_2x3 = np.asarray(counts_2x3, dtype=float)
-    chi2, p, dof, _ = stats.chi2_contingency(counts_2x3, correction=False)
+    try:
+        chi2, p, dof, _ = stats.chi2_contingency(counts_2x3, correction=False)
+    except ValueError:
+        # a zero row/column margin leaves the test undefined
+        chi2 = p = np.nan
+        dof = 2
     n = counts_2x3.sum()
     k = 2
     V = np.sqrt(chi2/(n*(k-1))) if n>0 else np.nan
     return {"chi2":float(chi2), "p":float(p), "dof":int(dof), "V":float(V), "n":int(n)}
 
+def _pearson_chi2(tables: np.ndarray):
+    # Uncorrected Pearson chi-square of each (R, C) table in an (N, R, C) stack
+    n = tables.sum(axis=(1, 2))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = tables.sum(axis=2)[:, :, None] * tables.sum(axis=1)[:, None, :] / n[:, None, None]
+        chi2 = ((tables - expected) ** 2 / expected).sum(axis=(1, 2))
+    chi2 = np.where((expected > 0).all(axis=(1, 2)), chi2, np.nan)
+    dof = (tables.shape[1] - 1) * (tables.shape[2] - 1)
+    return chi2, stats.chi2.sf(chi2, dof), dof, n
+
+@traced("test.chi2_2x2_batch", "test")
+def chi2_2x2_batch(tables) -> pd.DataFrame:
+    """chi2_2x2 over an (N, 2, 2) stack of [[a11, a12], [a21, a22]] tables.
+
+    Returns one row per table with the same columns as chi2_2x2.
+    """
+    t = np.asarray(tables, dtype=float).reshape(-1, 2, 2)
+    ha = (t <= 0).any(axis=(1, 2))
+    t = t + np.where(ha, 0.5, 0.0)[:, None, None]
+    chi2, p, dof, n = _pearson_chi2(t)
+    or_est = (t[:, 0, 0] * t[:, 1, 1]) / (t[:, 0, 1] * t[:, 1, 0])
+    se = np.sqrt((1 / t).sum(axis=(1, 2)))
+    with np.errstate(invalid="ignore"):
+        V = np.sqrt(chi2 / n)
+    return pd.DataFrame({
+        "chi2": chi2, "p": p, "dof": dof, "or": or_est,
+        "ci_low": np.exp(np.log(or_est) - 1.96 * se),
+        "ci_hi": np.exp(np.log(or_est) + 1.96 * se),
+        "V": V, "n": n.astype(int), "ha_correction": ha,
+    })
+
+@traced("test.chi2_2x3_batch", "test")
+def chi2_2x3_batch(tables) -> pd.DataFrame:
+    """chi2_2x3 over an (N, 2, 3) stack; one row per table."""
+    t = np.asarray(tables, dtype=float).reshape(-1, 2, 3)
+    chi2, p, dof, n = _pearson_chi2(t)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        V = np.where(n > 0, np.sqrt(chi2 / (n * (2 - 1))), np.nan)
+    return pd.DataFrame({"chi2": chi2, "p": p, "dof": dof, "V": V, "n": n.astype(int)})
+
+@traced("test.mannwhitneyu_batch", "test")
+def mannwhitneyu_batch(values, in_x) -> pd.DataFrame:
+    """Two-sided Mann–Whitney U of x = rows where `in_x` vs the rest, for each
+    column of `values` (n, M) with one shared sort.
+
+    Matches scipy's default: the tie- and continuity-corrected normal
+    approximation when both samples exceed 8; otherwise scipy is called per
+    column (it may pick the exact distribution).
+    """
+    Y = np.asarray(values, dtype=float).reshape(len(in_x), -1)
+    in_x = np.asarray(in_x, dtype=bool)
+    n, M = Y.shape
+    n1 = int(in_x.sum()); n2 = n - n1
+    if n1 <= 8 or n2 <= 8:
+        res = [stats.mannwhitneyu(Y[in_x, j], Y[~in_x, j], alternative="two-sided") for j in range(M)]
+        return pd.DataFrame({"U": [float(r.statistic) for r in res], "p": [float(r.pvalue) for r in res]})
+
+    order = np.argsort(Y, axis=0, kind="stable")
+    S = np.take_along_axis(Y, order, axis=0)
+    new = np.ones_like(S, dtype=bool)
+    new[1:] = S[1:] != S[:-1]
+    # Tie runs over all columns at once (column-major, each column starts a run)
+    flat = new.T.ravel()
+    starts = np.flatnonzero(flat)
+    t = np.diff(np.append(starts, flat.size)).astype(float)
+    avg = starts % n + (t + 1) / 2                      # average 1-based rank of each run
+    ranks = np.empty_like(S)
+    np.put_along_axis(ranks, order, avg[np.cumsum(flat) - 1].reshape(M, n).T, axis=0)
+
+    U1 = ranks[in_x].sum(axis=0) - n1 * (n1 + 1) / 2
+    U = np.maximum(U1, n1 * n2 - U1)
+    tie = np.bincount(starts // n, t**3 - t, minlength=M)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (U - n1 * n2 / 2 - 0.5) / np.sqrt(n1 * n2 / 12 * ((n + 1) - tie / (n * (n - 1))))
+    return pd.DataFrame({"U": U1, "p": np.clip(2 * special.ndtr(-z), 0.0, 1.0)})
+
+@traced("test.cmh_from_2x2_list", "test")
 def cmh_from_2x2_list(tables: list) -> dict:
+    from statsmodels.stats.contingency_tables import StratifiedTable
     st = StratifiedTable(tables)
     cmh_p = float(st.test_null_odds().pvalue)
     bd_p = float(st.test_equal_odds().pvalue)
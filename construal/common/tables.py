@@ -1,37 +1,107 @@
+from dataclasses import dataclass
 import pandas as pd
 import numpy as np
 
+ORDERS = ["SV", "VS"]
+DET_LEVELS = ["def", "ind", "none"]
+# derive_design labels determiners "Def"/"Indef"/"None"; raw data uses def/ind/none
+DET_ALIASES = {"indef": "ind"}
+
+def det_label(v):
+    if v is None or (isinstance(v, float) and np.isnan(v)):
+        return v
+    s = str(v).strip().lower()
+    return DET_ALIASES.get(s, s)
+
+def level_codes(s: pd.Series, levels: list, normalize=None) -> np.ndarray:
+    """Integer code of each value's position in `levels` (-1 if absent or NA).
+
+    Normalisation runs on the distinct values only, not per row.
+    """
+    codes, uniques = pd.factorize(s)
+    lut = []
+    for u in uniques:
+        u = normalize(u) if normalize else u
+        lut.append(levels.index(u) if u in levels else -1)
+    lut = np.asarray(lut + [-1], dtype=np.intp)    # codes == -1 (NA) pick the trailing -1
+    return lut[codes]
+
+@dataclass
+class Cube:
+    groups: list
+    counts: np.ndarray       # (group, order, level)
+    ungrouped: np.ndarray    # (order, level) for rows whose group is missing
+
+    @property
+    def total(self) -> np.ndarray:
+        return self.counts.sum(axis=0) + self.ungrouped
+
+def contingency_cube(df: pd.DataFrame, by: str, order_col: str, col: str, levels: list,
+                     normalize=None, other: bool = False) -> Cube:
+    """Counts of (group × order × level) from a single bincount over integer codes.
+
+    With other=True a trailing level collects rows whose `col` is not in
+    `levels` (including NA), so "level vs others" contrasts are array slices.
+    """
+    k = len(levels) + (1 if other else 0)
+    if by in df.columns:
+        g, groups = pd.factorize(df[by], sort=True)
+        groups = list(groups)
+    else:
+        g, groups = np.full(len(df), -1), []
+    g = np.where(g < 0, len(groups), g)                 # missing group -> extra slot
+    o = level_codes(df[order_col], ORDERS)
+    c = level_codes(df[col], levels, normalize) if col in df.columns else np.full(len(df), -1)
+    if other:
+        c = np.where(c < 0, k - 1, c)
+    ok = (o >= 0) & (c >= 0)
+    flat = (g[ok] * len(ORDERS) + o[ok]) * k + c[ok]
+    counts = np.bincount(flat, minlength=(len(groups) + 1) * len(ORDERS) * k)
+    counts = counts.reshape(len(groups) + 1, len(ORDERS), k)
+    return Cube(groups=groups, counts=counts[:-1], ungrouped=counts[-1])
+
 def pooled_any_success(df: pd.DataFrame, order_col: str, success_col: str, sent_col: str) -> pd.DataFrame:
     if sent_col not in df.columns:
-        agg = df.groupby(order_col)[success_col].agg(["sum","count"]).reset_index()
+        agg = df.groupby(order_col, observed=True)[success_col].agg(["sum","count"]).reset_index()
         agg.rename(columns={"sum":"success","count":"n"}, inplace=True)
         return agg
     sent_any = (df.pivot_table(index=[sent_col, order_col],
-                               values=success_col, aggfunc="max").reset_index())
-    agg = sent_any.groupby(order_col)[success_col].agg(["sum","count"]).reset_index()
+                               values=success_col, aggfunc="max", observed=True).reset_index())
+    agg = sent_any.groupby(order_col, observed=True)[success_col].agg(["sum","count"]).reset_index()
     agg.rename(columns={"sum":"success","count":"n"}, inplace=True)
     return agg
 
+def rows_2x2(cube: Cube) -> list[dict]:
+    c = cube.counts
+    return [{
+        "model": m,
+        "SV_fail": int(c[i, 0, 0]), "SV_success": int(c[i, 0, 1]),
+        "VS_fail": int(c[i, 1, 0]), "VS_success": int(c[i, 1, 1]),
+    } for i, m in enumerate(cube.groups)]
+
+def rows_2x3(cube: Cube) -> list[dict]:
+    c = cube.counts
+    return [{"model": m, **{f"{o}_{d}": int(c[i, j, l]) for j, o in enumerate(ORDERS) for l, d in enumerate(DET_LEVELS)}}
+            for i, m in enumerate(cube.groups)]
+
+def rows_vs_others(cube: Cube, level: str) -> list[dict]:
+    """Per-group `level` vs all other determiner values (including missing)."""
+    c = cube.counts
+    hit = c[:, :, DET_LEVELS.index(level)]
+    oth = c.sum(axis=2) - hit
+    return [{"model": m,
+             f"SV_{level}": int(hit[i, 0]), "SV_others": int(oth[i, 0]),
+             f"VS_{level}": int(hit[i, 1]), "VS_others": int(oth[i, 1])}
+            for i, m in enumerate(cube.groups)]
+
+def success_cube(df: pd.DataFrame, order_col: str, success_col: str, model_col: str) -> Cube:
+    return contingency_cube(df, model_col, order_col, success_col, [0, 1])
+
+def det_cube(df: pd.DataFrame, order_col: str, det_col: str, model_col: str) -> Cube:
+    return contingency_cube(df, model_col, order_col, det_col, DET_LEVELS, normalize=det_label, other=True)
+
 def per_model_2x2(df: pd.DataFrame, order_col: str, success_col: str, model_col: str) -> list[dict]:
-    out = []
-    for m, g in df.groupby(model_col):
-        ct = pd.crosstab(g[order_col], g[success_col]).reindex(index=["SV","VS"], columns=[0,1], fill_value=0)
-        out.append({
-            "model": m,
-            "SV_fail": int(ct.loc["SV",0]) if "SV" in ct.index else 0,
-            "SV_success": int(ct.loc["SV",1]) if "SV" in ct.index else 0,
-            "VS_fail": int(ct.loc["VS",0]) if "VS" in ct.index else 0,
-            "VS_success": int(ct.loc["VS",1]) if "VS" in ct.index else 0,
-        })
-    return out
+    return rows_2x2(success_cube(df, order_col, success_col, model_col))
 
 def per_model_2x3(df: pd.DataFrame, order_col: str, det_col: str, model_col: str) -> list[dict]:
-    out = []
-    for m, g in df.groupby(model_col):
-        ct = pd.crosstab(g[order_col], g[det_col]).reindex(index=["SV","VS"], columns=["def","ind","none"], fill_value=0)
-        out.append({
-            "model": m,
-            "SV_def": int(ct.loc["SV","def"]), "SV_ind": int(ct.loc["SV","ind"]), "SV_none": int(ct.loc["SV","none"]),
-            "VS_def": int(ct.loc["VS","def"]), "VS_ind": int(ct.loc["VS","ind"]), "VS_none": int(ct.loc["VS","none"]),
-        })
-    return out
+    return rows_2x3(det_cube(df, order_col, det_col, model_col))
@@ -0,0 +1,211 @@
+import functools
+import importlib
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Timing spans for --trace. Tracing is per process and off unless
+# start_tracing() was called; while off, span()/stages() hand back a shared
+# no-op object and @traced functions are called directly, so the hooks can
+# stay in hot code. Pool workers return their spans to the parent (merge()).
+
+_TRACER = None
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024**2 if sys.platform == "darwin" else rss / 1024
+
+def rss_mb() -> float | None:
+    """Current resident set size, from /proc/self/statm (None where that is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError):
+        return None
+
+def _memory() -> tuple[float | None, float]:
+    return rss_mb(), peak_rss_mb()
+
+def reset_peak_rss() -> None:
+    """Restart peak_rss_mb from the current RSS, so a reused worker reports each
+    task's own peak. Linux only; elsewhere the peak keeps the worker's lifetime."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+class Span:
+    __slots__ = ("args",)
+
+    def __init__(self, args: dict):
+        self.args = args
+
+    def set(self, **args) -> None:
+        self.args.update(args)
+
+class _Null:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args) -> None:
+        pass
+
+    def next(self, name: str, **args) -> None:
+        pass
+
+    def close(self, **args) -> None:
+        pass
+
+_NULL = _Null()
+
+class Tracer:
+    def __init__(self):
+        self.events: list[dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, name: str, cat: str, start_ns: int, dur_ns: int, args: dict, mem0: tuple) -> None:
+        # mem0: _memory() at the span's start; the span gets RSS at start and end
+        # and how far the process's high-water mark rose meanwhile
+        (rss0, peak0), (rss1, peak1) = mem0, _memory()
+        mem = {"rss_start_mb": rss0, "rss_end_mb": rss1, "peak_growth_mb": max(peak1 - peak0, 0.0)}
+        event = {"name": name, "cat": cat, "pid": os.getpid(), "tid": threading.get_ident(),
+                 "ts_us": start_ns / 1000, "dur_us": dur_ns / 1000,
+                 "args": {**{k: v for k, v in args.items() if v is not None},
+                          **{k: round(v, 1) for k, v in mem.items() if v is not None}}}
+        with self._lock:
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name: str, cat: str, args: dict):
+        s = Span(args)
+        mem0, t0, c0 = _memory(), time.time_ns(), time.perf_counter_ns()
+        try:
+            yield s
+        finally:
+            self.record(name, cat, t0, time.perf_counter_ns() - c0, s.args, mem0)
+
+class Stages:
+    """Consecutive child spans of one parent span: next() ends the running stage."""
+
+    def __init__(self, tracer: Tracer, name: str, args: dict):
+        self.tracer, self.name, self.args = tracer, name, args
+        self.mem0, self.t0, self.c0 = _memory(), time.time_ns(), time.perf_counter_ns()
+        self.stage = None
+
+    def _end_stage(self) -> None:
+        if self.stage is not None:
+            name, mem0, t0, c0, args = self.stage
+            self.tracer.record(f"{self.name}.{name}", "stage", t0, time.perf_counter_ns() - c0, args, mem0)
+            self.stage = None
+
+    def next(self, name: str, **args) -> None:
+        self._end_stage()
+        self.stage = (name, _memory(), time.time_ns(), time.perf_counter_ns(), args)
+
+    def close(self, **args) -> None:
+        self._end_stage()
+        self.tracer.record(self.name, "stage", self.t0, time.perf_counter_ns() - self.c0,
+                           {**self.args, **args}, self.mem0)
+
+def span(name: str, cat: str = "span", **args):
+    """Context manager timing a block; .set(rows_out=...) adds attributes."""
+    return _NULL if _TRACER is None else _TRACER.span(name, cat, args)
+
+def stages(name: str, **args):
+    return _NULL if _TRACER is None else Stages(_TRACER, name, args)
+
+def _rows(args: tuple, kwargs: dict):
+    # Rows of the first frame/array argument, else the length of the first list (e.g. of tables)
+    values = (*args, *kwargs.values())
+    for a in values:
+        if hasattr(a, "shape") and getattr(a, "ndim", 0) >= 1:
+            return int(a.shape[0])
+    return next((len(a) for a in values if isinstance(a, list)), None)
+
+def traced(name: str, cat: str = "fit"):
+    """Decorator: a span around every call, with rows_in from the first frame/array argument."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if _TRACER is None:
+                return fn(*args, **kwargs)
+            with _TRACER.span(name, cat, {"rows_in": _rows(args, kwargs)}):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def start_tracing() -> None:
+    global _TRACER
+    _TRACER = Tracer()
+
+def stop_tracing() -> list[dict]:
+    global _TRACER
+    tracer, _TRACER = _TRACER, None
+    return tracer.events if tracer is not None else []
+
+def merge(events) -> None:
+    """Add spans recorded in another process (e.g. a pool worker)."""
+    if _TRACER is not None and events:
+        with _TRACER._lock:
+            _TRACER.events.extend(events)
+
+def chrome_trace(events: list[dict]) -> dict:
+    """Chrome trace / Perfetto JSON ("X" complete events, one track per pid/tid)."""
+    main = min((e["pid"] for e in events), default=os.getpid()) if events else os.getpid()
+    out = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+            "args": {"name": "construal" if pid == main else f"worker {pid}"}}
+           for pid in sorted({e["pid"] for e in events})]
+    out += [{"name": e["name"], "cat": e["cat"], "ph": "X", "ts": e["ts_us"], "dur": e["dur_us"],
+             "pid": e["pid"], "tid": e["tid"], "args": e["args"]} for e in events]
+    return {"traceEvents": out, "displayTimeUnit": "ms"}
+
+def flat_rows(events: list[dict]) -> list[dict]:
+    """One row per span, times in ms relative to the first span."""
+    t0 = min((e["ts_us"] for e in events), default=0.0)
+    return [{"name": e["name"], "cat": e["cat"], "pid": e["pid"], "tid": e["tid"],
+             "start_ms": round((e["ts_us"] - t0) / 1000, 3), "dur_ms": round(e["dur_us"] / 1000, 3),
+             **e["args"]} for e in sorted(events, key=lambda e: e["ts_us"])]
+
+def write_trace(events: list[dict], out_dir) -> None:
+    import pandas as pd
+    from .io import write_csv, write_txt
+    write_txt(json.dumps(chrome_trace(events), default=str), Path(out_dir) / "trace.json")
+    write_csv(pd.DataFrame(flat_rows(events)), Path(out_dir) / "trace.csv")
+
+@contextmanager
+def profiled(spec: str | None, out_dir, label: str):
+    """Profile the block with --profile `spec`: "cprofile", or "module:factory"
+    for any other profiler, where factory(directory, label) is a context manager.
+    cProfile writes <out_dir>/profile/<label>.pstats plus a cumulative-time summary."""
+    if not spec:
+        yield
+        return
+    directory = Path(out_dir) / "profile"
+    directory.mkdir(parents=True, exist_ok=True)
+    if spec != "cprofile":
+        module, _, attr = spec.partition(":")
+        with getattr(importlib.import_module(module), attr or "profile")(directory, label):
+            yield
+        return
+    import cProfile
+    import io
+    import pstats
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(directory / f"{label}.pstats")
+        text = io.StringIO()
+        pstats.Stats(prof, stream=text).sort_stats("cumulative").print_stats(40)
+        (directory / f"{label}.txt").write_text(text.getvalue(), encoding="utf-8")
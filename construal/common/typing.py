@@ -1,14 +1,23 @@
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Any, Dict, List
 
 @dataclass
 class Artifact:
-    kind: str             # "csv", "txt", "json"
+    kind: str             # file at path: "csv", "txt", "json", "parquet"; in memory only: "csv", "txt", "coefficients"
     path: str
     summary: Dict[str, Any] | None = None
+    data: Any = None      # in-memory runs: the table (DataFrame), text, or a model's coefficients
 
 @dataclass
 class Artifacts:
     step: str
     outputs: List[Artifact]
     notes: Dict[str, Any] | None = None
+
+    def __getitem__(self, name: str) -> Any:
+        """The data of the output called `name` (its file name without extension)."""
+        for a in self.outputs:
+            if (a.summary or {}).get("artifact", Path(a.path).stem) == name:
+                return a.data
+        raise KeyError(name)
@@ -0,0 +1,132 @@
+import argparse
+import io
+import time
+from dataclasses import replace
+from pathlib import Path
+import pandas as pd
+from .common.aggregate import CountCubes
+from .common.config import Config
+from .common.io import flush_writes, frame_from, input_files, iter_batches, read_columns
+from .common.preprocess import design_columns, design_filters
+from .common.sink import MemorySink, to_artifacts, write_texts
+from .common.typing import Artifacts
+from .scheduler import run_step
+from .steps import load
+
+# Steps 01 and 02 (chance and SV/VS success tests) kept current while rows
+# arrive. Rows update CountCubes, whose per-model and pooled counts are all
+# the tests need, so a batch costs O(batch) and a refresh O(models). The
+# state, with how far each input file has been read, is checkpointed to one
+# file, so a restart resumes instead of rescanning.
+
+STEPS = ("1", "2")
+JSONL_SUFFIXES = {".jsonl", ".ndjson"}
+
+class OnlineTests:
+    """Counts behind steps 01 and 02, updated from batches of raw rows."""
+
+    def __init__(self, cfg: Config, state_path: str | Path | None = None):
+        self.cfg, self.state_path = cfg, state_path
+        self.steps = {k: load(k) for k in STEPS}
+        if state_path is not None and Path(state_path).exists():
+            self.cubes, meta = CountCubes.load(state_path, cfg)
+        else:
+            self.cubes, meta = CountCubes(cfg), {}
+        self.offset = meta.get("offset", 0)         # raw rows seen, for inputs without sentence ids
+        self.sources = meta.get("sources", {})      # file -> bytes read (JSONL) or -1 (shard read whole)
+
+    def _needed(self, available) -> list[str]:
+        return design_columns(self.cfg, available, [c for m in self.steps.values() for c in m.columns(self.cfg)])
+
+    def add(self, rows) -> int:
+        """Count raw rows given as a DataFrame, an Arrow table or an iterable of
+        records (dicts); returns how many rows were read."""
+        if not isinstance(rows, pd.DataFrame) and not hasattr(rows, "schema"):
+            rows = pd.DataFrame.from_records(list(rows))
+        available = list(rows.columns) if isinstance(rows, pd.DataFrame) else rows.schema.names
+        raw = frame_from(rows, columns=self._needed(available), filters=design_filters(self.cfg, available))
+        self.cubes.add_raw(raw, self.offset)
+        self.offset += len(raw)
+        return len(raw)
+
+    def add_batches(self, batches) -> int:
+        """add() every batch of an iterator (DataFrames, Arrow tables or lists of records)."""
+        return sum(self.add(b) for b in batches)
+
+    def poll(self, path: str | Path, batch_size: int = 1_000_000) -> int:
+        """Count what is new at `path`: lines appended to JSONL files since the
+        last poll and parquet/IPC shards not read before. Returns rows read."""
+        n, shards = 0, []
+        for f in input_files(path):
+            key = str(f.absolute())
+            if f.suffix.lower() not in JSONL_SUFFIXES:
+                if key not in self.sources:
+                    shards.append(key)
+                continue
+            start = self.sources.get(key, 0)
+            if f.stat().st_size < start:
+                start = 0                           # truncated or replaced: (sent, model) dedup drops repeats
+            with open(f, "rb") as fh:
+                fh.seek(start)
+                data = fh.read()
+            end = data.rfind(b"\n") + 1             # a partly written last line waits for the next poll
+            if end:
+                n += self.add(pd.read_json(io.BytesIO(data[:end]), lines=True, convert_dates=False))
+            self.sources[key] = start + end
+        if shards:
+            available = read_columns(path)
+            n += self.add_batches(iter_batches(path, columns=self._needed(available),
+                                               filters=design_filters(self.cfg, available),
+                                               batch_size=batch_size, files=shards))
+            self.sources.update(dict.fromkeys(shards, -1))
+        return n
+
+    def results(self) -> dict[str, Artifacts]:
+        """Current step 01 and 02 results, in memory."""
+        out = {}
+        for k, mod in self.steps.items():
+            arts, timing = run_step(k, mod.run_counts, self.cubes, self.cfg, MemorySink())
+            out[k] = to_artifacts(arts, {**timing, "rows": self.cubes.n_rows})
+        return out
+
+    def write(self, out_dir: str | Path | None = None) -> None:
+        """Write the current results to `out_dir` (default cfg.out_dir) as the steps do."""
+        cfg = self.cfg if out_dir is None else replace(self.cfg, out_dir=Path(out_dir))
+        write_texts({k: run_step(k, mod.run_counts, self.cubes, cfg) for k, mod in self.steps.items()}, cfg)
+        flush_writes()
+
+    def checkpoint(self) -> None:
+        if self.state_path is not None:
+            self.cubes.save(self.state_path, {"offset": self.offset, "sources": self.sources})
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m construal.online",
+                                 description="Keep step 01/02 results current as rows are appended to the input")
+    ap.add_argument("--in", dest="in_path", required=True, help="JSONL file(s), or a directory/glob of parquet shards")
+    ap.add_argument("--out", dest="out_dir", required=True)
+    ap.add_argument("--state", required=True, help="Checkpoint file (.npz); resumed from if it exists")
+    ap.add_argument("--follow", type=float, metavar="SECONDS", help="Poll for new rows every SECONDS")
+    ap.add_argument("--sv-vs-only", action="store_true", help="Drop rows outside {SV, VS}")
+    ap.add_argument("--models", nargs="+", metavar="MODEL", help="Count only these models")
+    ap.add_argument("--batch-size", type=int, default=1_000_000)
+    args = ap.parse_args(argv)
+    cfg = Config(in_path=Path(args.in_path), out_dir=Path(args.out_dir), sv_vs_only=args.sv_vs_only,
+                 models=args.models)
+    online = OnlineTests(cfg, args.state)
+    first = True
+    try:
+        while True:
+            n = online.poll(cfg.in_path, args.batch_size)
+            if n or first:
+                online.write()
+                online.checkpoint()
+                print(f"{time.strftime('%H:%M:%S')} +{n} rows, {online.cubes.n_rows} counted", flush=True)
+            first = False
+            if args.follow is None:
+                break
+            time.sleep(args.follow)
+    except KeyboardInterrupt:
+        online.checkpoint()
+
+if __name__ == "__main__":
+    main()
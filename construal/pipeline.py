@@ -1,31 +1,188 @@
+import time
+from dataclasses import replace
 from pathlib import Path
+import pandas as pd
+from .common.cache import cached_design
+from .common import trace
 from .common.config import Config
-from .common.io import read_df, write_text
-from .common.preprocess import derive_design
-from .steps import (
-    step01_chance, step02_success_sv_vs, step03_determiner_dist,
-    step04_alignment_quality, step05_tau_vs_determiner,
-    step06_architecture_success, step07_strategy_success,
-)
+from .common.io import DUPLICATES_ATTR, flush_writes, read_columns, read_df, write_table, write_text
+from .common.preprocess import derive_design, design_columns, design_filters
+from .common.memo import load_step, save_step, step_fingerprint
+from .common.sink import write_manifest, write_texts
+from .scheduler import peak_rss_mb, run_step, run_steps, run_strata
+from .steps import STEPS, load
 
 def run_pipeline(args):
-    cfg = Config(in_path=Path(args.in_path), out_dir=Path(args.out_dir))
-    df = derive_design(read_df(cfg.in_path), cfg)
-
-    step_map = {
-        "1": step01_chance,
-        "2": step02_success_sv_vs,
-        "3": step03_determiner_dist,
-        "4": step04_alignment_quality,
-        "5": step05_tau_vs_determiner,
-        "6": step06_architecture_success,
-        "7": step07_strategy_success,
-    }
-    steps = list(step_map.keys()) if args.all else (args.steps or [])
+    cfg = Config(in_path=Path(args.in_path), out_dir=Path(args.out_dir),
+                 sv_vs_only=getattr(args, "sv_vs_only", False),
+                 by=getattr(args, "by", None) or None,
+                 models=getattr(args, "models", None) or None,
+                 stream=getattr(args, "stream", False),
+                 batch_size=getattr(args, "batch_size", 1_000_000),
+                 jobs=getattr(args, "jobs", 1) or 1,
+                 use_cache=not getattr(args, "no_cache", False),
+                 cache_dir=Path(args.cache_dir) if getattr(args, "cache_dir", None) else None,
+                 dedup_winner=getattr(args, "dedup_winner", None),
+                 bootstrap=getattr(args, "bootstrap", 0) or 0,
+                 bootstrap_seed=getattr(args, "bootstrap_seed", 0) or 0,
+                 bootstrap_cluster=getattr(args, "bootstrap_cluster", None),
+                 incremental=getattr(args, "incremental", False),
+                 results=getattr(args, "results", "csv") or "csv",
+                 run_id=getattr(args, "run_id", None) or time.strftime("%Y%m%dT%H%M%S"),
+                 trace=getattr(args, "trace", False),
+                 profile=getattr(args, "profile", None) or None)
+
+    steps = list(STEPS) if args.all else (args.steps or [])
     if not steps:
-        steps = list(step_map.keys())
-    completed = []
-    for s in steps:
-        arts = step_map[s].run(df, cfg)
-        completed.append(arts.get("step","?"))
-    write_text("Completed steps: " + ", ".join(completed), f"{cfg.out_dir}/PIPELINE_DONE.txt")
+        steps = list(STEPS)
+    if not cfg.trace:
+        return _run(cfg, steps)
+    trace.start_tracing()
+    try:
+        with trace.span("pipeline", "pipeline", steps=",".join(steps)):
+            _run(cfg, steps)
+    finally:
+        trace.write_trace(trace.stop_tracing(), cfg.out_dir)
+
+def _run(cfg: Config, steps: list[str]) -> None:
+    step_map = {s: load(s) for s in steps}
+
+    # Load only what derive_design and the selected steps read
+    available = read_columns(cfg.in_path)
+    filters = design_filters(cfg, available)
+    def needed(keys):
+        return design_columns(cfg, available, [c for s in keys for c in step_map[s].columns(cfg)])
+
+    # With --stream, steps that can work from counts never see the full frame
+    # (--by needs the frame to split it)
+    count_steps = [s for s in steps if cfg.stream and not cfg.by and hasattr(step_map[s], "run_counts")]
+    frame_steps = [s for s in steps if s not in count_steps]
+
+    results, duplicates = {}, None
+    if count_steps:
+        from .common.aggregate import stream_counts
+        with trace.span("stream_counts", "read") as sp, trace.profiled(cfg.profile, cfg.out_dir, "stream_counts"):
+            cubes = stream_counts(cfg.in_path, cfg, needed(count_steps), filters, batch_size=cfg.batch_size)
+            sp.set(rows_in=cubes.n_rows)
+        duplicates = cubes.duplicates
+        for s in count_steps:
+            results[s] = run_step(s, step_map[s].run_counts, cubes, cfg)
+    if frame_steps:
+        cols = needed(frame_steps)
+        # Without a winner column, duplicates can already be dropped on the Arrow table
+        dedup = None if cfg.dedup_winner else [cfg.sent_col, cfg.model_col]
+        def build():
+            with trace.span("read", "read", columns=len(cols)) as sp:
+                raw = read_df(cfg.in_path, columns=cols, filters=filters, dedup=dedup)
+                sp.set(rows_out=len(raw))
+            return derive_design(raw, cfg, copy=False)
+        with trace.span("design", "read") as sp, trace.profiled(cfg.profile, cfg.out_dir, "preprocess"):
+            df, frame_path = cached_design(cfg, cols, filters, build)
+            sp.set(rows_out=len(df))
+        duplicates = df.attrs.get(DUPLICATES_ATTR, {})
+        if cfg.by:
+            return _run_by(step_map, frame_steps, df, cfg, frame_path, duplicates)
+        todo, prints = frame_steps, {}
+        if cfg.incremental:
+            # Reuse artifacts of steps whose input slice and config are unchanged
+            prints = {s: step_fingerprint(step_map[s], df, cfg) for s in frame_steps}
+            for s in frame_steps:
+                arts = load_step(s, prints[s], cfg)
+                if arts is not None:
+                    results[s] = (arts, {"wall_s": 0.0, "peak_rss_mb": peak_rss_mb(), "skipped": True})
+            todo = [s for s in frame_steps if s not in results]
+        ran = run_steps(step_map, todo, df, cfg, jobs=cfg.jobs, frame_path=frame_path)
+        for s, (arts, _) in ran.items():
+            if cfg.incremental:
+                save_step(s, prints[s], arts, cfg)
+        results.update(ran)
+
+    # Artifacts are written in the background; fail here, before the run is
+    # marked done, if any of them could not be written
+    write_texts(results, cfg)
+    flush_writes()
+    _write_duplicates(duplicates, cfg)
+    write_manifest({s: results[s] for s in steps}, cfg)
+    completed = [results[s][0].get("step","?") for s in steps]
+    lines = ["Completed steps: " + ", ".join(completed), "", "step\twall_s\tpeak_rss_mb\tstatus"]
+    for s, name in zip(steps, completed):
+        t = results[s][1]
+        status = "unchanged" if t.get("skipped") else "ran"
+        lines.append(f"{name}\t{t['wall_s']:.3f}\t{t['peak_rss_mb']:.1f}\t{status}")
+    write_text("\n".join(lines) + "\n", f"{cfg.out_dir}/PIPELINE_DONE.txt")
+
+def _write_duplicates(duplicates: dict | None, cfg: Config) -> None:
+    if duplicates:
+        write_table(pd.DataFrame({"model": list(duplicates), "duplicates_dropped": list(duplicates.values())}),
+                    f"{cfg.out_dir}/duplicates_dropped.csv")
+
+def _path_value(v) -> str:
+    return "__NA__" if pd.isna(v) else str(v).replace("/", "_").replace("\\", "_")
+
+def strata(df: pd.DataFrame, cfg: Config) -> dict:
+    """{label: (values, stratum Config, row positions)} for each combination of
+    the cfg.by columns; a stratum writes to <out_dir>/col=value/... ."""
+    by = list(cfg.by)
+    missing = [c for c in by if c not in df.columns]
+    if missing:
+        raise ValueError(f"--by columns not in the data: {missing}")
+    out = {}
+    for key, rows in df.groupby(by, dropna=False, observed=True, sort=True).indices.items():
+        values = dict(zip(by, key if isinstance(key, tuple) else (key,)))
+        parts = [f"{c}={_path_value(v)}" for c, v in values.items()]
+        out["/".join(parts)] = (values, replace(cfg, out_dir=Path(cfg.out_dir, *parts), jobs=1), rows)
+    return out
+
+def _read_output(o: dict) -> tuple[str, pd.DataFrame] | None:
+    # (file name, table) of a CSV output or a --results parquet table; None for texts/models
+    summary = o.get("summary") or {}
+    if o["kind"] == "parquet" and "columns" in summary:
+        return f"{summary['artifact']}.csv", pd.read_parquet(
+            o["path"], filters=[("artifact", "==", summary["artifact"])], columns=summary["columns"])
+    if o["kind"] != "csv":
+        return None
+    try:
+        return Path(o["path"]).name, pd.read_csv(o["path"])
+    except pd.errors.EmptyDataError:
+        return None
+
+def _combined(results: dict, parts: dict) -> dict:
+    # Each table artifact of every stratum, stacked with the stratum's values in front
+    tables = {}
+    for label, res in results.items():
+        values = parts[label][0]
+        for arts, _ in res.values():
+            for o in arts.get("outputs", []):
+                read = _read_output(o)
+                if read is None:
+                    continue
+                name, t = read
+                for i, (c, v) in enumerate((c, v) for c, v in values.items() if c not in t.columns):
+                    t.insert(i, c, v)
+                tables.setdefault(name, []).append(t)
+    return {name: pd.concat(ts, ignore_index=True) for name, ts in tables.items()}
+
+def _run_by(step_map: dict, steps: list[str], df: pd.DataFrame, cfg: Config, frame_path, duplicates) -> None:
+    parts = strata(df, cfg)
+    results = run_strata(step_map, steps, df, {label: p[1:] for label, p in parts.items()}, cfg,
+                         jobs=cfg.jobs, frame_path=frame_path)
+    for label, res in results.items():
+        write_texts(res, parts[label][1])
+    flush_writes()
+    _write_duplicates(duplicates, cfg)
+
+    summary, lines = [], [f"Completed {len(parts)} strata by " + ", ".join(cfg.by), "",
+                          "stratum\tstep\twall_s\tpeak_rss_mb\tstatus"]
+    for label, res in results.items():
+        values, scfg, rows = parts[label]
+        write_manifest(res, scfg)
+        timings = [t for _, t in res.values()]
+        summary.append({**values, "rows": len(rows), "steps": len(res), "out_dir": str(scfg.out_dir),
+                        "wall_s": sum(t["wall_s"] for t in timings),
+                        "peak_rss_mb": max((t["peak_rss_mb"] for t in timings), default=0.0)})
+        for arts, t in res.values():
+            lines.append(f"{label}\t{arts.get('step', '?')}\t{t['wall_s']:.3f}\t{t['peak_rss_mb']:.1f}\tran")
+    write_table(pd.DataFrame(summary), f"{cfg.out_dir}/strata.csv")
+    for name, table in _combined(results, parts).items():
+        write_table(table, f"{cfg.out_dir}/combined/{name}")
+    write_text("\n".join(lines) + "\n", f"{cfg.out_dir}/PIPELINE_DONE.txt")
@@ -0,0 +1,149 @@
+import importlib
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import pandas as pd
+from .common import copy_on_write
+from .common.config import Config
+from .common.io import flush_writes, read_ipc, write_ipc
+from .common import trace
+from .common.sink import open_sink, step_label
+from .common.trace import peak_rss_mb, reset_peak_rss
+
+# A step module may declare DEPENDS_ON = ("1", ...) to run after other steps;
+# steps without it only read the shared frame and can run in any order.
+
+def timed(fn, *args) -> tuple[dict, dict]:
+    t0 = time.perf_counter()
+    arts = fn(*args)
+    return arts, {"wall_s": time.perf_counter() - t0, "peak_rss_mb": peak_rss_mb()}
+
+@copy_on_write()
+def run_step(key: str, fn, data, cfg: Config, sink=None) -> tuple[dict, dict]:
+    """timed(fn, data, cfg) with the step's writes routed to `sink` (default: the
+    configured results backend), traced as one span and profiled with cfg.profile."""
+    def call():
+        name = f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+        with trace.span(name, "step", rows_in=len(data) if isinstance(data, pd.DataFrame) else None,
+                        stratum=str(cfg.out_dir) if cfg.by else None) as sp, \
+                trace.profiled(cfg.profile, cfg.out_dir, f"step{step_label(key)}"), open_sink(cfg, key, sink) as opened:
+            arts = fn(data, cfg)
+            sp.set(outputs=len(arts.get("outputs", [])))
+        return opened.resolve(arts)
+    return timed(call)
+
+@copy_on_write()
+def _run_step(key: str, module_name: str, frame_path: str, cfg: Config, rows=None):
+    reset_peak_rss()                        # workers are reused: peak RSS of this task only
+    if cfg.trace:                           # spans go back in the timing dict (see _run_pool)
+        trace.start_tracing()
+    # Worker side: memory-map the shared frame instead of receiving it pickled
+    mod = importlib.import_module(module_name)
+    df = read_ipc(frame_path, rows)
+    arts, timing = run_step(key, mod.run, df, cfg)
+    flush_writes()                          # the step's files exist once it is reported done
+    if cfg.trace:
+        timing["spans"] = trace.stop_tracing()
+    return arts, timing
+
+def _pool(jobs: int, fresh: bool = False) -> ProcessPoolExecutor:
+    # Workers are forked on Linux, so they start with the parent's imports and
+    # a calling script needs no __main__ guard, and they are kept for every
+    # task of the run. With `fresh`, each task gets a new (spawned) process
+    # instead, so nothing an earlier task left resident counts towards its peak.
+    if fresh and sys.version_info >= (3, 11):
+        return ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=1)
+    ctx = multiprocessing.get_context("fork") if sys.platform.startswith("linux") else None
+    return ProcessPoolExecutor(max_workers=jobs, mp_context=ctx)
+
+def _deps(step_map: dict, keys: list[str]) -> dict:
+    return {k: [d for d in getattr(step_map[k], "DEPENDS_ON", ()) if d in keys] for k in keys}
+
+def _run_serial(step_map: dict, keys: list[str], df: pd.DataFrame, cfg: Config, sink=None) -> dict:
+    # sink: optional factory of a results sink per step key
+    deps, results, pending = _deps(step_map, keys), {}, list(keys)
+    while pending:
+        k = next((k for k in pending if all(d in results for d in deps[k])), None)
+        if k is None:
+            raise ValueError(f"Unsatisfiable step dependencies: {pending}")
+        results[k] = run_step(k, step_map[k].run, df, cfg, sink(k) if sink else None)
+        pending.remove(k)
+    return results
+
+def _run_pool(step_map: dict, tasks: dict, deps: dict, df: pd.DataFrame, cfg: Config, jobs: int,
+              frame_path: str | os.PathLike | None) -> dict:
+    # tasks: {task id: (step key, cfg, row positions or None)}, in submission
+    # priority order. Ready tasks wait in the pool's shared queue and each idle
+    # worker takes the next one, so no worker sits on a backlog of its own.
+    owned = frame_path is None
+    if owned:
+        cfg.out_dir.mkdir(parents=True, exist_ok=True)
+        fd, frame_path = tempfile.mkstemp(prefix=".frame-", suffix=".arrow", dir=cfg.out_dir)
+        os.close(fd)
+    frame_path = str(frame_path)
+    results = {}
+    flush_writes()                          # stop the writer threads before the workers fork
+    try:
+        if owned:
+            write_ipc(df, frame_path)
+        with _pool(jobs) as pool:
+            running = {}
+            pending = list(tasks)
+            while pending or running:
+                for t in [t for t in pending if all(d in results for d in deps[t])]:
+                    key, tcfg, rows = tasks[t]
+                    running[pool.submit(_run_step, key, step_map[key].__name__, frame_path, tcfg, rows)] = t
+                    pending.remove(t)
+                if not running:
+                    raise ValueError(f"Unsatisfiable step dependencies: {pending}")
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    arts, timing = fut.result()
+                    trace.merge(timing.pop("spans", None))
+                    results[running.pop(fut)] = (arts, timing)
+    finally:
+        if owned:
+            os.unlink(frame_path)
+    return results
+
+def run_steps(step_map: dict, keys: list[str], df: pd.DataFrame, cfg: Config, jobs: int = 1,
+              frame_path: str | os.PathLike | None = None) -> dict:
+    """Run the selected steps on `df`; returns {key: (artifacts, timing)}.
+
+    With jobs > 1 the frame is shared as an Arrow IPC file (`frame_path` if it
+    already holds `df`, else a temporary one) and steps run in a process pool
+    as soon as the steps they depend on have finished. Artifact files are
+    written in the background and are all on disk when this returns.
+    """
+    if jobs <= 1 or len(keys) <= 1:
+        results = _run_serial(step_map, keys, df, cfg)
+        flush_writes()
+        return results
+    deps = _deps(step_map, keys)
+    return _run_pool(step_map, {k: (k, cfg, None) for k in keys}, deps, df, cfg, jobs, frame_path)
+
+def run_strata(step_map: dict, keys: list[str], df: pd.DataFrame, strata: dict, cfg: Config, jobs: int = 1,
+               frame_path: str | os.PathLike | None = None) -> dict:
+    """Run the selected steps once per stratum; returns {label: {key: (artifacts, timing)}}.
+
+    `strata` maps a label to (stratum Config, row positions in `df`). With
+    jobs > 1 every (stratum, step) pair is a pool task that converts only its
+    rows of the shared frame, on workers kept for the whole run (see _pool);
+    tasks of the largest strata are queued first, so the long ones start
+    early and small ones fill the remaining workers.
+    """
+    order = sorted(strata, key=lambda label: -len(strata[label][1]))
+    if jobs <= 1:
+        results = {label: _run_serial(step_map, keys, df.take(strata[label][1]), strata[label][0])
+                   for label in order}
+        flush_writes()
+    else:
+        deps = _deps(step_map, keys)
+        tasks = {(label, k): (k, strata[label][0], strata[label][1]) for label in order for k in keys}
+        task_deps = {(label, k): [(label, d) for d in deps[k]] for label, k in tasks}
+        done = _run_pool(step_map, tasks, task_deps, df, cfg, jobs, frame_path)
+        results = {label: {k: done[label, k] for k in keys} for label in order}
+    return {label: results[label] for label in strata}
@@ -0,0 +1,205 @@
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import fields, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from .common.cache import RUNTIME_FIELDS
+from .common.config import Config
+from .common.io import input_files, read_columns, read_df
+from .common.preprocess import derive_design, design_columns, design_filters, subset_design
+from .common.sink import MemorySink
+from .scheduler import _run_serial
+from .steps import STEPS, load
+
+# A resident analysis service: the input is read and derived once, and step
+# queries on subsets of it are answered from memory. Results are cached per
+# (filter, step, options); the frame and the cache are rebuilt when the input
+# changes.
+#
+#   GET  /health                          input, rows, load time
+#   GET  /run?steps=2,3&model=m1,m2       other parameters filter columns
+#   POST /run  {"steps": [...], "where": {col: [values]}, "options": {cfg field: value}}
+
+# Config fields a query may not override: they change what is read, not how it is analysed
+LOAD_FIELDS = {"sv_vs_only", "models", "dedup_winner"}
+
+def _signature(path) -> tuple:
+    return tuple((str(f), f.stat().st_mtime_ns, f.stat().st_size) for f in input_files(path))
+
+class Resident:
+    """The derived frame of one input kept in memory, with an LRU cache of step results."""
+
+    def __init__(self, cfg: Config, cache_size: int = 256):
+        self.cfg, self.cache_size = cfg, cache_size
+        self.step_map = {k: load(k) for k in STEPS}
+        self.cache: OrderedDict = OrderedDict()
+        self.running: dict = {}                             # (input signature, filter, options, step) -> Future
+        self.lock = threading.Lock()
+        self.signature, self.df, self.loaded_at = None, None, None
+        self.hits = self.misses = 0
+
+    def frame(self):
+        """The derived frame, re-read if the input files changed since it was loaded."""
+        signature = _signature(self.cfg.in_path)
+        if signature != self.signature:
+            cfg = self.cfg
+            available = read_columns(cfg.in_path)
+            cols = design_columns(cfg, available, [c for m in self.step_map.values() for c in m.columns(cfg)])
+            dedup = None if cfg.dedup_winner else [cfg.sent_col, cfg.model_col]
+            self.df = None                                  # let the old frame go before reading
+            self.df = derive_design(read_df(cfg.in_path, columns=cols, filters=design_filters(cfg, available),
+                                            dedup=dedup), cfg, copy=False)
+            self.signature, self.loaded_at = signature, time.time()
+            self.cache.clear()
+        return self.df
+
+    def _options(self, options: dict) -> Config:
+        allowed = {f.name for f in fields(Config)} - RUNTIME_FIELDS - LOAD_FIELDS
+        bad = sorted(set(options) - allowed)
+        if bad:
+            raise ValueError(f"Options not allowed in a query: {bad}")
+        return replace(self.cfg, **options)
+
+    def run(self, steps=None, where: dict | None = None, options: dict | None = None) -> dict:
+        """{step key: (artifacts, timing, cached)} for the steps on the rows matching `where`.
+
+        The lock covers the frame check and the cache only; steps run outside
+        it on the frame current at the start, so cheap or cached queries do not
+        wait behind slow ones. Identical concurrent misses share one computation.
+        """
+        keys = [str(k) for k in (steps or STEPS)]
+        unknown = [k for k in keys if k not in STEPS]
+        if unknown:
+            raise ValueError(f"Unknown steps: {unknown}")
+        where = {c: sorted(str(v) for v in vs) for c, vs in sorted((where or {}).items())}
+        cfg = self._options(options or {})
+        base = (json.dumps(where), json.dumps(options or {}, sort_keys=True, default=str))
+        with self.lock:
+            df, signature = self.frame(), self.signature
+            out, todo, waiting = {}, [], {}
+            for k in keys:
+                hit = self.cache.get((*base, k))
+                if hit is not None:
+                    self.cache.move_to_end((*base, k))
+                    out[k] = (*hit, True)
+                elif (signature, *base, k) in self.running:
+                    waiting[k] = self.running[(signature, *base, k)]
+                else:
+                    self.running[(signature, *base, k)] = Future()
+                    todo.append(k)
+            self.hits += len(keys) - len(todo)
+            self.misses += len(todo)
+        if todo:
+            try:
+                ran = _run_serial(self.step_map, todo, subset_design(df, cfg, where), cfg, sink=lambda k: MemorySink())
+            except BaseException as e:
+                with self.lock:
+                    for k in todo:
+                        self.running.pop((signature, *base, k)).set_exception(e)
+                raise
+            with self.lock:
+                for k, (arts, timing) in ran.items():
+                    if signature == self.signature:         # not if the input was reloaded meanwhile
+                        self.cache[(*base, k)] = (arts, timing)
+                    self.running.pop((signature, *base, k)).set_result((arts, timing))
+                    out[k] = (arts, timing, False)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        for k, fut in waiting.items():
+            out[k] = (*fut.result(), True)
+        return {k: out[k] for k in keys}
+
+    def status(self) -> dict:
+        return {"input": str(self.cfg.in_path), "rows": None if self.df is None else len(self.df),
+                "loaded_at": self.loaded_at, "cached_results": len(self.cache),
+                "cache_hits": self.hits, "cache_misses": self.misses}
+
+def _jsonable(value):
+    if hasattr(value, "to_json"):
+        return json.loads(value.to_json(orient="records", date_format="iso"))
+    return value
+
+def response(results: dict) -> dict:
+    steps = {}
+    for k, (arts, timing, cached) in results.items():
+        outputs = [{"artifact": (o.get("summary") or {}).get("artifact"), "kind": o["kind"],
+                    "summary": o.get("summary"), "data": _jsonable(o.get("data"))}
+                   for o in arts.get("outputs", [])]
+        steps[k] = {"step": arts.get("step", k), "cached": cached, "wall_s": timing["wall_s"], "outputs": outputs}
+    return {"steps": steps}
+
+class Handler(BaseHTTPRequestHandler):
+    resident: Resident = None
+
+    def _send(self, status: int, body: dict) -> None:
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _answer(self, fn) -> None:
+        try:
+            self._send(200, fn())
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._answer(lambda: {"status": "ok", **self.resident.status()})
+        elif url.path == "/run":
+            query = {k: ",".join(v).split(",") for k, v in parse_qs(url.query).items()}
+            steps = query.pop("steps", None)
+            self._answer(lambda: response(self.resident.run(steps, query)))
+        else:
+            self._send(404, {"error": f"Not found: {url.path}"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/run":
+            self._send(404, {"error": f"Not found: {self.path}"})
+            return
+        def run():
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            return response(self.resident.run(body.get("steps"), body.get("where"), body.get("options")))
+        self._answer(run)
+
+    def log_message(self, fmt, *args):
+        pass
+
+def make_server(resident: Resident, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    handler = type("ResidentHandler", (Handler,), {"resident": resident})
+    return ThreadingHTTPServer((host, port), handler)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m construal.server",
+                                 description="Serve step results for one input from memory")
+    ap.add_argument("--in", dest="in_path", required=True, help="Input file, directory of shards or glob")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--cache-size", type=int, default=256, help="Step results kept (LRU)")
+    ap.add_argument("--sv-vs-only", action="store_true", help="Drop rows outside {SV, VS} at read time")
+    ap.add_argument("--models", nargs="+", metavar="MODEL", help="Load only these models")
+    args = ap.parse_args(argv)
+    cfg = Config(in_path=Path(args.in_path), out_dir=Path("."), sv_vs_only=args.sv_vs_only, models=args.models)
+    resident = Resident(cfg, cache_size=args.cache_size)
+    resident.frame()
+    server = make_server(resident, args.host, args.port)
+    print(f"Serving {cfg.in_path} ({len(resident.df)} rows) on http://{args.host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import importlib
+
+# Step key -> module; modules (and their statsmodels/scipy imports) load on first use
+STEPS = {
+    "1": "step01_chance",
+    "2": "step02_success_sv_vs",
+    "3": "step03_determiner_dist",
+    "4": "step04_alignment_quality",
+    "5": "step05_tau_vs_determiner",
+    "6": "step06_architecture_success",
+    "7": "step07_strategy_success",
+}
+
+def load(key: str):
+    return importlib.import_module(f"{__name__}.{STEPS[key]}")
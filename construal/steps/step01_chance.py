@@ -1,45 +1,54 @@
 import pandas as pd
 from ..common.config import Config
 from ..common.io import write_table, write_text
+from ..common.memo import memo_rows
 from ..common.stats import proportion_tests
 
+def columns(cfg: Config) -> list[str]:
+    return [cfg.success_col, cfg.model_col, cfg.gen2_col]
+
+def _grouped_kn(df: pd.DataFrame, by: str, success_col: str) -> list[tuple]:
+    kn = df.groupby(by, observed=True)[success_col].agg(["sum", "count"])
+    return [(key, int(k), int(n)) for key, k, n in kn.itertuples() if n > 0]
+
+def chance_rows(groups: list[tuple], label: str) -> list[dict]:
+    """proportion_tests for each (key, k, n), tagged with the key under `label`."""
+    rows = []
+    for key, ks, ns in groups:
+        res = proportion_tests(ks, ns); res[label]=key
+        rows.append(res)
+    return rows
+
 def run(df: pd.DataFrame, cfg: Config):
+    sub = df[[cfg.success_col]].dropna()
+    glob = (int(sub[cfg.success_col].sum()), int(len(sub))) if len(sub) > 0 else None
+    by_model = []
+    if cfg.model_col in df.columns:
+        by_model = memo_rows(cfg, "step01_by_model", df, columns(cfg),
+                             lambda g: chance_rows(_grouped_kn(g, cfg.model_col, cfg.success_col), "model"))
+    by_gen2 = chance_rows(_grouped_kn(df, cfg.gen2_col, cfg.success_col), "gen2") if cfg.gen2_col in df.columns else []
+    return report(glob, by_model, by_gen2, cfg)
+
+def run_counts(cubes, cfg: Config):
+    glob, by_model, by_gen2 = cubes.chance()
+    return report(glob, chance_rows(by_model, "model"), chance_rows(by_gen2, "gen2"), cfg)
+
+def report(glob, model_rows: list[dict], gen2_rows: list[dict], cfg: Config):
+    """Write chance tests from (k, n) overall and the per-model / per-gen2 test rows."""
     outs = []
     outdir = cfg.out_dir
 
     # Global
-    sub = df[[cfg.success_col]].dropna()
-    if len(sub) > 0:
-        k = int(sub[cfg.success_col].sum()); n = int(len(sub))
-        glob = proportion_tests(k, n)
-        write_table(pd.DataFrame([glob]), f"{outdir}/step01_chance_global.csv")
+    if glob is not None:
+        k, n = glob
+        write_table(pd.DataFrame([proportion_tests(k, n)]), f"{outdir}/step01_chance_global.csv")
         outs.append({"kind":"csv","path":f"{outdir}/step01_chance_global.csv"})
 
-    # By model
-    rows = []
-    if cfg.model_col in df.columns:
-        for m, g in df.groupby(cfg.model_col):
-            ss = g[[cfg.success_col]].dropna()
-            if len(ss)==0: continue
-            ks = int(ss[cfg.success_col].sum()); ns = int(len(ss))
-            res = proportion_tests(ks, ns); res["model"]=m
-            rows.append(res)
-    if rows:
-        write_table(pd.DataFrame(rows), f"{outdir}/step01_chance_by_model.csv")
-        outs.append({"kind":"csv","path":f"{outdir}/step01_chance_by_model.csv"})
-
-    # By gen2
-    rows = []
-    if cfg.gen2_col in df.columns:
-        for g2, g in df.groupby(cfg.gen2_col):
-            ss = g[[cfg.success_col]].dropna()
-            if len(ss)==0: continue
-            ks = int(ss[cfg.success_col].sum()); ns = int(len(ss))
-            res = proportion_tests(ks, ns); res["gen2"]=g2
-            rows.append(res)
-    if rows:
-        write_table(pd.DataFrame(rows), f"{outdir}/step01_chance_by_gen2.csv")
-        outs.append({"kind":"csv","path":f"{outdir}/step01_chance_by_gen2.csv"})
+    # By model / by gen2
+    for label, rows in (("model", model_rows), ("gen2", gen2_rows)):
+        if rows:
+            write_table(pd.DataFrame(rows), f"{outdir}/step01_chance_by_{label}.csv")
+            outs.append({"kind":"csv","path":f"{outdir}/step01_chance_by_{label}.csv"})
 
     write_text("Step01: chance-level tests completed.", f"{outdir}/step01_readme.txt")
     outs.append({"kind":"txt","path":f"{outdir}/step01_readme.txt"})
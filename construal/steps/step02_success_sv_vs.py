@@ -3,14 +3,36 @@ import numpy as np
 from ..common.config import Config
 from ..common.io import write_table, write_text
 from ..common.stats import chi2_2x2, cmh_from_2x2_list
-from ..common.tables import pooled_any_success, per_model_2x2
+from ..common.memo import memo_cube
+from ..common.resample import cluster_col, cluster_sums, resample, success_stats
+from ..common.tables import pooled_any_success, rows_2x2, success_cube
+
+def columns(cfg: Config) -> list[str]:
+    return [cfg.order_col, cfg.success_col, cfg.sent_col, cfg.model_col,
+            *([cluster_col(cfg)] if cfg.bootstrap else [])]
 
 def run(df: pd.DataFrame, cfg: Config):
+    agg = pooled_any_success(df, cfg.order_col, cfg.success_col, cfg.sent_col)
+    cube = memo_cube(cfg, "step02_success_cube", df, columns(cfg),
+                     lambda g: success_cube(g, cfg.order_col, cfg.success_col, cfg.model_col))
+    arts = report(agg, rows_2x2(cube), cfg)
+    if cfg.bootstrap and all(c in df.columns for c in [cfg.order_col, cfg.success_col, cluster_col(cfg)]):
+        # Success-rate difference and odds ratio, resampling whole clusters
+        tables = cluster_sums(df, cluster_col(cfg), cfg.order_col, cfg.success_col, by=cfg.model_col)
+        res = resample(tables, success_stats, cfg.bootstrap, cfg.bootstrap_seed, cfg.jobs)
+        write_table(res, f"{cfg.out_dir}/step02_bootstrap.csv")
+        arts["outputs"].append({"kind":"csv","path":f"{cfg.out_dir}/step02_bootstrap.csv"})
+    return arts
+
+def run_counts(cubes, cfg: Config):
+    return report(cubes.pooled_any(), cubes.per_model_2x2(), cfg)
+
+def report(agg: pd.DataFrame, rows: list[dict], cfg: Config):
+    """Write the pooled ANY-success 2×2 and per-model 2×2/CMH results."""
     outs = []
     outdir = cfg.out_dir
 
     # 2×2 pooled by sentence (ANY success)
-    agg = pooled_any_success(df, cfg.order_col, cfg.success_col, cfg.sent_col)
     if set(agg.columns)>= {cfg.order_col,"success","n"} and len(agg)>=2:
         def get_counts(order):
             row = agg[agg[cfg.order_col]==order]
@@ -29,7 +51,6 @@ def run(df: pd.DataFrame, cfg: Config):
         outs.append({"kind":"csv","path":f"{outdir}/step02_pooled_any_2x2.csv"})
 
     # Per-model 2×2 and CMH
-    rows = per_model_2x2(df, cfg.order_col, cfg.success_col, cfg.model_col)
     if rows:
         write_table(pd.DataFrame(rows), f"{outdir}/step02_per_model_2x2_counts.csv")
         outs.append({"kind":"csv","path":f"{outdir}/step02_per_model_2x2_counts.csv"})
@@ -4,8 +4,24 @@ from scipy import stats
 import statsmodels.formula.api as smf
 from statsmodels.stats.anova import anova_lm
 from ..common.config import Config
-from ..common.io import write_table, write_text
-from ..common.models import mixedlm_random_intercept, ols_cluster
+from ..common.io import write_model, write_table, write_text
+from ..common.models import mixedlm_random_intercept, ols_cluster_many
+from ..common.stats import mannwhitneyu_batch
+from ..common.resample import cluster_col, cluster_sums, mean_stats, resample
+from ..common.trace import span
+
+def columns(cfg: Config) -> list[str]:
+    return [cfg.tau_col, cfg.order_col, cfg.item_col, cfg.family_col, cfg.gen2_col, *cfg.metrics,
+            *([cluster_col(cfg), cfg.model_col] if cfg.bootstrap else [])]
+
+def _missingness_groups(df: pd.DataFrame, metrics: list[str], keys: list[str]):
+    """[(metrics, row mask)] with metrics grouped by identical complete-row masks."""
+    base = df[keys].notna().all(axis=1).to_numpy()
+    groups = {}
+    for m in metrics:
+        mask = base & df[m].notna().to_numpy()
+        groups.setdefault(np.packbits(mask).tobytes(), (mask, []))[1].append(m)
+    return [(ms, mask) for mask, ms in groups.values()]
 
 def run(df: pd.DataFrame, cfg: Config):
     outs = []
@@ -13,10 +29,11 @@ def run(df: pd.DataFrame, cfg: Config):
 
     # τ by order: ANOVA + MW
     if cfg.tau_col in df.columns and cfg.order_col in df.columns:
-        sub = df[[cfg.tau_col, cfg.order_col]].dropna().copy()
+        sub = df[[cfg.tau_col, cfg.order_col]].dropna()
         sub[cfg.order_col] = sub[cfg.order_col].astype("category")
         if len(sub)>=3 and sub[cfg.order_col].nunique()>=2:
-            model = smf.ols(f"{cfg.tau_col} ~ C({cfg.order_col})", data=sub).fit()
+            with span("fit.ols", "fit", rows_in=len(sub)):
+                model = smf.ols(f"{cfg.tau_col} ~ C({cfg.order_col})", data=sub).fit()
             aov = anova_lm(model, typ=2).reset_index().rename(columns={"index":"term"})
             write_table(aov, f"{outdir}/step04_tau_anova.csv")
             outs.append({"kind":"csv","path":f"{outdir}/step04_tau_anova.csv"})
@@ -28,51 +45,57 @@ def run(df: pd.DataFrame, cfg: Config):
                             f"{outdir}/step04_tau_mw.csv")
                 outs.append({"kind":"csv","path":f"{outdir}/step04_tau_mw.csv"})
 
+    # τ difference by order: cluster bootstrap CI and permutation p
+    if cfg.bootstrap and all(c in df.columns for c in [cfg.tau_col, cfg.order_col, cluster_col(cfg)]):
+        tables = cluster_sums(df, cluster_col(cfg), cfg.order_col, cfg.tau_col, by=cfg.model_col)
+        res = resample(tables, mean_stats, cfg.bootstrap, cfg.bootstrap_seed, cfg.jobs)
+        write_table(res, f"{outdir}/step04_tau_bootstrap.csv")
+        outs.append({"kind":"csv","path":f"{outdir}/step04_tau_bootstrap.csv"})
+
     # Mixed model τ with controls
     if all(c in df.columns for c in [cfg.tau_col, cfg.order_col, cfg.item_col]):
         cols = [cfg.tau_col, cfg.order_col, cfg.item_col]
         for opt in [cfg.family_col, cfg.gen2_col]:
             if opt in df.columns:
                 cols.append(opt)
-        sub = df[cols].dropna().copy()
+        sub = df[cols].dropna()
         for c in [cfg.order_col, cfg.family_col, cfg.gen2_col]:
             if c in sub.columns:
-                sub[c] = sub[c].astype("category")
+                sub[c] = sub[c].astype("category").cat.remove_unused_categories()
         try:
             formula = f"{cfg.tau_col} ~ C({cfg.order_col})"
             if cfg.family_col in sub.columns:
                 formula += f" + C({cfg.family_col})"
             if cfg.gen2_col in sub.columns:
                 formula += f" + C({cfg.gen2_col})"
-            mdf = mixedlm_random_intercept(
-                formula,
-                sub,
-                sub[cfg.item_col].astype(str)
-                )                                                                                                                                                                          
-            write_text(mdf.summary().as_text(), f"{outdir}/step04_tau_mixed.txt")
+            mdf = mixedlm_random_intercept(formula, sub, sub[cfg.item_col].astype(str))
+            write_model(mdf, f"{outdir}/step04_tau_mixed.txt")
             outs.append({"kind":"txt","path":f"{outdir}/step04_tau_mixed.txt"})
         except Exception as e:
             write_text(f"MixedLM failed: {e}", f"{outdir}/step04_tau_mixed.txt")
             outs.append({"kind":"txt","path":f"{outdir}/step04_tau_mixed.txt"})
 
-    # Metrics by order: OLS (clustered by item) + MW
+    # Metrics by order: OLS (clustered by item) + MW. Metrics with the same
+    # missingness pattern share one design, cluster coding and sort.
     if cfg.order_col in df.columns:
-        for metric in getattr(cfg, "metrics", []):
-            if metric not in df.columns: 
-                continue
-            sub = df[[metric, cfg.order_col, cfg.item_col]].dropna().copy()
+        metrics = [m for m in getattr(cfg, "metrics", []) if m in df.columns]
+        for group, mask in _missingness_groups(df, metrics, [cfg.order_col, cfg.item_col]):
+            sub = df.loc[mask, [*group, cfg.order_col, cfg.item_col]]
+            sub[cfg.order_col] = sub[cfg.order_col].astype("category").cat.remove_unused_categories()
             if len(sub) < 10 or sub[cfg.order_col].nunique()<2:
                 continue
-            model = ols_cluster(f"{metric} ~ C({cfg.order_col})", sub, sub[cfg.item_col].astype(str))
-            txt = model.summary().as_text()
-            write_text(txt, f"{outdir}/step04_metric_{metric}_ols_cluster.txt")
-            outs.append({"kind":"txt","path":f"{outdir}/step04_metric_{metric}_ols_cluster.txt"})
-            sv = sub[sub[cfg.order_col]=="SV"][metric]
-            vs = sub[sub[cfg.order_col]=="VS"][metric]
-            if len(sv)>0 and len(vs)>0:
-                U,p = stats.mannwhitneyu(sv, vs, alternative="two-sided")
-                write_table(pd.DataFrame([{"metric":metric,"test":"MW","U":float(U),"p":float(p),"n_SV":len(sv),"n_VS":len(vs)}]),
-                            f"{outdir}/step04_metric_{metric}_mw.csv")
-                outs.append({"kind":"csv","path":f"{outdir}/step04_metric_{metric}_mw.csv"})
+            models = ols_cluster_many(group, f"C({cfg.order_col})", sub, sub[cfg.item_col])
+            is_sv, is_vs = (sub[cfg.order_col]=="SV").to_numpy(), (sub[cfg.order_col]=="VS").to_numpy()
+            both = is_sv | is_vs
+            mw = mannwhitneyu_batch(sub.loc[both, group].to_numpy(dtype=float), is_sv[both]) \
+                if is_sv.any() and is_vs.any() else None
+            for j, metric in enumerate(group):
+                write_model(models[metric], f"{outdir}/step04_metric_{metric}_ols_cluster.txt")
+                outs.append({"kind":"txt","path":f"{outdir}/step04_metric_{metric}_ols_cluster.txt"})
+                if mw is not None:
+                    write_table(pd.DataFrame([{"metric":metric,"test":"MW","U":float(mw["U"].iloc[j]),"p":float(mw["p"].iloc[j]),
+                                               "n_SV":int(is_sv.sum()),"n_VS":int(is_vs.sum())}]),
+                                f"{outdir}/step04_metric_{metric}_mw.csv")
+                    outs.append({"kind":"csv","path":f"{outdir}/step04_metric_{metric}_mw.csv"})
 
     return {"step":"04_alignment_quality","outputs":outs}
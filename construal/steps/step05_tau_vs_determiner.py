@@ -1,8 +1,14 @@
+import numpy as np
 import pandas as pd
 from scipy.stats import kendalltau, kruskal
 import statsmodels.formula.api as smf
 from ..common.config import Config
-from ..common.io import write_table, write_text
+from ..common.io import write_model, write_table, write_text
+from ..common.tables import det_label, level_codes
+from ..common.trace import span
+
+def columns(cfg: Config) -> list[str]:
+    return [cfg.tau_col, cfg.success_col, cfg.det_col]
 
 def run(df: pd.DataFrame, cfg: Config):
     outs = []
@@ -10,14 +16,15 @@ def run(df: pd.DataFrame, cfg: Config):
 
     # τ ↔ success
     if all(c in df.columns for c in [cfg.tau_col, cfg.success_col]):
-        sub = df[[cfg.tau_col, cfg.success_col]].dropna().copy()
+        sub = df[[cfg.tau_col, cfg.success_col]].dropna()
         if len(sub)>=5:
             r = sub[[cfg.tau_col, cfg.success_col]].corr(method="pearson").iloc[0,1]
             write_table(pd.DataFrame([{"test":"pointbiserial(Pearson)", "r":float(r), "n":len(sub)}]),
                         f"{outdir}/step05_tau_success_corr.csv")
             try:
-                m = smf.logit(f"{cfg.success_col} ~ {cfg.tau_col}", data=sub).fit(disp=False)
-                write_text(m.summary().as_text(), f"{outdir}/step05_tau_success_logit.txt")
+                with span("fit.logit", "fit", rows_in=len(sub)):
+                    m = smf.logit(f"{cfg.success_col} ~ {cfg.tau_col}", data=sub).fit(disp=False)
+                write_model(m, f"{outdir}/step05_tau_success_logit.txt")
                 outs += [{"kind":"csv","path":f"{outdir}/step05_tau_success_corr.csv"},
                          {"kind":"txt","path":f"{outdir}/step05_tau_success_logit.txt"}]
             except Exception as e:
@@ -27,28 +34,29 @@ def run(df: pd.DataFrame, cfg: Config):
 
     # τ ↔ determiner (ordinal)
     if all(c in df.columns for c in [cfg.tau_col, cfg.det_col]):
-        sub = df[[cfg.tau_col, cfg.det_col]].dropna().copy()
+        sub = df[[cfg.tau_col, cfg.det_col]].dropna()
         if len(sub)>=5 and sub[cfg.det_col].nunique()>=2:
-            ord_map = {"none":0,"ind":1,"def":2}
-            y = sub[cfg.det_col].astype(str).str.lower().map(ord_map)
+            # Ordinal none < ind < def; derive_design's "Indef" counts as ind
+            codes = level_codes(sub[cfg.det_col], ["none","ind","def"], normalize=det_label)
+            y = pd.Series(np.where(codes >= 0, codes, np.nan), index=sub.index)
             tau, p = kendalltau(sub[cfg.tau_col], y)
             write_table(pd.DataFrame([{"test":"Kendall_tau_b (tau vs det_ord)","tau":float(tau),"p":float(p),"n":len(sub)}]),
                         f"{outdir}/step05_tau_det_kendall.csv")
-            groups = [sub.loc[sub[cfg.det_col]==k, cfg.tau_col].values for k in ["none","ind","def"]]
+            outs.append({"kind":"csv","path":f"{outdir}/step05_tau_det_kendall.csv"})
+            groups = [sub.loc[codes==k, cfg.tau_col].values for k in range(3)]
             if all(len(g)>0 for g in groups):
                 H, pk = kruskal(*groups)
                 write_table(pd.DataFrame([{"test":"KruskalWallis(tau by det)","H":float(H),"p":float(pk)}]),
                             f"{outdir}/step05_tau_det_kw.csv")
+                outs.append({"kind":"csv","path":f"{outdir}/step05_tau_det_kw.csv"})
             try:
                 sub = sub.assign(det_ord=y)
-                m = smf.mnlogit(f"det_ord ~ {cfg.tau_col}", data=sub).fit(disp=False)
-                write_text(m.summary().as_text(), f"{outdir}/step05_tau_det_mnlogit.txt")
-                outs += [{"kind":"csv","path":f"{outdir}/step05_tau_det_kendall.csv"},
-                         {"kind":"csv","path":f"{outdir}/step05_tau_det_kw.csv"},
-                         {"kind":"txt","path":f"{outdir}/step05_tau_det_mnlogit.txt"}]
+                with span("fit.mnlogit", "fit", rows_in=len(sub)):
+                    m = smf.mnlogit(f"det_ord ~ {cfg.tau_col}", data=sub).fit(disp=False)
+                write_model(m, f"{outdir}/step05_tau_det_mnlogit.txt")
             except Exception as e:
                 write_text(f"Multinomial logit failed (try ordinal logit in future): {e}", f"{outdir}/step05_tau_det_mnlogit.txt")
-                outs += [{"kind":"csv","path":f"{outdir}/step05_tau_det_kendall.csv"}]
+            outs.append({"kind":"txt","path":f"{outdir}/step05_tau_det_mnlogit.txt"})
 
     if not outs:
         write_text("Step05 skipped: missing columns.", f"{outdir}/step05_readme.txt")
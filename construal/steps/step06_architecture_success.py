@@ -1,7 +1,10 @@
 import pandas as pd
-import statsmodels.formula.api as smf
 from ..common.config import Config
-from ..common.io import write_text
+from ..common.io import write_model, write_text
+from ..common.models import clustered_logit
+
+def columns(cfg: Config) -> list[str]:
+    return [cfg.success_col, cfg.order_col, cfg.family_col, cfg.item_col, cfg.gen2_col]
 
 def run(df: pd.DataFrame, cfg: Config):
     outs = []
@@ -11,13 +14,13 @@ def run(df: pd.DataFrame, cfg: Config):
         write_text("Step06 skipped: required columns missing.", f"{outdir}/step06_readme.txt")
         return {"step":"06_architecture_success","outputs":[{"kind":"txt","path":f"{outdir}/step06_readme.txt"}]}
 
-    sub = df[need].dropna().copy()
+    sub = df[need].dropna()
     for c in [cfg.order_col, cfg.family_col, cfg.gen2_col]:
-        sub[c] = sub[c].astype("category")
+        sub[c] = sub[c].astype("category").cat.remove_unused_categories()
     try:
-        m = smf.logit(f"{cfg.success_col} ~ C({cfg.order_col})*C({cfg.family_col}) + C({cfg.gen2_col})",
-                      data=sub).fit(disp=False, cov_type="cluster", cov_kwds={"groups": sub[cfg.item_col].astype(str)})
-        write_text(m.summary().as_text(), f"{outdir}/step06_architecture_logit.txt")
+        m = clustered_logit(f"{cfg.success_col} ~ C({cfg.order_col})*C({cfg.family_col}) + C({cfg.gen2_col})",
+                            sub, cfg.item_col)
+        write_model(m, f"{outdir}/step06_architecture_logit.txt")
         outs.append({"kind":"txt","path":f"{outdir}/step06_architecture_logit.txt"})
     except Exception as e:
         write_text(f"Architecture logit failed: {e}", f"{outdir}/step06_architecture_logit.txt")
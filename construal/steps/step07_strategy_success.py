@@ -1,8 +1,12 @@
 import pandas as pd
 import numpy as np
-import statsmodels.formula.api as smf
 from ..common.config import Config
-from ..common.io import write_text
+from ..common.io import write_model, write_text
+from ..common.models import clustered_logit
+
+def columns(cfg: Config) -> list[str]:
+    return [cfg.success_col, cfg.order_col, "strategy", cfg.family_col, cfg.item_col,
+            "objective", "top_p_used", "beam_used"]
 
 def derive_strategy(df: pd.DataFrame) -> pd.Series:
     strat = pd.Series("greedy", index=df.index, dtype="string")
@@ -18,21 +22,20 @@ def run(df: pd.DataFrame, cfg: Config):
     outs = []
     outdir = cfg.out_dir
     if "strategy" not in df.columns:
-        df = df.copy()
-        df["strategy"] = derive_strategy(df)
+        df = df.assign(strategy=derive_strategy(df))
 
     need = [cfg.success_col, cfg.order_col, "strategy", cfg.family_col, cfg.item_col]
     if not all(c in df.columns for c in need):
         write_text("Step07 skipped: required columns missing.", f"{outdir}/step07_readme.txt")
         return {"step":"07_strategy_success","outputs":[{"kind":"txt","path":f"{outdir}/step07_readme.txt"}]}
 
-    sub = df[need].dropna().copy()
+    sub = df[need].dropna()
     for c in [cfg.order_col, "strategy", cfg.family_col]:
-        sub[c] = sub[c].astype("category")
+        sub[c] = sub[c].astype("category").cat.remove_unused_categories()
     try:
-        m = smf.logit(f"{cfg.success_col} ~ C({cfg.order_col})*C(strategy) + C({cfg.family_col})",
-                      data=sub).fit(disp=False, cov_type="cluster", cov_kwds={"groups": sub[cfg.item_col].astype(str)})
-        write_text(m.summary().as_text(), f"{outdir}/step07_strategy_logit.txt")
+        m = clustered_logit(f"{cfg.success_col} ~ C({cfg.order_col})*C(strategy) + C({cfg.family_col})",
+                            sub, cfg.item_col)
+        write_model(m, f"{outdir}/step07_strategy_logit.txt")
         outs.append({"kind":"txt","path":f"{outdir}/step07_strategy_logit.txt"})
     except Exception as e:
         write_text(f"Strategy logit failed: {e}", f"{outdir}/step07_strategy_logit.txt")
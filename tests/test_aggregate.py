@@ -0,0 +1,59 @@
+import sys
+import pathlib
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from construal.common.aggregate import _SentenceMax, stream_counts
+from construal.common.config import Config
+from construal.common.preprocess import derive_design
+from construal.steps import step01_chance, step02_success_sv_vs, step03_determiner_dist
+
+
+def _frame(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "sent_id": np.arange(n) // 3,
+        "model": np.tile(["m1", "m2", "m3"], n // 3 + 1)[:n],
+        "pool_type": rng.choice(["plain", "mbrish"], n),
+        "order_cond": rng.choice(["SV", "VS", "sv", None], n),
+        "det_cat": rng.choice(["Def", "Indef", "none", None], n),
+        "construal_match_bin": rng.choice([0, 1, None], n),
+    })
+    return df
+
+
+def test_stream_counts_match_in_memory_steps(tmp_path):
+    raw = _frame()
+    shards = tmp_path / "shards"
+    shards.mkdir()
+    raw.iloc[:150].to_parquet(shards / "part-0.parquet")
+    raw.iloc[150:].to_parquet(shards / "part-1.parquet")
+    raw.iloc[:50].to_parquet(shards / "part-2.parquet")  # rerun of the same (sent_id, model) keys
+
+    mem_cfg = Config(in_path=shards, out_dir=tmp_path / "mem")
+    stream_cfg = Config(in_path=shards, out_dir=tmp_path / "stream")
+    df = derive_design(raw, mem_cfg)
+    cubes = stream_counts(shards, stream_cfg, batch_size=37)
+    assert cubes.n_rows == len(df)
+
+    for step in (step01_chance, step02_success_sv_vs, step03_determiner_dist):
+        step.run(df, mem_cfg)
+        step.run_counts(cubes, stream_cfg)
+    for path in sorted((tmp_path / "mem").glob("*.csv")):
+        pdt.assert_frame_equal(pd.read_csv(path), pd.read_csv(tmp_path / "stream" / path.name))
+
+
+def test_sentence_max_across_batches_matches_one_pass():
+    rng = np.random.default_rng(3)
+    rows = pd.DataFrame({"sent": rng.integers(0, 300, 5000), "order": rng.choice(["SV", "VS"], 5000),
+                         "n": rng.integers(0, 2, 5000).astype(float)})
+    acc = _SentenceMax()
+    for start in range(0, len(rows), 113):
+        batch = rows.iloc[start:start + 113].groupby(["sent", "order"], as_index=False)["n"].max()
+        acc.update(batch)
+    assert len(acc.runs) <= np.log2(600) + 1
+    ref = rows.groupby(["sent", "order"])["n"].max().groupby(level="order").agg(["sum", "size"])
+    assert {o: (k, n) for o, (k, n) in acc.totals.items()} == \
+        {o: (float(r["sum"]), int(r["size"])) for o, r in ref.iterrows()}
@@ -0,0 +1,49 @@
+import sys
+import pathlib
+from argparse import Namespace
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from construal.api import analyze
+from construal.bench.synth import synthetic_selected
+from construal.common.config import Config
+from construal.pipeline import run_pipeline
+
+
+def test_analyze_matches_pipeline_without_writing(tmp_path, monkeypatch):
+    raw = synthetic_selected(3000, models=3, items=800, seed=4)
+    raw.to_parquet(tmp_path / "selected.parquet", index=False)
+    run_pipeline(Namespace(in_path=str(tmp_path / "selected.parquet"), out_dir=str(tmp_path / "out"),
+                           all=False, steps=["1", "2", "6"], no_cache=True))
+    monkeypatch.chdir(tmp_path)
+    before = sorted(tmp_path.rglob("*"))
+    res = analyze(pa.Table.from_pandas(raw), steps=["1", "2", "6"])
+    assert sorted(tmp_path.rglob("*")) == before
+    assert list(res) == ["1", "2", "6"] and res["2"].step == "02_success_sv_vs"
+    assert sum(res["1"].notes["duplicates_dropped"].values()) > 0
+
+    for arts in res.values():
+        for a in arts.outputs:
+            on_disk = tmp_path / "out" / pathlib.Path(a.path).name
+            if a.kind == "csv":
+                pd.testing.assert_frame_equal(a.data, pd.read_csv(on_disk), check_dtype=False)
+    logit = res["6"]["step06_architecture_logit"]
+    assert {"term", "coef", "se", "p"} <= set(logit.columns) and len(logit) > 1
+    assert res["6"].outputs[0].kind == "coefficients"
+    assert {a.kind for a in res["1"].outputs} == {"csv", "txt"}
+    text = res["6"].outputs[0].summary["text"]
+    assert text.split("Date:")[0] == (tmp_path / "out" / "step06_architecture_logit.txt").read_text().split("Date:")[0]
+
+
+def test_analyze_filters_and_optional_disk_sink(tmp_path):
+    raw = synthetic_selected(2000, models=4, seed=5)
+    cfg = Config(in_path=pathlib.Path("<memory>"), out_dir=tmp_path / "out", results="parquet", run_id="r1")
+    res = analyze(raw, cfg, steps=["2"], models=["m01", "m02"], write=True)
+    counts = res["2"]["step02_per_model_2x2_counts"]
+    assert list(counts["model"]) == ["m01", "m02"]
+    stored = [a for a in res["2"].outputs if a.summary["artifact"] == "step02_per_model_2x2_counts"][0]
+    assert stored.kind == "parquet" and pathlib.Path(stored.path).exists()
+    back = pd.read_parquet(stored.path, filters=[("artifact", "==", stored.summary["artifact"])],
+                           columns=stored.summary["columns"])
+    pd.testing.assert_frame_equal(back, counts, check_dtype=False)
@@ -0,0 +1,41 @@
+import sys
+import pathlib
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from construal.bench.harness import compare, parse_size, run_benchmarks
+from construal.bench.synth import synthetic_selected, write_synthetic
+
+
+def test_synthetic_input_is_seeded_and_raw():
+    a = synthetic_selected(2000, models=5, missing=0.1, seed=3)
+    pd.testing.assert_frame_equal(a, synthetic_selected(2000, models=5, missing=0.1, seed=3))
+    assert {"src_order", "ann_det_general", "decode_params", "pool_type", "mode"} <= set(a.columns)
+    assert a["model"].nunique() == 5 and a["sent_id"].nunique() == 400
+    assert 0.05 < a["rt_bleu"].isna().mean() < 0.15
+    assert not a.duplicated(["sent_id", "model"]).any()
+    assert synthetic_selected(2000, models=5, items=100).duplicated(["sent_id", "model"]).sum() == 1500
+
+
+def test_chunked_writer(tmp_path):
+    write_synthetic(tmp_path / "s.parquet", 2500, chunk=1000, models=4)
+    df = pd.read_parquet(tmp_path / "s.parquet")
+    assert len(df) == 2500 and df["sent_id"].max() == 624
+
+
+def test_run_and_compare(tmp_path):
+    assert parse_size("10k") == 10_000 and parse_size("2.5M") == 2_500_000
+    res = run_benchmarks([1000], ["1", "3"], tmp_path, models=2)
+    assert [r["stage"] for r in res["results"]] == ["preprocess", "01_chance", "03_determiner_dist"]
+    assert all(r["wall_s"] >= 0 and r["peak_rss_mb"] > 0 for r in res["results"])
+
+    slow = {"results": [dict(r, wall_s=r["wall_s"] * 3 + 1) for r in res["results"]]}
+    assert compare(res, res) == []
+    flagged = compare(res, slow)
+    assert {r["stage"] for r in flagged} == {"preprocess", "01_chance", "03_determiner_dist"}
+    assert {r["metric"] for r in flagged} == {"wall_s"}
+
+    rep = run_benchmarks([1000], ["1"], tmp_path, models=2, items=50)
+    assert rep["meta"]["items"] == 50 and res["meta"]["items"] is None
+    assert pd.read_parquet(tmp_path / "selected_1000_2m_50i_0s_0.05.parquet")["sent_id"].nunique() == 50
+    assert (tmp_path / "selected_1000_2m_500i_0s_0.05.parquet").exists()
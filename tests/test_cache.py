@@ -0,0 +1,52 @@
+import sys
+import os
+import pathlib
+import pandas as pd
+import pandas.testing as pdt
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from construal.common.cache import cached_design, cache_dir, evict
+from construal.common.config import Config
+from construal.common.preprocess import derive_design
+
+
+def test_cached_design_reuses_and_invalidates(tmp_path):
+    path = tmp_path / "selected.parquet"
+    raw = pd.DataFrame({"sent_id": [1, 2], "model": ["m", "m"], "order_cond": ["SV", "VS"],
+                        "det_cat": ["Def", "Indef"], "construal_match_bin": [1, 0]})
+    raw.to_parquet(path)
+    cfg = Config(in_path=path, out_dir=tmp_path / "out")
+    calls = []
+    def build():
+        calls.append(1)
+        return derive_design(pd.read_parquet(path), cfg)
+
+    first, cached = cached_design(cfg, None, [], build)
+    second, _ = cached_design(cfg, None, [], build)
+    assert len(calls) == 1 and cached.exists()
+    pdt.assert_frame_equal(first, second)
+
+    cached_design(Config(in_path=path, out_dir=cfg.out_dir, bootstrap=50, results="parquet"), None, [], build)
+    assert len(calls) == 1                          # fields preprocessing does not read
+    cached_design(Config(in_path=path, out_dir=cfg.out_dir, sv_vs_only=True), None, [], build)
+    os.utime(path, ns=(0, 0))
+    cached_design(cfg, None, [], build)
+    assert len(calls) == 3
+    cached_design(Config(in_path=path, out_dir=cfg.out_dir, use_cache=False), None, [], build)
+    assert len(calls) == 4
+
+    evict(cache_dir(cfg), max_bytes=cached.stat().st_size)
+    assert len(list(cache_dir(cfg).glob("*.arrow"))) == 1
+
+
+def test_design_key_covers_reader_and_table_code(tmp_path, monkeypatch):
+    from construal.common import cache, io, tables
+    pd.DataFrame({"sent_id": [1]}).to_parquet(tmp_path / "selected.parquet")
+    cfg = Config(in_path=tmp_path / "selected.parquet", out_dir=tmp_path)
+    key = cache.design_key(cfg, None, [])
+    for mod in (io, tables):
+        src = tmp_path / f"{mod.__name__}.py"
+        src.write_bytes(pathlib.Path(mod.__file__).read_bytes() + b"\n# changed\n")
+        monkeypatch.setattr(mod, "__file__", str(src))
+        assert cache.design_key(cfg, None, []) != key
+        key = cache.design_key(cfg, None, [])
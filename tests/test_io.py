@@ -0,0 +1,121 @@
+import sys
+import pathlib
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from construal.common.io import (DUPLICATES_ATTR, AsyncWriter, _dataset, iter_batches, read_columns, read_df,
+                                 read_ipc, write_ipc)
+from construal.common.preprocess import design_columns, design_filters
+from construal.common import copy_on_write
+from construal.common.config import Config
+
+
+def _write(tmp_path):
+    df = pd.DataFrame({
+        "sent_id": [1, 1, 2, 2, 3],
+        "model": ["m1", "m2", "m1", "m2", "m1"],
+        "order_cond": ["SV", "vs", "XX", "VS", None],
+        "construal_match_bin": [1, 0, 1, 1, 0],
+        "text": ["long"] * 5,
+    })
+    path = tmp_path / "selected.parquet"
+    df.to_parquet(path)
+    return path
+
+
+def test_read_df_projects_and_filters(tmp_path):
+    path = _write(tmp_path)
+    df = read_df(path, columns=["model", "order_cond", "missing"],
+                 filters=[("order_cond", "in", ["SV", "vs", "VS"]), ("missing", "==", 1)])
+    assert list(df.columns) == ["model", "order_cond"]
+    assert df["order_cond"].tolist() == ["SV", "vs", "VS"]
+
+
+def test_design_columns_and_filters(tmp_path):
+    path = _write(tmp_path)
+    available = read_columns(path)
+    cfg = Config(in_path=path, out_dir=tmp_path, sv_vs_only=True)
+    cols = design_columns(cfg, available)
+    assert "text" not in cols
+    assert {"sent_id", "model", "order_cond", "construal_match_bin"} <= set(cols)
+    (col, op, values), = design_filters(cfg, available)
+    assert col == "order_cond" and {"SV", "vs", "Vs"} <= set(values)
+
+
+def test_read_df_drops_duplicate_keys_on_arrow_table(tmp_path):
+    path = tmp_path / "dup.parquet"
+    pd.DataFrame({
+        "sent_id": [1, 1, 2, 1, 2],
+        "model": ["a", "b", "a", "a", "a"],
+        "score": [1.0, 2.0, 3.0, 4.0, 5.0],
+    }).to_parquet(path, index=False)
+    df = read_df(path, dedup=["sent_id", "model"])
+    assert df["score"].tolist() == [1.0, 2.0, 3.0]
+    assert df.attrs[DUPLICATES_ATTR] == {"a": 2}
+
+
+def test_async_writer_orders_writes_and_reports_errors(tmp_path):
+    w = AsyncWriter(workers=3, max_pending=2)
+    for i in range(20):
+        w.submit(tmp_path / "a" / "b" / "x.txt", str(i).encode())
+    w.flush()
+    assert (tmp_path / "a" / "b" / "x.txt").read_text() == "19"
+
+    (tmp_path / "blocked").write_text("a file, not a directory")
+    w.submit(tmp_path / "blocked" / "y.csv", b"a\n1\n")
+    w.submit(tmp_path / "ok.csv", b"a\n1\n")
+    with pytest.raises(OSError):
+        w.close()
+    assert (tmp_path / "ok.csv").read_text() == "a\n1\n"
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_sharded_hive_input_and_model_pruning(tmp_path):
+    for model, rows in [("m1", 2), ("7", 3)]:
+        for part in range(2):
+            shard = tmp_path / "in" / f"model={model}" / f"part-{part}.parquet"
+            shard.parent.mkdir(parents=True, exist_ok=True)
+            pd.DataFrame({"sent_id": range(rows), "order_cond": ["SV"] * rows}).to_parquet(shard)
+    (tmp_path / "in" / "_SUCCESS").write_text("")
+
+    assert read_columns(tmp_path / "in") == ["sent_id", "order_cond", "model"]
+    df = read_df(tmp_path / "in")
+    assert len(df) == 10 and sorted(df["model"].unique()) == ["7", "m1"]
+    globbed = read_df(tmp_path / "in" / "model=*" / "part-1.parquet", columns=["model"])
+    assert globbed["model"].value_counts().to_dict() == {"7": 3, "m1": 2}
+
+    cfg = Config(in_path=tmp_path / "in", out_dir=tmp_path / "out", models=["7"])
+    filters = design_filters(cfg, read_columns(cfg.in_path))
+    assert filters == [("model", "in", ["7"])]
+    import pyarrow.dataset as ds
+    fragments = list(_dataset(tmp_path / "in").get_fragments(filter=ds.field("model").isin(["7"])))
+    assert len(fragments) == 2
+    assert set(read_df(cfg.in_path, filters=filters)["model"]) == {"7"}
+    assert sum(len(b) for b in iter_batches(cfg.in_path, filters=filters, batch_size=2)) == 6
+
+
+def test_ipc_input_is_memory_mapped_and_copy_on_write(tmp_path):
+    src = _write(tmp_path)
+    write_ipc(pd.read_parquet(src), tmp_path / "selected.arrow")
+    df = read_df(tmp_path / "selected.arrow", columns=["sent_id", "model", "nope"],
+                 filters=[("model", "==", "m1")])
+    assert list(df.columns) == ["sent_id", "model"] and list(df["sent_id"]) == [1, 2, 3]
+
+    frame = read_ipc(tmp_path / "selected.arrow")
+    ids = frame["sent_id"].to_numpy()
+    assert not ids.flags.writeable                  # a view of the mapped file, not a copy
+    with copy_on_write():
+        sub = frame[["sent_id", "model"]]
+        sub.loc[0, "sent_id"] = 99                  # copied on write, the mapping is untouched
+    assert sub["sent_id"].iloc[0] == 99 and frame["sent_id"].iloc[0] == 1 and ids[0] == 1
+
+
+def test_read_ipc_rows_matches_take(tmp_path):
+    df = pd.DataFrame({"a": range(6), "c": pd.Categorical(list("xyzxyz")), "s": list("abcdef")})
+    for frame in (df, df.iloc[::-1].set_index("s")):
+        write_ipc(frame, tmp_path / "f.arrow")
+        rows = [4, 0, 2]
+        pd.testing.assert_frame_equal(read_ipc(tmp_path / "f.arrow", rows), frame.take(rows))
+    write_ipc(df.iloc[1:], tmp_path / "g.arrow")                   # RangeIndex starting at 1
+    pd.testing.assert_frame_equal(read_ipc(tmp_path / "g.arrow", [3, 1]), df.iloc[1:].take([3, 1]))
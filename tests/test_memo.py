@@ -0,0 +1,49 @@
+import sys
+import pathlib
+import pandas as pd
+import pandas.testing as pdt
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from construal.common.config import Config
+from construal.common.memo import load_step, memo_rows, save_step, step_fingerprint
+from construal.steps import step02_success_sv_vs
+
+
+def _frame(extra_model=False):
+    rows = [{"sent_id": i, "model": m, "order_cond": "SV" if i % 2 else "VS",
+             "construal_match_bin": (i + j) % 3 == 0}
+            for i in range(20) for j, m in enumerate(["m1", "m2"])]
+    if extra_model:
+        rows += [{"sent_id": i, "model": "m3", "order_cond": "SV", "construal_match_bin": 1} for i in range(5)]
+    return pd.DataFrame(rows).astype({"construal_match_bin": int})
+
+
+def test_memo_rows_recomputes_only_changed_models(tmp_path):
+    cfg = Config(in_path=tmp_path / "in", out_dir=tmp_path, incremental=True)
+    seen = []
+    def compute(sub):
+        seen.append(sorted(sub["model"].unique()))
+        return [{"model": m, "n": len(g)} for m, g in sub.groupby("model")]
+
+    assert memo_rows(cfg, "t", _frame(), ["model", "sent_id"], compute) == [{"model": "m1", "n": 20}, {"model": "m2", "n": 20}]
+    assert len(memo_rows(cfg, "t", _frame(extra_model=True), ["model", "sent_id"], compute)) == 3
+    assert seen == [["m1", "m2"], ["m3"]]
+
+
+def test_incremental_step_matches_full_run(tmp_path):
+    full = Config(in_path=tmp_path / "in", out_dir=tmp_path / "full")
+    inc = Config(in_path=tmp_path / "in", out_dir=tmp_path / "inc", incremental=True)
+    step02_success_sv_vs.run(_frame(), inc)
+    step02_success_sv_vs.run(_frame(extra_model=True), inc)
+    step02_success_sv_vs.run(_frame(extra_model=True), full)
+    for name in ("step02_per_model_2x2_counts.csv", "step02_cmh_models.csv"):
+        pdt.assert_frame_equal(pd.read_csv(full.out_dir / name), pd.read_csv(inc.out_dir / name))
+
+
+def test_step_fingerprint_roundtrip(tmp_path):
+    cfg = Config(in_path=tmp_path / "in", out_dir=tmp_path, incremental=True)
+    arts = step02_success_sv_vs.run(_frame(), cfg)
+    fp = step_fingerprint(step02_success_sv_vs, _frame(), cfg)
+    save_step("2", fp, arts, cfg)
+    assert load_step("2", fp, cfg) == arts
+    assert load_step("2", step_fingerprint(step02_success_sv_vs, _frame(extra_model=True), cfg), cfg) is None
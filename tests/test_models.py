@@ -0,0 +1,79 @@
+import sys
+import pathlib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from construal.common.models import (_rowwise_logit, clustered_logit, mixedlm_random_intercept,
+                                     ols_cluster, ols_cluster_many)
+import statsmodels.formula.api as smf
+
+
+def _strip(summary):
+    return [l for l in summary.as_text().splitlines() if "Date:" not in l and "Time:" not in l]
+
+
+def test_clustered_logit_matches_rowwise_fit():
+    rng = np.random.default_rng(0)
+    n = 4000
+    df = pd.DataFrame({
+        "order": rng.choice(["SV", "VS"], n),
+        "family": rng.choice(["enc", "dec", "encdec"], n),
+        "item": rng.integers(0, 80, n),
+    })
+    eta = -0.2 + 0.6 * (df["order"] == "VS") - 0.3 * (df["family"] == "dec") + rng.normal(0, 0.5, 80)[df["item"]]
+    df["y"] = (rng.random(n) < 1 / (1 + np.exp(-eta))).astype(int)
+    for c in ["order", "family"]:
+        df[c] = df[c].astype("category")
+
+    formula = "y ~ C(order)*C(family)"
+    fast, slow = clustered_logit(formula, df, "item"), _rowwise_logit(formula, df, "item")
+    assert np.allclose(fast.params, slow.params, rtol=1e-8)
+    assert np.allclose(fast.bse, slow.bse, rtol=1e-8)
+    assert fast.nobs == slow.nobs and fast.df_resid == slow.df_resid
+    assert _strip(fast.summary()) == _strip(slow.summary())
+
+
+def test_random_intercept_solver_matches_statsmodels():
+    rng = np.random.default_rng(1)
+    n, groups = 3000, 150
+    df = pd.DataFrame({"order": rng.choice(["SV", "VS"], n), "item": rng.integers(0, groups, n)})
+    df["tau"] = 0.1 + 0.3 * (df["order"] == "VS") + rng.normal(0, 0.7, groups)[df["item"]] + rng.normal(0, 1, n)
+
+    fast = mixedlm_random_intercept("tau ~ C(order)", df, df["item"])
+    ref = smf.mixedlm("tau ~ C(order)", df, groups=df["item"]).fit()
+    assert np.allclose(fast.fe_params, ref.fe_params, atol=1e-4)
+    assert np.allclose(fast.bse, ref.bse, atol=1e-4)
+    assert np.isclose(fast.scale, ref.scale, rtol=1e-4)
+    assert np.isclose(fast.cov_re.iloc[0, 0], ref.cov_re.iloc[0, 0], rtol=1e-3)
+    assert np.isclose(fast.llf, ref.llf, rtol=1e-6)
+
+    warm = mixedlm_random_intercept("tau ~ C(order)", df, df["item"], start=float(fast.cov_re_unscaled.iloc[0, 0]))
+    assert np.allclose(warm.params, fast.params, atol=1e-8)
+
+
+def test_random_intercept_solver_at_zero_group_variance():
+    rng = np.random.default_rng(0)
+    n, groups = 2000, 500
+    df = pd.DataFrame({"order": rng.choice(["SV", "VS"], n), "item": rng.integers(0, groups, n)})
+    df["tau"] = 0.4 + 0.05 * (df["order"] == "VS") + rng.normal(0, 0.3, n)
+
+    fast = mixedlm_random_intercept("tau ~ C(order)", df, df["item"])
+    ols = smf.ols("tau ~ C(order)", df).fit()
+    ref = smf.mixedlm("tau ~ C(order)", df, groups=df["item"]).fit()
+    assert fast.cov_re.iloc[0, 0] < 1e-8
+    assert np.allclose(fast.fe_params, ols.params, atol=1e-10)
+    assert np.isclose(fast.scale, ols.scale, rtol=1e-10)
+    assert np.isfinite(fast.llf) and fast.llf >= ref.llf - 1e-6
+
+
+def test_ols_cluster_many_matches_per_metric_fits():
+    rng = np.random.default_rng(2)
+    n = 500
+    df = pd.DataFrame({"order": rng.choice(["SV", "VS"], n), "item": rng.integers(0, 40, n)})
+    for m in ["chrf", "bleu", "ter"]:
+        df[m] = rng.normal(size=n) + 0.2 * (df["order"] == "VS")
+    fits = ols_cluster_many(["chrf", "bleu", "ter"], "C(order)", df, df["item"])
+    for m, fit in fits.items():
+        ref = ols_cluster(f"{m} ~ C(order)", df, df["item"].astype(str))
+        assert _strip(fit.summary()) == _strip(ref.summary())
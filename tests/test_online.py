@@ -0,0 +1,68 @@
+import sys
+import pathlib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from construal.api import analyze
+from construal.bench.synth import synthetic_selected
+from construal.common.config import Config
+from construal.online import OnlineTests
+
+
+def _tables(results):
+    return {a.path.rsplit("/", 1)[-1]: a.data for arts in results.values() for a in arts.outputs
+            if a.kind in ("csv", "coefficients")}
+
+
+def _assert_same(online, raw):
+    want, got = _tables(analyze(raw, steps=["1", "2"])), _tables(online.results())
+    assert set(got) == set(want)
+    for name in want:
+        pd.testing.assert_frame_equal(got[name], want[name], check_dtype=False)
+
+
+def test_jsonl_appends_resume_from_checkpoint(tmp_path):
+    raw = synthetic_selected(3000, models=3, items=700, seed=6)
+    feed, state = tmp_path / "feed.jsonl", tmp_path / "state.npz"
+    cfg = Config(in_path=feed, out_dir=tmp_path / "out")
+    parts = np.array_split(np.arange(len(raw)), 4)
+    feed.write_text(raw.iloc[parts[0]].to_json(orient="records", lines=True))
+    online = OnlineTests(cfg, state)
+    assert online.poll(feed) == len(parts[0])
+    online.checkpoint()
+
+    # A restart resumes from the checkpoint; a half-written line waits for the next poll
+    line = raw.iloc[parts[2]].to_json(orient="records", lines=True)
+    with open(feed, "a") as f:
+        f.write(raw.iloc[parts[1]].to_json(orient="records", lines=True) + line[:40])
+    online = OnlineTests(cfg, state)
+    assert online.poll(feed) == len(parts[1])
+    with open(feed, "a") as f:
+        f.write(line[40:])
+    assert online.poll(feed) == len(parts[2]) and online.poll(feed) == 0
+    online.checkpoint()
+
+    online = OnlineTests(cfg, state)
+    online.add_batches(iter([raw.iloc[parts[3]].to_dict("records")]))
+    assert online.cubes.n_rows + sum(online.cubes.duplicates.values()) == len(raw)
+    _assert_same(online, raw)
+    online.write()
+    assert (tmp_path / "out" / "step02_cmh_models.csv").exists()
+
+
+def test_new_parquet_shards_are_read_once(tmp_path):
+    raw = synthetic_selected(2400, models=4, seed=7)
+    shards = tmp_path / "shards"
+    for i, part in enumerate(np.array_split(np.arange(len(raw)), 3)):
+        d = shards / f"model_family={'x' if i else 'y'}"
+        d.mkdir(parents=True, exist_ok=True)
+        raw.iloc[part].drop(columns="model_family").to_parquet(d / f"part-{i}.parquet", index=False)
+        if i == 1:
+            online = OnlineTests(Config(in_path=shards, out_dir=tmp_path), tmp_path / "state.npz")
+            assert online.poll(shards) == 1600 and online.poll(shards) == 0
+            online.checkpoint()
+    online = OnlineTests(Config(in_path=shards, out_dir=tmp_path), tmp_path / "state.npz")
+    assert online.poll(shards) == 800
+    raw["model_family"] = ["y"] * 800 + ["x"] * 1600
+    _assert_same(online, raw)
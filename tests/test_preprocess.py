@@ -1,11 +1,12 @@
 
 import sys
+import json
 import pathlib
 import pandas as pd
 import pandas.testing as pdt
 
 sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
-from construal.common.preprocess import derive_design
+from construal.common.preprocess import derive_design, first_occurrence
 from construal.common.config import Config
 
 
@@ -22,3 +23,29 @@ def test_determinacy_comparison_normalizes_strings():
     pdt.assert_series_equal(result[cfg.success_col], expected)
 
 
+
+
+def test_decode_params_json_and_struct_agree():
+    cfg = Config(in_path=pathlib.Path('in'), out_dir=pathlib.Path('out'))
+    params = [{"num_beams": 4}, None, {"top_p": 0.9}, {"num_beams": 4}]
+    as_json = pd.DataFrame({"decode_params": [json.dumps(p) if p else None for p in params] + ["not json"]})
+    as_dict = pd.DataFrame({"decode_params": params + [None]})
+    a = derive_design(as_json, cfg)
+    b = derive_design(as_dict, cfg)
+    assert a["beam_used"].tolist()[:1] == [4] and a["top_p_used"].iloc[2] == 0.9
+    pdt.assert_frame_equal(a[["beam_used", "top_p_used"]], b[["beam_used", "top_p_used"]])
+
+
+def test_dedup_keeps_first_or_winner_in_original_order():
+    df = pd.DataFrame({
+        'sent_id': [2, 1, 2, 1, 2],
+        'model': ['m', 'm', 'm', 'n', 'm'],
+        'score': [0.1, 0.5, 0.9, None, 0.9],
+    })
+    assert first_occurrence(df, ['sent_id', 'model']).tolist() == [True, True, False, True, False]
+    assert first_occurrence(df, ['sent_id', 'model'], 'score').tolist() == [False, True, True, True, False]
+
+    cfg = Config(in_path=pathlib.Path('in'), out_dir=pathlib.Path('out'))
+    result = derive_design(df, cfg)
+    assert result['score'].tolist()[:2] == [0.1, 0.5]
+    assert result.attrs['duplicates_dropped'] == {'m': 2}
@@ -0,0 +1,45 @@
+import sys
+import pathlib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from construal.common.resample import cluster_sums, resample, success_stats
+
+
+def _frame(seed=0, n=3000, items=200):
+    rng = np.random.default_rng(seed)
+    item = rng.integers(0, items, n)
+    order = np.where(item % 2 == 0, "SV", "VS")
+    p = np.where(order == "SV", 0.6, 0.4) + rng.normal(0, 0.1, items)[item]
+    return pd.DataFrame({"item_id": item, "order_cond": order, "model": rng.choice(["a", "b"], n),
+                         "y": (rng.random(n) < p).astype(int)})
+
+
+def test_cluster_sums_per_group():
+    df = _frame()
+    tables = cluster_sums(df, "item_id", "order_cond", "y", by="model")
+    assert set(tables) == {None, "a", "b"}
+    t = tables[None].sum(axis=0)
+    sv = df[df["order_cond"] == "SV"]
+    assert t.tolist()[:2] == [sv["y"].sum(), len(sv)]
+    assert np.allclose(tables["a"].sum(axis=0) + tables["b"].sum(axis=0), t)
+
+
+def test_resample_is_reproducible_across_jobs():
+    tables = cluster_sums(_frame(), "item_id", "order_cond", "y", by="model")
+    one = resample(tables, success_stats, 300, seed=7, jobs=1)
+    two = resample(tables, success_stats, 300, seed=7, jobs=2)
+    pd.testing.assert_frame_equal(one, two)
+    diff = one[one["pooled"] & (one["statistic"] == "diff_VS_minus_SV")].iloc[0]
+    assert diff["ci_low"] < diff["estimate"] < diff["ci_high"] < 0
+    assert diff["perm_p"] < 0.01
+
+
+def test_pooled_row_does_not_collide_with_a_group_named_all():
+    df = _frame().assign(model=lambda d: d["model"].map({"a": "ALL", "b": "b"}))
+    tables = cluster_sums(df, "item_id", "order_cond", "y", by="model")
+    assert len(tables) == 3 and tables["ALL"].sum() < tables[None].sum()
+    res = resample(tables, success_stats, 50, seed=1)
+    assert res["pooled"].sum() == 2 and res.loc[res["pooled"], "group"].isna().all()
+    assert (res["group"] == "ALL").sum() == 2
@@ -0,0 +1,85 @@
+import sys
+import pathlib
+import subprocess
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from construal.common.config import Config
+from construal.common.preprocess import derive_design
+from construal.pipeline import strata
+from construal.scheduler import run_steps, run_strata
+from construal.steps import step01_chance, step03_determiner_dist
+
+
+def test_parallel_steps_match_serial(tmp_path):
+    raw = pd.DataFrame({
+        "sent_id": [1, 1, 2, 2, 3, 3],
+        "model": ["m1", "m2"] * 3,
+        "order_cond": ["SV", "SV", "VS", "VS", "SV", "VS"],
+        "det_cat": ["Def", "Indef", "None", "Def", "Indef", "Def"],
+        "construal_match_bin": [1, 0, 1, 1, 0, 1],
+    })
+    step_map = {"1": step01_chance, "3": step03_determiner_dist}
+    outs = {}
+    for jobs in (1, 2):
+        cfg = Config(in_path=tmp_path / "in", out_dir=tmp_path / f"j{jobs}")
+        df = derive_design(raw, cfg)
+        res = run_steps(step_map, ["1", "3"], df, cfg, jobs=jobs)
+        assert [res[k][0]["step"] for k in ("1", "3")] == ["01_chance", "03_determiner_dist"]
+        assert all(res[k][1]["wall_s"] >= 0 for k in res)
+        outs[jobs] = cfg.out_dir
+    assert not list(outs[2].glob(".frame-*"))
+    for path in sorted(outs[1].glob("*.csv")):
+        pd.testing.assert_frame_equal(pd.read_csv(path), pd.read_csv(outs[2] / path.name))
+
+
+def test_strata_run_each_subset_in_its_own_directory(tmp_path):
+    raw = pd.DataFrame({
+        "sent_id": list(range(9)),
+        "model": ["m1"] * 6 + ["m2"] * 3,
+        "order_cond": ["SV", "VS", "SV"] * 3,
+        "construal_match_bin": [1, 0, 1, 1, 1, 0, 0, 1, 1],
+    })
+    step_map = {"1": step01_chance}
+    outs = {}
+    for jobs in (1, 2):
+        cfg = Config(in_path=tmp_path / "in", out_dir=tmp_path / f"j{jobs}", by=["model"])
+        df = derive_design(raw, cfg)
+        parts = strata(df, cfg)
+        assert list(parts) == ["model=m1", "model=m2"]
+        assert [len(p[2]) for p in parts.values()] == [6, 3]
+        res = run_strata(step_map, ["1"], df, {k: p[1:] for k, p in parts.items()}, cfg, jobs=jobs)
+        assert list(res) == ["model=m1", "model=m2"]
+        outs[jobs] = cfg.out_dir
+    for jobs, out in outs.items():
+        glob = pd.read_csv(out / "model=m2" / "step01_chance_global.csv")
+        assert glob["n"].iloc[0] == 3
+    pd.testing.assert_frame_equal(pd.read_csv(outs[1] / "model=m1" / "step01_chance_global.csv"),
+                                  pd.read_csv(outs[2] / "model=m1" / "step01_chance_global.csv"))
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="workers are forked on Linux only")
+def test_pool_runs_from_a_script_without_main_guard(tmp_path):
+    # Forked workers neither re-import the calling script nor need a fresh process per task
+    script = tmp_path / "run.py"
+    script.write_text(f"""
+import os, pathlib, sys
+sys.path.insert(0, {str(pathlib.Path(__file__).resolve().parents[1])!r})
+import pandas as pd
+from construal.common.config import Config
+from construal.common.preprocess import derive_design
+from construal.scheduler import _pool, run_steps
+from construal.steps import step01_chance, step03_determiner_dist
+print("imported", flush=True)
+raw = pd.DataFrame({{"sent_id": [1, 2, 3, 4], "model": ["m1"] * 4, "order_cond": ["SV", "VS"] * 2,
+                    "det_cat": ["Def", "Indef", "None", "Def"], "construal_match_bin": [1, 0, 1, 1]}})
+cfg = Config(in_path=pathlib.Path("in"), out_dir=pathlib.Path({str(tmp_path / "out")!r}))
+run_steps({{"1": step01_chance, "3": step03_determiner_dist}}, ["1", "3"], derive_design(raw, cfg), cfg, jobs=2)
+with _pool(1) as pool:
+    print(len({{pool.submit(os.getpid).result() for _ in range(3)}}), "worker", flush=True)
+""")
+    out = subprocess.run([sys.executable, str(script)], capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.split("\n")[:2] == ["imported", "1 worker"]
+    assert (tmp_path / "out" / "step01_chance_global.csv").exists()
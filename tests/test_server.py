@@ -0,0 +1,83 @@
+import sys
+import json
+import pathlib
+import threading
+import types
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from construal.bench.synth import write_synthetic
+from construal.common.config import Config
+from construal.server import Resident, make_server
+
+
+def _get(base, path):
+    with urllib.request.urlopen(base + path) as r:
+        return json.loads(r.read())
+
+
+def _post(base, path, body):
+    req = urllib.request.Request(base + path, data=json.dumps(body).encode(), method="POST")
+    with urllib.request.urlopen(req) as r:
+        return json.loads(r.read())
+
+
+def test_server_queries_cache_and_reload(tmp_path):
+    path = tmp_path / "selected.parquet"
+    write_synthetic(path, 2000, models=4, seed=3)
+    resident = Resident(Config(in_path=path, out_dir=tmp_path), cache_size=3)
+    server = make_server(resident, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    try:
+        res = _get(base, "/run?steps=2&model=m01,m02")["steps"]["2"]
+        assert not res["cached"] and res["step"] == "02_success_sv_vs"
+        counts = {o["artifact"]: o["data"] for o in res["outputs"]}["step02_per_model_2x2_counts"]
+        assert [r["model"] for r in counts] == ["m01", "m02"]
+
+        again = _post(base, "/run", {"steps": ["2", "1"], "where": {"model": ["m02", "m01"]}})["steps"]
+        assert again["2"]["cached"] and not again["1"]["cached"]
+        assert again["2"]["outputs"] == res["outputs"]
+        assert _get(base, "/health")["rows"] == 2000
+
+        try:
+            _post(base, "/run", {"steps": ["1"], "options": {"out_dir": "/"}})
+            raise AssertionError("runtime option accepted")
+        except urllib.error.HTTPError as e:
+            assert e.code == 400
+
+        write_synthetic(path, 1200, models=4, seed=3)
+        fresh = _get(base, "/run?steps=2&model=m01,m02")["steps"]["2"]
+        assert not fresh["cached"] and _get(base, "/health")["rows"] == 1200
+        assert len(resident.cache) <= 3
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_slow_query_does_not_block_others_and_misses_are_shared(tmp_path):
+    path = tmp_path / "selected.parquet"
+    write_synthetic(path, 1000, models=2, seed=1)
+    resident = Resident(Config(in_path=path, out_dir=tmp_path))
+    resident.run(["1"])                                     # cached before the slow query starts
+    started, release, calls = threading.Event(), threading.Event(), []
+    def slow(df, cfg):
+        calls.append(1)
+        started.set()
+        assert release.wait(10)
+        return {"step": "slow", "outputs": []}
+    resident.step_map["4"] = types.SimpleNamespace(run=slow, columns=lambda cfg: [])
+
+    answers = []
+    threads = [threading.Thread(target=lambda: answers.append(resident.run(["4"]))) for _ in range(2)]
+    threads[0].start()
+    assert started.wait(10)
+    threads[1].start()
+    fast = resident.run(["1"])["1"]                         # answered while step 4 is still running
+    assert fast[2] and not release.is_set()
+    release.set()
+    for t in threads:
+        t.join(10)
+    assert len(calls) == 1 and [a["4"][0]["step"] for a in answers] == ["slow", "slow"]
+    assert resident.run(["4"])["4"][2] and not resident.running
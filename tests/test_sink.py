@@ -0,0 +1,95 @@
+import sys
+import json
+import pathlib
+from argparse import Namespace
+import numpy as np
+import pandas as pd
+import statsmodels.formula.api as smf
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from construal.bench.synth import synthetic_selected
+from construal.common.config import Config
+from construal.common.io import flush_writes, write_table
+from construal.common.preprocess import derive_design
+from construal.common.sink import coef_table, write_manifest, write_texts
+from construal.pipeline import run_pipeline
+from construal.scheduler import run_step
+from construal.steps import step01_chance
+
+
+def test_coef_table_single_and_multinomial():
+    rng = np.random.default_rng(0)
+    d = pd.DataFrame({"y": rng.integers(0, 3, 300), "x": rng.normal(size=300)})
+    ols = smf.ols("x ~ y", d).fit()
+    t = coef_table(ols, "ols")
+    assert list(t["term"]) == ["Intercept", "y"]
+    np.testing.assert_allclose(t["se"], ols.bse)
+    np.testing.assert_allclose(t["ci_low"], ols.conf_int()[0])
+
+    mn = smf.mnlogit("y ~ x", d).fit(disp=False)
+    t = coef_table(mn)
+    assert list(t["equation"]) == ["1", "1", "2", "2"]
+    np.testing.assert_allclose(t["coef"], mn.params.to_numpy().ravel(order="F"))
+    np.testing.assert_allclose(t[["ci_low", "ci_high"]], mn.conf_int())
+
+
+def test_parquet_sink_partitions_and_manifest(tmp_path):
+    raw = pd.DataFrame({
+        "sent_id": [1, 1, 2, 2, 3, 3],
+        "model": ["m1", "m2"] * 3,
+        "order_cond": ["SV", "SV", "VS", "VS", "SV", "VS"],
+        "construal_match_bin": [1, 0, 1, 1, 0, 1],
+    })
+    cfg = Config(in_path=tmp_path / "in", out_dir=tmp_path / "out", results="parquet", run_id="r1")
+    df = derive_design(raw, cfg)
+    arts, timing = run_step("1", step01_chance.run, df, cfg)
+    write_texts({"1": (arts, timing)}, cfg)
+    flush_writes()
+    results = tmp_path / "out" / "results"
+
+    assert not list((tmp_path / "out").glob("*.csv"))
+    assert all(o["kind"] == "parquet" and pathlib.Path(o["path"]).exists() for o in arts["outputs"])
+    assert sorted(p.relative_to(results).as_posix() for p in results.rglob("*.parquet")) == [
+        "tables/step=01/run=r1/part-0.parquet", "texts/run=r1/part-0.parquet"]
+    glob = pd.read_parquet(results / "tables", filters=[("artifact", "==", "step01_chance_global")])
+    assert list(glob[["step", "run"]].astype(str).iloc[0]) == ["1", "r1"]
+    assert glob["k"].dtype == np.int64
+    texts = pd.read_parquet(results / "texts")
+    assert list(texts["step"]) == ["01"] and texts["text"].str.len().min() > 0
+
+    write_manifest({"1": (arts, {"wall_s": 0.0})}, cfg)
+    man = json.loads((tmp_path / "out" / "manifest.json").read_text())
+    assert man["results"] == "parquet" and man["steps"][0]["step"] == "01_chance"
+
+
+def test_writes_outside_a_step_stay_csv(tmp_path):
+    write_table(pd.DataFrame({"a": [1]}), str(tmp_path / "x.csv"))
+    assert (tmp_path / "x.csv").exists()
+
+
+def test_incremental_rerun_keeps_texts_of_skipped_steps(tmp_path):
+    raw = synthetic_selected(2000, models=3, seed=2)
+    raw.to_parquet(tmp_path / "selected.parquet", index=False)
+    args = Namespace(in_path=str(tmp_path / "selected.parquet"), out_dir=str(tmp_path / "out"), all=False,
+                     steps=["1", "2"], results="parquet", run_id="r1", incremental=True)
+    run_pipeline(args)
+    (tmp_path / "out" / ".construal_memo" / "step2.json").unlink()
+    run_pipeline(args)
+    texts = pd.read_parquet(tmp_path / "out" / "results" / "texts" / "run=r1" / "part-0.parquet")
+    assert {"step01_readme", "step02_readme"} <= set(texts["artifact"])
+    man = json.loads((tmp_path / "out" / "manifest.json").read_text())
+    listed = {o["summary"]["artifact"] for s in man["steps"] for o in s["outputs"] if "/texts/" in o["path"]}
+    assert listed and listed <= set(texts["artifact"])
+
+
+def test_by_strata_combine_parquet_results_like_csv(tmp_path):
+    raw = synthetic_selected(2000, models=3, seed=3)
+    raw.to_parquet(tmp_path / "selected.parquet", index=False)
+    for results in ("csv", "parquet"):
+        run_pipeline(Namespace(in_path=str(tmp_path / "selected.parquet"), out_dir=str(tmp_path / results),
+                               all=False, steps=["1", "2"], by=["model"], results=results, no_cache=True))
+    want = sorted(p.name for p in (tmp_path / "csv" / "combined").iterdir())
+    assert want and sorted(p.name for p in (tmp_path / "parquet" / "combined").iterdir()) == want
+    for name in want:
+        pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "parquet" / "combined" / name),
+                                      pd.read_csv(tmp_path / "csv" / "combined" / name))
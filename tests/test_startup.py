@@ -0,0 +1,41 @@
+import re
+import subprocess
+import sys
+import pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+HEAVY = ("pandas", "numpy", "scipy", "statsmodels", "patsy", "pyarrow")
+
+
+def _python(code, *args):
+    return subprocess.run([sys.executable, *args, "-c", code], cwd=ROOT, capture_output=True,
+                          text=True, check=True)
+
+
+def test_import_and_help_skip_heavy_modules():
+    code = ("import sys, construal\n"
+            "from construal.cli import main\n"
+            "sys.argv = ['construal', '--help']\n"
+            "try:\n    main()\nexcept SystemExit:\n    pass\n"
+            f"print(sorted(m for m in {HEAVY!r} if m in sys.modules))")
+    assert _python(code).stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_import_time_budget():
+    # Cumulative import time of the package itself, from -X importtime (µs)
+    err = _python("import construal.cli", "-X", "importtime").stderr
+    total = sum(int(m.group(1)) for m in re.finditer(r"\|\s*(\d+) \| construal(?:\.cli)?$", err, re.M))
+    assert 0 < total < 100_000
+
+
+def test_selected_steps_load_lazily(tmp_path):
+    import pandas as pd
+    path = tmp_path / "in.parquet"
+    pd.DataFrame({"sent_id": [1, 2], "model": ["m", "m"], "order_cond": ["SV", "VS"],
+                  "construal_match_bin": [1, 0]}).to_parquet(path, index=False)
+    code = ("import sys\n"
+            "from construal.cli import main\n"
+            f"sys.argv = ['construal', '--in', {str(path)!r}, '--out', {str(tmp_path / 'out')!r}, '--steps', '1']\n"
+            "main()\n"
+            "print(sorted(m for m in sys.modules if m.startswith(('construal.steps.', 'statsmodels.formula'))))")
+    assert _python(code).stdout.strip().splitlines()[-1] == "['construal.steps.step01_chance']"
@@ -5,7 +5,11 @@ from math import isclose
 from scipy import stats
 
 sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
-from construal.common.stats import chi2_2x2, holm_correction, proportion_tests
+from construal.common.stats import (
+    chi2_2x2, chi2_2x2_batch, chi2_2x3, chi2_2x3_batch, holm_correction, mannwhitneyu_batch,
+    proportion_tests,
+)
+from construal.common.utils import holm_adjust
 from statsmodels.stats.proportion import proportions_ztest, binom_test as sm_binom_test
 
 
@@ -44,4 +48,42 @@ def test_proportion_tests_one_tailed():
     p_exact = sm_binom_test(7, 10, prop=0.5, alternative="larger")
     assert isclose(res["z"], stat)
     assert isclose(res["p_z"], pz)
-    assert isclose(res["p_exact"], p_exact)
\ No newline at end of file
+    assert isclose(res["p_exact"], p_exact)
+
+
+def test_batched_kernels_match_scalar():
+    rng = np.random.default_rng(0)
+    t22 = rng.integers(0, 6, size=(50, 2, 2))
+    batch = chi2_2x2_batch(t22)
+    for t, (_, row) in zip(t22, batch.iterrows()):
+        ref = chi2_2x2(*t.ravel())
+        assert row["ha_correction"] == ref["ha_correction"] and row["n"] == ref["n"]
+        assert np.allclose([row[k] for k in ("chi2", "p", "or", "ci_low", "ci_hi", "V")],
+                           [ref[k] for k in ("chi2", "p", "or", "ci_low", "ci_hi", "V")])
+    t23 = rng.integers(0, 6, size=(50, 2, 3))
+    t23[0] = [[0, 1, 2], [0, 3, 4]]           # zero column margin
+    batch = chi2_2x3_batch(t23)
+    for t, (_, row) in zip(t23, batch.iterrows()):
+        ref = chi2_2x3(t)
+        assert np.allclose([row["chi2"], row["p"], row["V"]], [ref["chi2"], ref["p"], ref["V"]], equal_nan=True)
+
+
+def test_holm_correction_skips_nan():
+    adj = holm_correction([0.01, np.nan, 0.04, 0.03])
+    assert np.isnan(adj[1])
+    assert np.allclose(adj[[0, 2, 3]], holm_correction([0.01, 0.04, 0.03]))
+    assert holm_adjust([0.01, 0.04, 0.03]) == list(holm_correction([0.01, 0.04, 0.03]))
+
+
+def test_mannwhitneyu_batch_matches_scipy():
+    rng = np.random.default_rng(3)
+    Y = np.round(rng.normal(size=(400, 3)), 1)
+    Y[:, 2] = rng.integers(0, 4, 400)                   # heavy ties
+    x = rng.random(400) < 0.4
+    res = mannwhitneyu_batch(Y, x)
+    for j in range(3):
+        ref = stats.mannwhitneyu(Y[x, j], Y[~x, j], alternative="two-sided")
+        assert res["U"][j] == ref.statistic
+        assert np.isclose(res["p"][j], ref.pvalue, rtol=1e-12)
+    small = mannwhitneyu_batch(Y[:10], np.arange(10) < 4)   # exact path via scipy
+    assert np.isclose(small["p"][0], stats.mannwhitneyu(Y[:4, 0], Y[4:10, 0]).pvalue)
@@ -1 +1,23 @@
-def test_smoke(): assert True
+import sys
+import pathlib
+from argparse import Namespace
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from construal.bench.synth import write_synthetic
+from construal.pipeline import run_pipeline
+from construal.steps import STEPS
+
+
+def test_smoke(tmp_path):
+    write_synthetic(tmp_path / "selected.parquet", 4000, models=4, items=900, seed=1)
+    run_pipeline(Namespace(in_path=str(tmp_path / "selected.parquet"), out_dir=str(tmp_path / "out"),
+                           all=True, steps=None, no_cache=True))
+    out = tmp_path / "out"
+    done = (out / "PIPELINE_DONE.txt").read_text()
+    assert done.count("\tran") == len(STEPS)
+    assert (out / "duplicates_dropped.csv").exists()          # items < rows / models repeats pairs
+    for path in out.glob("*.txt"):
+        text = path.read_text()
+        assert "failed" not in text and "skipped" not in text, path.name
+    for key, name in STEPS.items():
+        assert list(out.glob(f"step0{key}_*")), name
@@ -1 +1,43 @@
+import sys
+import pathlib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from construal.common.tables import det_cube, per_model_2x2, rows_vs_others
+
+
 def test_tables(): assert True
+
+
+def _frame(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "model": rng.choice(["a", "b", "c", None], n),
+        "order_cond": rng.choice(["SV", "VS", None], n),
+        "det_cat": rng.choice(["def", "ind", "none", None], n),
+        "construal_match_bin": rng.choice([0, 1], n),
+    })
+
+
+def test_per_model_2x2_matches_crosstab():
+    df = _frame()
+    rows = per_model_2x2(df, "order_cond", "construal_match_bin", "model")
+    assert [r["model"] for r in rows] == ["a", "b", "c"]
+    for r in rows:
+        g = df[df["model"] == r["model"]]
+        ct = pd.crosstab(g["order_cond"], g["construal_match_bin"])
+        assert r["SV_success"] == ct.loc["SV", 1] and r["VS_fail"] == ct.loc["VS", 0]
+
+
+def test_det_cube_normalizes_labels_and_counts_others():
+    df = pd.DataFrame({
+        "model": ["m", "m", "m", "m", None],
+        "order_cond": ["SV", "SV", "VS", "VS", "SV"],
+        "det_cat": ["Def", "Indef", "None", None, "def"],
+    })
+    cube = det_cube(df, "order_cond", "det_cat", "model")
+    assert cube.counts[0].tolist() == [[1, 1, 0, 0], [0, 0, 1, 1]]
+    assert cube.total[0, 0] == 2
+    (row,) = rows_vs_others(cube, "ind")
+    assert row == {"model": "m", "SV_ind": 1, "SV_others": 1, "VS_ind": 0, "VS_others": 2}
@@ -0,0 +1,90 @@
+import sys
+import json
+import pathlib
+from argparse import Namespace
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from construal.bench.synth import write_synthetic
+from construal.common import trace
+from construal.common.stats import chi2_2x3_batch
+from construal.pipeline import run_pipeline
+
+
+def test_disabled_spans_are_shared_no_ops():
+    assert trace._TRACER is None
+    with trace.span("x", rows_in=3) as sp:
+        sp.set(rows_out=1)
+    assert sp is trace.span("y") is trace.stages("z")
+    assert trace.stop_tracing() == []
+
+
+def test_spans_and_export():
+    trace.start_tracing()
+    try:
+        with trace.span("outer", "step") as sp:
+            chi2_2x3_batch(np.ones((5, 2, 3)))
+            stage = trace.stages("prep", rows_in=10)
+            stage.next("a")
+            stage.next("b", note="x")
+            stage.close(rows_out=8)
+            sp.set(rows_out=7)
+    finally:
+        events = trace.stop_tracing()
+    by_name = {e["name"]: e for e in events}
+    assert set(by_name) == {"outer", "test.chi2_2x3_batch", "prep", "prep.a", "prep.b"}
+    assert by_name["test.chi2_2x3_batch"]["args"]["rows_in"] == 5
+    assert by_name["prep"]["args"]["rows_out"] == 8 and by_name["prep.b"]["args"]["note"] == "x"
+    outer = by_name["outer"]
+    for e in events:
+        assert outer["ts_us"] <= e["ts_us"] and e["ts_us"] + e["dur_us"] <= outer["ts_us"] + outer["dur_us"]
+
+    chrome = trace.chrome_trace(events)
+    complete = [e for e in chrome["traceEvents"] if e["ph"] == "X"]
+    assert len(complete) == 5 and all({"ts", "dur", "pid", "tid", "args"} <= set(e) for e in complete)
+    rows = trace.flat_rows(events)
+    assert rows[0]["name"] == "outer" and rows[0]["start_ms"] == 0 and rows[0]["rows_out"] == 7
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc/self")
+def test_spans_record_their_own_memory():
+    trace.start_tracing()
+    try:
+        trace.reset_peak_rss()
+        with trace.span("alloc"):
+            block = np.ones(200 * 2**20 // 8)
+            with trace.span("held"):
+                pass
+            del block
+    finally:
+        events = {e["name"]: e["args"] for e in trace.stop_tracing()}
+    alloc, held = events["alloc"], events["held"]
+    assert alloc["peak_growth_mb"] > 150 and abs(alloc["rss_end_mb"] - alloc["rss_start_mb"]) < 50
+    assert held["rss_start_mb"] > alloc["rss_start_mb"] + 150 and held["peak_growth_mb"] < 50
+
+
+def test_pipeline_trace_and_profile(tmp_path, monkeypatch):
+    # A profiler factory in an importable module, as the pool workers import it too
+    (tmp_path / "fake_profiler.py").write_text(
+        "from contextlib import contextmanager\n"
+        "@contextmanager\n"
+        "def profile(directory, label):\n"
+        "    yield\n"
+        "    (directory / f'{label}.done').touch()\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    write_synthetic(tmp_path / "selected.parquet", 2000, models=2, seed=2)
+    run_pipeline(Namespace(in_path=str(tmp_path / "selected.parquet"), out_dir=str(tmp_path / "out"),
+                           all=False, steps=["1", "2", "7"], no_cache=True, jobs=2, trace=True,
+                           profile="fake_profiler"))
+    assert trace._TRACER is None
+    out = tmp_path / "out"
+    names = set(pd.read_csv(out / "trace.csv")["name"])
+    assert {"pipeline", "read", "derive_design", "derive_design.dedup", "step01_chance.run",
+            "step02_success_sv_vs.run", "fit.clustered_logit"} <= names
+    events = json.loads((out / "trace.json").read_text())["traceEvents"]
+    steps = [e for e in events if e.get("cat") == "step"]
+    assert len(steps) == 3 and all(e["args"]["rows_in"] == 2000 for e in steps)
+    assert len({e["pid"] for e in steps}) > 1                  # merged from the pool workers
+    assert sorted(p.stem for p in (out / "profile").glob("*.done")) == ["preprocess", "step01", "step02", "step07"]